@@ -0,0 +1,303 @@
+"""Persisted IsolationForest anomaly model, scored at insert time.
+
+The forest is trained in a background thread once enough transactions
+have changed since the last fit. Each fit is written as a new versioned
+artifact under models/anomaly/. Every expense row stores its score in
+`transactions.anomaly_score` (higher = more unusual), so the anomalies
+endpoint is a plain indexed query.
+
+Command line (run from backend/):
+
+    python anomaly.py train
+"""
+import json
+import logging
+import math
+import os
+import re
+import sys
+import threading
+import time
+
+import joblib
+import numpy as np
+from sqlalchemy import update
+
+from database import SessionLocal
+import db_writer
+import models
+from prediction_cache import normalize
+
+
+logger = logging.getLogger(__name__)
+
+MODEL_DIR = os.getenv("ANOMALY_MODEL_DIR", "models/anomaly")
+MIN_TRAINING_ROWS = 10
+RETRAIN_MIN_CHANGES = int(os.getenv("ANOMALY_RETRAIN_MIN_CHANGES", "200"))
+RETRAIN_MIN_FRACTION = float(os.getenv("ANOMALY_RETRAIN_MIN_FRACTION", "0.1"))
+# A merchant needs this many past rows before its own stats are trusted
+MIN_MERCHANT_ROWS = 3
+# Rescoring skips rows whose stored score moved less than this
+SCORE_TOLERANCE = 1e-6
+
+FEATURES = ["log_amount", "day_of_week", "month", "category_z", "merchant_z", "merchant_freq"]
+_ARTIFACT = re.compile(r"isolation_forest_v(\d+)\.joblib")
+
+
+def _field(tx, name):
+    return tx.get(name) if isinstance(tx, dict) else getattr(tx, name)
+
+
+def _log_amount(tx) -> float:
+    return math.log1p(max(_field(tx, "amount") or 0.0, 0.0))
+
+
+def _stats(values) -> tuple[float, float, int]:
+    values = np.asarray(values, dtype=float)
+    return float(values.mean()), max(float(values.std()), 1e-6), len(values)
+
+
+class AnomalyModel:
+    """IsolationForest plus the per-category / per-merchant amount stats
+    its features are computed from."""
+
+    def __init__(self, txs, version: int):
+        from sklearn.ensemble import IsolationForest
+
+        by_category, by_merchant = {}, {}
+        log_amounts = []
+        for tx in txs:
+            value = _log_amount(tx)
+            log_amounts.append(value)
+            by_category.setdefault(_field(tx, "category"), []).append(value)
+            by_merchant.setdefault(normalize(_field(tx, "description") or ""), []).append(value)
+
+        self.global_stats = _stats(log_amounts)
+        self.category_stats = {k: _stats(v) for k, v in by_category.items()}
+        self.merchant_stats = {k: _stats(v) for k, v in by_merchant.items()}
+        self.version = version
+        self.trained_rows = len(log_amounts)
+        self.trained_at = time.time()
+
+        self.forest = IsolationForest(contamination=0.1, random_state=42)
+        self.forest.fit(self.features(txs))
+        # IsolationForest flags rows whose score_samples < offset_; we store
+        # the negated score, so the same cut-off becomes -offset_
+        self.threshold = float(-self.forest.offset_)
+
+    def features(self, txs) -> np.ndarray:
+        rows = []
+        for tx in txs:
+            log_amount = _log_amount(tx)
+            day = _field(tx, "date")
+
+            cat_mean, cat_std, _ = self.category_stats.get(_field(tx, "category"), self.global_stats)
+            merchant = self.merchant_stats.get(normalize(_field(tx, "description") or ""))
+            merchant_rows = merchant[2] if merchant else 0
+            m_mean, m_std, _ = merchant if merchant_rows >= MIN_MERCHANT_ROWS else (cat_mean, cat_std, 0)
+
+            rows.append([
+                log_amount,
+                day.isoweekday() if day else 0,
+                day.month if day else 0,
+                (log_amount - cat_mean) / cat_std,
+                (log_amount - m_mean) / m_std,
+                math.log1p(merchant_rows),
+            ])
+        return np.asarray(rows, dtype=float).reshape(-1, len(FEATURES))
+
+    def score(self, txs) -> np.ndarray:
+        if not txs:
+            return np.empty(0)
+        return -self.forest.score_samples(self.features(txs))
+
+
+# ------------------------------
+# ARTIFACTS
+# ------------------------------
+def _pointer_path() -> str:
+    return os.path.join(MODEL_DIR, "current.json")
+
+
+def load_current():
+    try:
+        with open(_pointer_path()) as fh:
+            pointer = json.load(fh)
+    except FileNotFoundError:
+        return None
+    return joblib.load(os.path.join(MODEL_DIR, pointer["artifact"]))
+
+
+def next_version() -> int:
+    """One past the highest version in current.json or on disk.
+
+    Never reads the artifact, so one that fails to load isn't overwritten.
+    """
+    versions = [0]
+    try:
+        with open(_pointer_path()) as fh:
+            versions.append(int(json.load(fh)["version"]))
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    if os.path.isdir(MODEL_DIR):
+        versions += [int(m.group(1)) for m in map(_ARTIFACT.fullmatch, os.listdir(MODEL_DIR)) if m]
+    return max(versions) + 1
+
+
+def save(model: AnomalyModel):
+    os.makedirs(MODEL_DIR, exist_ok=True)
+    artifact = f"isolation_forest_v{model.version}.joblib"
+    joblib.dump(model, os.path.join(MODEL_DIR, artifact))
+
+    # Swap the pointer atomically so readers never see a half-written file
+    tmp = _pointer_path() + ".tmp"
+    with open(tmp, "w") as fh:
+        json.dump({
+            "artifact": artifact,
+            "version": model.version,
+            "trained_rows": model.trained_rows,
+            "threshold": model.threshold,
+            "features": FEATURES,
+        }, fh, indent=2)
+    os.replace(tmp, _pointer_path())
+
+
+# ------------------------------
+# DETECTOR (process-wide)
+# ------------------------------
+class AnomalyDetector:
+    def __init__(self):
+        self._model = None
+        self._loaded = False
+        self.load_error = None
+        self._lock = threading.Lock()
+        self._training = threading.Lock()
+        self._changes = 0
+
+    def current(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    try:
+                        self._model = load_current()
+                    except Exception as exc:
+                        # An unreadable artifact must not fail every write;
+                        # score None until the next retrain replaces it
+                        logger.exception("Could not load the anomaly model; scoring disabled")
+                        self._model = None
+                        self.load_error = f"{exc.__class__.__name__}: {exc}"
+                    self._loaded = True
+        return self._model
+
+    def score_transactions(self, txs):
+        """Set anomaly_score on transactions (ORM objects or dicts)."""
+        model = self.current()
+        expenses = [tx for tx in txs if _field(tx, "type") == "expense"]
+        scores = {}
+        if model is not None and expenses:
+            scores = {id(tx): float(s) for tx, s in zip(expenses, model.score(expenses))}
+
+        # Every tx gets the key (None if not an expense) so bulk inserts stay uniform
+        for tx in txs:
+            value = scores.get(id(tx))
+            if isinstance(tx, dict):
+                tx["anomaly_score"] = value
+            else:
+                tx.anomaly_score = value
+
+    def note_changes(self, count: int = 1):
+        """Count writes and retrain in the background once enough pile up."""
+        model = self.current()
+        with self._lock:
+            self._changes += count
+            needed = (
+                max(RETRAIN_MIN_CHANGES, int(RETRAIN_MIN_FRACTION * model.trained_rows))
+                if model is not None
+                else MIN_TRAINING_ROWS
+            )
+            if self._changes < needed:
+                return
+        self.retrain_in_background()
+
+    def retrain_in_background(self):
+        if self._training.locked():
+            return
+        threading.Thread(target=self.retrain, name="anomaly-retrain", daemon=True).start()
+
+    def retrain(self):
+        if not self._training.acquire(blocking=False):
+            return None
+        try:
+            db = SessionLocal()
+            try:
+                model = train(db, version=next_version())
+            finally:
+                db.close()
+            if model is not None:
+                with self._lock:
+                    self._model, self._loaded, self._changes = model, True, 0
+                    self.load_error = None
+            return model
+        except Exception:
+            logger.exception("Anomaly model retraining failed")
+            return None
+        finally:
+            self._training.release()
+
+
+detector = AnomalyDetector()
+
+
+def train(db, version: int):
+    """Fit on every expense row, save a new version and rescore all rows.
+
+    Only scores that actually moved are written, and the rescoring doesn't
+    bump data_version: nothing derived from it depends on anomaly scores.
+    """
+    T = models.Transaction
+    txs = [
+        row._asdict()
+        for row in db.query(T.id, T.date, T.amount, T.description, T.category, T.anomaly_score)
+        .filter(T.type == "expense")
+    ]
+    if len(txs) < MIN_TRAINING_ROWS:
+        return None
+
+    model = AnomalyModel(txs, version)
+    save(model)
+
+    changed = [
+        {"id": tx["id"], "anomaly_score": float(s)}
+        for tx, s in zip(txs, model.score(txs))
+        if tx["anomaly_score"] is None or abs(tx["anomaly_score"] - s) > SCORE_TOLERANCE
+    ]
+    if changed:
+        # A full rescore can be large; it waits for the writer as long as it takes
+        db_writer.write(
+            lambda session: session.execute(update(T).execution_options(bump_data_version=False), changed),
+            timeout=None,
+        )
+    return model
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv != ["train"]:
+        print(__doc__)
+        return 2
+    model = detector.retrain()
+    if model is None:
+        print("Not enough expense rows to train")
+        return 1
+    print(f"Trained anomaly model v{model.version} on {model.trained_rows} rows "
+          f"(threshold {model.threshold:.4f})")
+    return 0
+
+
+if __name__ == "__main__":
+    # Run the imported module, not __main__, so the pickled model refers to
+    # anomaly.AnomalyModel and the server can load it
+    import anomaly
+
+    sys.exit(anomaly.main())
+
@@ -0,0 +1,150 @@
+"""Analytics before/after: pandas over ORM rows vs SQL GROUP BY on a DATE column.
+
+Builds throwaway SQLite databases with synthetic transactions and times
+the legacy monthly-summary path (String dates, no indexes, every row loaded
+into the ORM and re-parsed by pandas) against the current ones. Run from
+backend/:
+
+    python benchmarks/bench_analytics.py --sizes 10000 100000 1000000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+from sqlalchemy import Column, Float, Integer, String, create_engine, func, insert
+from sqlalchemy.orm import declarative_base, sessionmaker
+
+import models
+import rollups
+from database import Base
+
+
+LegacyBase = declarative_base()
+
+
+class LegacyTransaction(LegacyBase):
+    __tablename__ = "transactions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    date = Column(String)
+    amount = Column(Float)
+    description = Column(String)
+    category = Column(String)
+    type = Column(String)
+    payment_method = Column(String)
+    installments = Column(Integer)
+    monthly_payment = Column(Float)
+
+
+CATEGORIES = ["Food", "Utilities", "Education", "Transport", "Health", "Shopping"]
+
+
+def synthetic_rows(n: int):
+    rng = random.Random(42)
+    start = date(2020, 1, 1)
+    for _ in range(n):
+        income = rng.random() < 0.1
+        credit = not income and rng.random() < 0.3
+        installments = rng.randint(1, 12) if credit else 0
+        amount = round(rng.uniform(5, 5000 if income else 500), 2)
+        yield {
+            "date": start + timedelta(days=rng.randrange(5 * 365)),
+            "amount": amount,
+            "description": "Salary" if income else "Aldi grocery",
+            "category": "Income" if income else rng.choice(CATEGORIES),
+            "type": "income" if income else "expense",
+            "payment_method": "income" if income else ("credit_card" if credit else "debit_card"),
+            "installments": installments,
+            "monthly_payment": round(amount / installments, 2) if installments else 0.0,
+        }
+
+
+def build(path, base, table, n, string_dates):
+    engine = create_engine(f"sqlite:///{path}")
+    base.metadata.create_all(engine)
+    rows = synthetic_rows(n)
+    with engine.begin() as conn:
+        batch = []
+        for row in rows:
+            if string_dates:
+                row["date"] = row["date"].isoformat()
+            batch.append(row)
+            if len(batch) == 50_000:
+                conn.execute(insert(table), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(table), batch)
+    return sessionmaker(bind=engine)
+
+
+def timed(fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def legacy_monthly_summary(db):
+    txs = db.query(LegacyTransaction).all()
+    df = pd.DataFrame([{"date": t.date, "amount": t.amount, "type": t.type} for t in txs])
+    df["date"] = pd.to_datetime(df["date"])
+    df["month"] = df["date"].dt.to_period("M").astype(str)
+    return df.groupby(["month", "type"])["amount"].sum()
+
+
+def sql_monthly_summary(db):
+    T = models.Transaction
+    month = func.strftime("%Y-%m", T.date)
+    return db.query(month, T.type, func.sum(T.amount)).group_by(month, T.type).all()
+
+
+def rollup_monthly_summary(db):
+    R = models.MonthlyRollup
+    return db.query(R.month, R.type, func.sum(R.total)).group_by(R.month, R.type).all()
+
+
+def legacy_credit(db):
+    T = LegacyTransaction
+    return db.query(T).filter(T.type == "expense", T.payment_method == "credit_card", T.installments > 0).all()
+
+
+def indexed_credit(db):
+    T = models.Transaction
+    return db.query(T).filter(T.type == "expense", T.payment_method == "credit_card", T.installments > 0).all()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    args = parser.parse_args()
+
+    print(f"{'rows':>9} | {'summary: pandas':>16} | {'SQL GROUP BY':>13} | {'rollup':>8} | {'credit: scan':>13} | {'indexed':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.sizes:
+            legacy = build(os.path.join(tmp, f"legacy_{n}.db"), LegacyBase, LegacyTransaction, n, True)()
+            current = build(os.path.join(tmp, f"current_{n}.db"), Base, models.Transaction, n, False)()
+            rollups.rebuild(current)
+
+            repeat = 1 if n >= 500_000 else 3
+            print(
+                f"{n:>9} | {timed(lambda: legacy_monthly_summary(legacy), repeat):>13.1f} ms"
+                f" | {timed(lambda: sql_monthly_summary(current), repeat):>10.1f} ms"
+                f" | {timed(lambda: rollup_monthly_summary(current), repeat):>5.1f} ms"
+                f" | {timed(lambda: legacy_credit(legacy), repeat):>10.1f} ms"
+                f" | {timed(lambda: indexed_credit(current), repeat):>5.1f} ms"
+            )
+            legacy.close()
+            current.close()
+
+
+if __name__ == "__main__":
+    main()
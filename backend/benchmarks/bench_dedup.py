@@ -0,0 +1,89 @@
+"""Duplicate-check latency against a large transactions table.
+
+Builds a throwaway SQLite database with synthetic transactions, fills a
+SimHash signature file for every row, then times `dedup.find_duplicates`
+for random probes (copies of existing rows). Embedding the probe's
+description is replaced by a random vector, so this measures blocking plus
+signature comparison only; embedding cost is the same as for prediction.
+Run from backend/:
+
+    python benchmarks/bench_dedup.py --rows 1000000 --probes 2000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+import dedup
+import models
+from benchmarks.bench_analytics import synthetic_rows
+from database import Base
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--probes", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(engine)
+        started = time.perf_counter()
+        with engine.begin() as conn:
+            batch = []
+            for row in synthetic_rows(args.rows):
+                batch.append(row)
+                if len(batch) == 50_000:
+                    conn.execute(insert(models.Transaction), batch)
+                    batch = []
+            if batch:
+                conn.execute(insert(models.Transaction), batch)
+        print(f"built {args.rows} rows in {time.perf_counter() - started:.1f}s")
+
+        rng = np.random.default_rng(0)
+        index = dedup.SignatureIndex(os.path.join(tmp, "bench.simhash"), "bench")
+        for start in range(1, args.rows + 1, 100_000):
+            ids = np.arange(start, min(start + 100_000, args.rows + 1))
+            index.put(ids, rng.integers(1, 256, size=(len(ids), dedup.SIGNATURE_BYTES), dtype=np.uint8))
+        dedup.get_signatures = lambda: index
+        dedup.embed_many = lambda texts: rng.standard_normal((len(texts), 384)).astype(np.float32)
+
+        db = sessionmaker(bind=engine)()
+        probe_ids = random.Random(1).sample(range(1, args.rows + 1), args.probes)
+        probes = db.query(models.Transaction).filter(models.Transaction.id.in_(probe_ids)).all()
+
+        times, candidates = [], []
+        T = models.Transaction
+        window = timedelta(days=dedup.DEDUP_DATE_WINDOW_DAYS)
+        for tx in probes:
+            probe = {"date": tx.date, "amount": tx.amount, "type": tx.type, "description": tx.description}
+            started = time.perf_counter()
+            dedup.find_duplicates(db, [probe])
+            times.append(1000 * (time.perf_counter() - started))
+            candidates.append(
+                db.query(T).filter(T.amount == tx.amount, T.type == tx.type).filter(
+                    T.date.between(tx.date - window, tx.date + window)
+                ).count()
+            )
+        db.close()
+
+    times.sort()
+    print(f"{args.probes} probes, window +-{window.days} days")
+    print(f"candidates per probe: mean {statistics.mean(candidates):.2f}, max {max(candidates)}")
+    print(f"check latency: median {statistics.median(times):.3f} ms, p95 {times[int(0.95 * len(times))]:.3f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
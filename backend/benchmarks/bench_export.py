@@ -0,0 +1,92 @@
+"""Payload size and client decode time: JSON vs Arrow IPC vs Parquet.
+
+Encodes the same synthetic transactions the way GET /transactions,
+/transactions.arrow and /transactions.parquet do, then decodes each payload
+into the DataFrame the analytics dashboard needs (with parsed dates). Run
+from backend/:
+
+    python benchmarks/bench_export.py --sizes 10000 100000
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import create_engine, insert
+
+import columnar_export
+import models
+import transaction_queries as query
+from bench_analytics import synthetic_rows
+from database import Base
+
+
+def build(path, n):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(models.Transaction), list(synthetic_rows(n)))
+    return engine
+
+
+def timed(fn):
+    started = time.perf_counter()
+    value = fn()
+    return value, (time.perf_counter() - started) * 1000
+
+
+def encode_json(engine, stmt, fields):
+    with engine.connect() as conn:
+        rows = conn.execute(stmt).mappings().all()
+    return json.dumps([query.to_json_row(r, fields) for r in rows]).encode()
+
+
+def decode_json(payload):
+    df = pd.DataFrame(json.loads(payload))
+    df["date"] = pd.to_datetime(df["date"])
+    return df
+
+
+def decode_arrow(payload):
+    return pa.ipc.open_stream(payload).read_pandas(date_as_object=False)
+
+
+def decode_parquet(payload):
+    return pq.read_table(io.BytesIO(payload)).to_pandas(date_as_object=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    args = parser.parse_args()
+
+    fields = query.FIELDS
+    stmt = query.select_transactions(query.TransactionFilters(), fields)
+
+    print(f"{'rows':>8} | {'format':>7} | {'payload':>10} | {'encode':>10} | {'decode':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.sizes:
+            engine = build(os.path.join(tmp, f"export_{n}.db"), n)
+            encoders = {
+                "json": (lambda: encode_json(engine, stmt, fields), decode_json),
+                "arrow": (lambda: b"".join(columnar_export.arrow_stream(stmt, fields, engine)), decode_arrow),
+                "parquet": (lambda: columnar_export.parquet_bytes(stmt, fields, engine), decode_parquet),
+            }
+            for name, (encode, decode) in encoders.items():
+                payload, encode_ms = timed(encode)
+                df, decode_ms = timed(lambda: decode(payload))
+                assert len(df) == n
+                print(f"{n:>8} | {name:>7} | {len(payload) / 1024:>7.0f} KB | {encode_ms:>7.1f} ms | {decode_ms:>7.1f} ms")
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
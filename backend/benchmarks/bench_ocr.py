@@ -0,0 +1,87 @@
+"""OCR latency and extraction accuracy with and without preprocessing.
+
+Runs every image in a directory through the chosen engine (or the cascade)
+twice, once on the raw decoded image and once after receipt_preprocess. It
+reports latency and whether receipt_parser got the total and date right.
+Expected values come from an optional `expected.csv` in the same directory
+with columns `file,amount,date` (date as YYYY-MM-DD). Run from backend/:
+
+    python benchmarks/bench_ocr.py --images ~/receipts --engine tesseract
+"""
+import argparse
+import csv
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ocr_engines
+import ocr_jobs
+import receipt_parser
+
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".tif", ".tiff")
+
+
+def load_expected(directory: str) -> dict:
+    path = os.path.join(directory, "expected.csv")
+    if not os.path.exists(path):
+        return {}
+    with open(path, newline="") as fh:
+        return {
+            row["file"]: {"amount": float(row["amount"]) if row.get("amount") else None, "date": row.get("date") or None}
+            for row in csv.DictReader(fh)
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", required=True)
+    parser.add_argument("--engine", choices=ocr_engines.MODES, default="tesseract")
+    args = parser.parse_args()
+
+    files = sorted(f for f in os.listdir(args.images) if f.lower().endswith(IMAGE_EXTENSIONS))
+    expected = load_expected(args.images)
+    if not files:
+        print("No images found")
+        return 1
+
+    # Load the engines once so the first image doesn't pay for them
+    for engine in ocr_engines.ENGINES if args.engine == "cascade" else (args.engine,):
+        ocr_engines.get_engine(engine)
+
+    results = {False: [], True: []}
+    for name in files:
+        with open(os.path.join(args.images, name), "rb") as fh:
+            image_bytes = fh.read()
+        for preprocess in (False, True):
+            started = time.perf_counter()
+            out = ocr_jobs.run_ocr(args.engine, image_bytes, preprocess=preprocess)
+            elapsed = 1000 * (time.perf_counter() - started)
+            got = receipt_parser.parse_words(out["words"])
+            want = expected.get(name)
+            results[preprocess].append({
+                "ms": elapsed,
+                "amount_ok": want is not None and got["total"] == want["amount"],
+                "date_ok": want is not None and got["date"] is not None and got["date"].isoformat() == want["date"],
+            })
+
+    labelled = sum(1 for f in files if f in expected)
+    print(f"{len(files)} images, {labelled} with expected values, engine={args.engine}")
+    print(f"{'mode':>12} | {'median ms':>9} | {'p95 ms':>8} | {'amount ok':>9} | {'date ok':>7}")
+    for preprocess, rows in results.items():
+        times = sorted(r["ms"] for r in rows)
+        p95 = times[min(len(times) - 1, int(0.95 * len(times)))]
+        amount_ok = sum(r["amount_ok"] for r in rows)
+        date_ok = sum(r["date_ok"] for r in rows)
+        print(
+            f"{'preprocessed' if preprocess else 'raw':>12} | {statistics.median(times):>9.0f} | {p95:>8.0f}"
+            f" | {amount_ok:>4}/{labelled:<4} | {date_ok:>3}/{labelled:<3}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
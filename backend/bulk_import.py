@@ -0,0 +1,179 @@
+import csv
+import io
+import json
+from itertools import islice
+
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+
+from database import SessionLocal
+import anomaly
+import db_writer
+import dedup
+import installments
+import models
+import rollups
+import schemas
+import vector_index
+from model_registry import ModelNotReady
+from routers.ml import predict_categories_chunked
+
+
+DEFAULT_CHUNK_SIZE = 500
+
+
+def rows_from_csv(data: bytes):
+    """Yield one dict per CSV data row (header row gives the keys)."""
+    text = data.decode("utf-8-sig")
+    yield from csv.DictReader(io.StringIO(text))
+
+
+def _clean(row) -> dict:
+    # Empty CSV cells mean "not provided", not an empty string
+    if not isinstance(row, dict):
+        return row
+    return {k: v for k, v in row.items() if v not in ("", None)}
+
+
+def _validate(chunk, first_row: int):
+    valid, errors = [], []
+    for offset, raw in enumerate(chunk):
+        try:
+            tx = schemas.TransactionCreate.model_validate(_clean(raw))
+        except ValidationError as exc:
+            errors.append({
+                "row": first_row + offset,
+                "errors": json.loads(exc.json(include_url=False)),
+            })
+        else:
+            valid.append((first_row + offset, tx))
+    return valid, errors
+
+
+def _classify(valid) -> list[dict]:
+    expense_idx = [i for i, (_, tx) in enumerate(valid) if tx.type != "income"]
+    predictions = predict_categories_chunked([valid[i][1].description for i in expense_idx])
+    categories = ["Income"] * len(valid)
+    for i, category in zip(expense_idx, predictions):
+        categories[i] = category
+
+    return [
+        {**tx.model_dump(), "category": category, "category_source": "model"}
+        for (_, tx), category in zip(valid, categories)
+    ]
+
+
+def _inserter(values, signatures, matches, earlier):
+    """Writer job that inserts one chunk; returns (ids, duplicate pairs queued).
+
+    `earlier` holds matches against rows of the same chunk, by position,
+    which only get an id here.
+    """
+    def insert_chunk(session):
+        ids = session.scalars(
+            insert(models.Transaction).returning(models.Transaction.id, sort_by_parameter_order=True),
+            values,
+        ).all()
+        rollups.apply(session, added=values)
+        installments.schedule(session, ids, values)
+        found = [
+            sorted(db_matches + [(ids[j], sim) for j, sim in chunk_matches], key=lambda m: -m[1])
+            for db_matches, chunk_matches in zip(matches, earlier)
+        ]
+        return ids, dedup.record(session, ids, signatures, found)
+
+    return insert_chunk
+
+
+def ingest(rows, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """Validate, classify and insert rows chunk by chunk.
+
+    Yields one progress dict per chunk and a final summary. Invalid rows are
+    reported and skipped; each chunk is one job for the DB writer, so a
+    failing chunk never rolls back the ones before it. Rows that look like
+    existing transactions, or earlier rows of the same chunk, are flagged
+    for review (`duplicates`), or dropped (`skipped`) when
+    DEDUP_IMPORT_MODE=skip and they are near-identical.
+    """
+    db = SessionLocal()
+    rows = iter(rows)
+    total = inserted = failed = duplicates = skipped = 0
+    chunk_no = 0
+
+    try:
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            chunk_no += 1
+
+            valid, errors = _validate(chunk, total + 1)
+            total += len(chunk)
+
+            if valid:
+                try:
+                    values = _classify(valid)
+                    signatures, matches = dedup.find_duplicates(db, values)
+                    # The DB doesn't hold this chunk yet, so check it against itself too
+                    earlier = dedup.find_within(values, signatures)
+                    if dedup.DEDUP_IMPORT_MODE == "skip":
+                        keep = [
+                            i for i in range(len(values))
+                            if max((sim for _, sim in matches[i] + earlier[i]), default=0.0)
+                            < dedup.DEDUP_SKIP_SIMILARITY
+                        ]
+                        skipped += len(values) - len(keep)
+                        position = {old: new for new, old in enumerate(keep)}
+                        values = [values[i] for i in keep]
+                        signatures, matches = signatures[keep], [matches[i] for i in keep]
+                        earlier = [[(position[j], sim) for j, sim in earlier[i] if j in position] for i in keep]
+
+                    if values:
+                        anomaly.detector.score_transactions(values)
+                        ids, pairs = db_writer.write(_inserter(values, signatures, matches, earlier))
+                        duplicates += pairs
+                        try:
+                            vector_index.index_transactions(ids, [v["description"] for v in values])
+                        except ModelNotReady:
+                            pass   # committed; the backfill embeds them once the embedder is up
+                        inserted += len(values)
+                        anomaly.detector.note_changes(len(values))
+                except SQLAlchemyError as exc:
+                    errors.extend(
+                        {"row": row, "errors": [{"msg": f"database error: {exc.__class__.__name__}"}]}
+                        for row, _ in valid
+                    )
+
+            # End this chunk's read transaction so the next one sees its rows
+            db.rollback()
+
+            failed += len(errors)
+            yield {
+                "chunk": chunk_no,
+                "processed": total,
+                "inserted": inserted,
+                "failed": failed,
+                "duplicates": duplicates,
+                "skipped": skipped,
+                "errors": errors,
+            }
+    finally:
+        db.close()
+
+    yield {
+        "done": True, "total": total, "inserted": inserted, "failed": failed,
+        "duplicates": duplicates, "skipped": skipped,
+    }
+
+
+def ingest_all(rows, chunk_size: int = DEFAULT_CHUNK_SIZE) -> dict:
+    errors = []
+    summary = {}
+    for event in ingest(rows, chunk_size):
+        if event.get("done"):
+            summary = event
+        else:
+            errors.extend(event["errors"])
+    summary.pop("done", None)
+    return {**summary, "errors": errors}
@@ -0,0 +1,146 @@
+"""Matrix-multiply classifier heads stored as plain .npy weights.
+
+A head scores embeddings with a single matrix multiply, `X @ W + b`,
+then applies a temperature-scaled softmax to get probabilities. There
+are two kinds:
+- `linear`: the weights come from a fitted linear model (logistic
+  regression, LinearSVC, SGD).
+- `prototype`: the weights are L2-normalized class centroids, so the
+  scores are cosine similarities.
+The temperature is fitted on held-out rows, so `predict_proba` is
+calibrated. Unlike the pickled SVC, whose predict cost grows with its
+support vectors, a head costs one (dim x classes) multiply per batch.
+
+On disk a head is two files:
+- `<name>.npy`: the (dim + 1) x classes matrix; the last row is the bias.
+- `<name>.npy.json`: the classes, kind and temperature.
+Loading uses `allow_pickle=False`, so it depends on neither sklearn nor
+its version.
+"""
+import json
+
+import numpy as np
+
+
+KINDS = ("linear", "prototype")
+
+
+def _l2(X) -> np.ndarray:
+    X = np.atleast_2d(np.asarray(X, dtype=np.float32))
+    return X / np.maximum(np.linalg.norm(X, axis=1, keepdims=True), 1e-9)
+
+
+def _softmax(scores) -> np.ndarray:
+    scores = scores - scores.max(axis=1, keepdims=True)
+    np.exp(scores, out=scores)
+    return scores / scores.sum(axis=1, keepdims=True)
+
+
+class LinearHead:
+    def __init__(self, weights, bias, classes, kind: str = "linear", temperature: float = 1.0):
+        if kind not in KINDS:
+            raise ValueError(f"Unknown head kind: {kind}")
+        self.weights = np.ascontiguousarray(weights, dtype=np.float32)
+        self.bias = np.asarray(bias, dtype=np.float32)
+        self.classes_ = np.asarray(classes)
+        self.kind = kind
+        self.temperature = float(temperature)
+
+    # ------------------------------
+    # CONSTRUCTION
+    # ------------------------------
+    @classmethod
+    def from_estimator(cls, estimator) -> "LinearHead":
+        """Copy the weights out of a fitted sklearn linear model."""
+        coef = np.asarray(estimator.coef_, dtype=np.float32)
+        intercept = np.asarray(estimator.intercept_, dtype=np.float32).reshape(-1)
+        if coef.shape[0] == 1:
+            # Binary models keep one row; score class 0 as 0, class 1 as w.x + b
+            coef = np.vstack([np.zeros_like(coef), coef])
+            intercept = np.array([0.0, intercept[0]], dtype=np.float32)
+        return cls(coef.T, intercept, estimator.classes_, "linear")
+
+    @classmethod
+    def prototypes(cls, X, y) -> "LinearHead":
+        """Nearest-centroid head: one normalized mean embedding per class."""
+        X, y = _l2(X), np.asarray(y)
+        classes = np.unique(y)
+        centroids = np.vstack([X[y == c].mean(axis=0) for c in classes])
+        return cls(_l2(centroids).T, np.zeros(len(classes)), classes, "prototype")
+
+    def calibrate(self, X, y, grid=None) -> "LinearHead":
+        """Pick the softmax temperature that minimizes log loss on (X, y)."""
+        y = np.asarray(y)
+        known = np.isin(y, self.classes_)
+        if not known.any():
+            return self
+        scores = self.decision_function(X[known])
+        index = {c: i for i, c in enumerate(self.classes_.tolist())}
+        target = np.array([index[c] for c in y[known].tolist()])
+        grid = np.geomspace(0.01, 100, 81) if grid is None else grid
+        losses = [
+            -np.log(np.maximum(_softmax(scores / t)[np.arange(len(target)), target], 1e-12)).mean()
+            for t in grid
+        ]
+        self.temperature = float(grid[int(np.argmin(losses))])
+        return self
+
+    # ------------------------------
+    # INFERENCE (sklearn-compatible)
+    # ------------------------------
+    def decision_function(self, X) -> np.ndarray:
+        X = _l2(X) if self.kind == "prototype" else np.atleast_2d(np.asarray(X, dtype=np.float32))
+        return X @ self.weights + self.bias
+
+    def predict_proba(self, X) -> np.ndarray:
+        return _softmax(self.decision_function(X) / self.temperature)
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_[self.decision_function(X).argmax(axis=1)]
+
+    @property
+    def coef_(self) -> np.ndarray:
+        return self.weights.T
+
+    @property
+    def intercept_(self) -> np.ndarray:
+        return self.bias
+
+    def describe(self) -> dict:
+        dim, classes = self.weights.shape
+        return {"kind": self.kind, "dim": dim, "classes": classes, "temperature": self.temperature}
+
+    # ------------------------------
+    # PERSISTENCE
+    # ------------------------------
+    def save(self, path: str):
+        np.save(path, np.vstack([self.weights, self.bias[None, :]]), allow_pickle=False)
+        with open(path + ".json", "w") as fh:
+            json.dump({
+                "kind": self.kind,
+                "classes": self.classes_.tolist(),
+                "temperature": self.temperature,
+            }, fh, indent=2)
+
+    @classmethod
+    def load(cls, path: str) -> "LinearHead":
+        matrix = np.load(path, allow_pickle=False)
+        with open(path + ".json") as fh:
+            meta = json.load(fh)
+        return cls(matrix[:-1], matrix[-1], meta["classes"], meta["kind"], meta["temperature"])
+
+
+def top_k(model, X, k: int = 3) -> list[list[tuple[str, float]]]:
+    """Best k (category, probability) per row; [] for models other than a head.
+
+    A head's predict() is the argmax of its predict_proba(), so the first
+    choice is always the predicted label. An SVC's Platt probabilities come
+    from a separate fit and can disagree with its predict(), so they are
+    not used.
+    """
+    if not isinstance(model, LinearHead):
+        return [[] for _ in range(len(X))]
+    proba = model.predict_proba(X)
+    k = min(k, proba.shape[1])
+    order = np.argsort(-proba, axis=1)[:, :k]
+    return [[(str(model.classes_[j]), float(row[j])) for j in idx] for row, idx in zip(proba, order)]
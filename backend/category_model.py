@@ -0,0 +1,413 @@
+"""Versioned category classifier, retrained from user corrections.
+
+The SVC shipped in models/category_classifier_sbert.pkl is version 0.
+Retraining fits a linear SGDClassifier (log loss) on cached embeddings
+only, so no text is re-encoded:
+- the seed dataset's embeddings are stored once in
+  models/category/base_embeddings.npz;
+- the embeddings of hand-corrected transactions come from the vector
+  index.
+Corrections are weighted CORRECTION_WEIGHT, and each fit is warm-started
+from the previous linear version. The fit runs in a separate process, and
+the result is saved as a calibrated .npy head (category_head.py), not as a
+pickle. A new version is only promoted if it scores at least as well as
+the current one on a held-out slice (minus PROMOTE_TOLERANCE). Promotion
+atomically swaps models/category/current.json. Every version stays on
+disk for rollback, and running servers pick up a changed pointer within
+a few seconds.
+
+Command line (run from backend/):
+
+    python category_model.py train
+    python category_model.py versions
+    python category_model.py rollback [VERSION]
+"""
+import csv
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import joblib
+import numpy as np
+
+from category_head import LinearHead
+from prediction_cache import fingerprint
+
+
+logger = logging.getLogger(__name__)
+
+MODEL_DIR = os.getenv("CATEGORY_MODEL_DIR", "models/category")
+BASE_CLASSIFIER_PATH = "models/category_classifier_sbert.pkl"
+BASE_DATA_PATH = os.getenv("CATEGORY_BASE_DATA", "../data/transactions.csv")
+CORRECTION_WEIGHT = float(os.getenv("CATEGORY_CORRECTION_WEIGHT", "5"))
+RETRAIN_MIN_CORRECTIONS = int(os.getenv("CATEGORY_RETRAIN_MIN_CORRECTIONS", "20"))
+RETRAIN_MIN_INTERVAL = float(os.getenv("CATEGORY_RETRAIN_MIN_INTERVAL", "600"))
+PROMOTE_TOLERANCE = float(os.getenv("CATEGORY_PROMOTE_TOLERANCE", "0.02"))
+HOLDOUT_PERCENT = 20
+RELOAD_CHECK_SECONDS = 5.0
+
+
+# ------------------------------
+# ARTIFACTS
+# ------------------------------
+def _pointer_path() -> str:
+    return os.path.join(MODEL_DIR, "current.json")
+
+
+_META_NAME = re.compile(r"classifier_v\d+\.json")
+
+
+def _meta_path(version: int) -> str:
+    return os.path.join(MODEL_DIR, f"classifier_v{version}.json")
+
+
+def read_pointer() -> dict:
+    """Metadata of the active version; version 0 is the shipped SVC."""
+    try:
+        with open(_pointer_path()) as fh:
+            return json.load(fh)
+    except FileNotFoundError:
+        return {"version": 0, "artifact": None, "model": "SVC (notebook)"}
+
+
+def current_path() -> str:
+    pointer = read_pointer()
+    if pointer["artifact"] is None:
+        return BASE_CLASSIFIER_PATH
+    return os.path.join(MODEL_DIR, pointer["artifact"])
+
+
+def load(path: str):
+    # .npy heads load without unpickling; older versions are sklearn pickles
+    if path.endswith(".npy"):
+        return LinearHead.load(path)
+    return joblib.load(path)
+
+
+def load_current():
+    return load(current_path())
+
+
+def versions() -> list[dict]:
+    found = [{"version": 0, "artifact": None, "model": "SVC (notebook)"}]
+    if os.path.isdir(MODEL_DIR):
+        for name in os.listdir(MODEL_DIR):
+            if _META_NAME.fullmatch(name):
+                with open(os.path.join(MODEL_DIR, name)) as fh:
+                    found.append(json.load(fh))
+    active = read_pointer()["version"]
+    for meta in found:
+        meta["active"] = meta["version"] == active
+    return sorted(found, key=lambda m: m["version"])
+
+
+def write_pointer(meta: dict | None):
+    if meta is None or meta["version"] == 0:
+        # Back to the shipped SVC
+        if os.path.exists(_pointer_path()):
+            os.remove(_pointer_path())
+        return
+    # Swap atomically so readers never see a half-written file
+    tmp = _pointer_path() + ".tmp"
+    with open(tmp, "w") as fh:
+        json.dump(meta, fh, indent=2)
+    os.replace(tmp, _pointer_path())
+
+
+def next_version() -> int:
+    return max(m["version"] for m in versions()) + 1
+
+
+def save_version(model, meta: dict):
+    """Write the artifact and classifier_vN.json; doesn't activate it."""
+    os.makedirs(MODEL_DIR, exist_ok=True)
+    path = os.path.join(MODEL_DIR, meta["artifact"])
+    if isinstance(model, LinearHead):
+        model.save(path)
+    else:
+        joblib.dump(model, path)
+    with open(_meta_path(meta["version"]), "w") as fh:
+        json.dump(meta, fh, indent=2)
+
+
+def rollback(version: int | None = None) -> dict:
+    """Point back to `version`, or to the one the active version replaced."""
+    known = {m["version"]: m for m in versions()}
+    if version is None:
+        version = read_pointer().get("previous", 0)
+    if version not in known:
+        raise ValueError(f"Unknown classifier version: {version}")
+    meta = {k: v for k, v in known[version].items() if k != "active"}
+    write_pointer(meta)
+    activate()
+    return meta
+
+
+# ------------------------------
+# HOT SWAP
+# ------------------------------
+_loaded_pointer = None
+_reload_lock = threading.Lock()
+_last_check = 0.0
+
+
+def activate():
+    """Load the version the pointer names and swap it into the running app."""
+    global _loaded_pointer
+    from model_registry import registry
+    import routers.ml as ml
+
+    with _reload_lock:
+        pointer = read_pointer()
+        registry.swap("classifier", load_current())
+        # Cached predictions came from the previous classifier; an unloaded
+        # cache picks up the new fingerprint when it loads
+        if registry.status()["prediction_cache"]["state"] == "ready":
+            previous = registry.get("prediction_cache")
+            registry.swap("prediction_cache", ml._load_cache())
+            # A request still holding the old one sees it as empty
+            previous.close()
+        _loaded_pointer = pointer
+    logger.info("Category classifier v%s active", pointer["version"])
+
+
+def note_loaded():
+    global _loaded_pointer
+    _loaded_pointer = read_pointer()
+
+
+def reload_if_changed():
+    """Pick up a pointer changed by another process (CLI rollback, trainer)."""
+    global _last_check
+    now = time.monotonic()
+    if now - _last_check < RELOAD_CHECK_SECONDS or _loaded_pointer is None:
+        return
+    _last_check = now
+    if read_pointer() != _loaded_pointer:
+        activate()
+
+
+# ------------------------------
+# TRAINING DATA (cached embeddings only)
+# ------------------------------
+def _holdout(key: str) -> bool:
+    return zlib.crc32(key.encode()) % 100 < HOLDOUT_PERCENT
+
+
+def base_embeddings():
+    """(embeddings, labels, descriptions) for the seed dataset, embedded once."""
+    from routers.ml import EMBEDDING_MODEL_PATH, embed_many
+
+    if not os.path.exists(BASE_DATA_PATH):
+        return np.zeros((0, 0), dtype=np.float16), [], []
+
+    path = os.path.join(MODEL_DIR, "base_embeddings.npz")
+    source = f"{fingerprint(BASE_DATA_PATH)}-{fingerprint(EMBEDDING_MODEL_PATH)}"
+    if os.path.exists(path):
+        cached = np.load(path, allow_pickle=False)
+        if str(cached["source"]) == source:
+            return cached["embeddings"], cached["labels"].tolist(), cached["descriptions"].tolist()
+
+    with open(BASE_DATA_PATH, newline="", encoding="utf-8-sig") as fh:
+        rows = [r for r in csv.DictReader(fh) if r.get("description") and r.get("category")]
+    descriptions = [r["description"] for r in rows]
+    labels = [r["category"] for r in rows]
+    embeddings = embed_many(descriptions).astype(np.float16)
+    os.makedirs(MODEL_DIR, exist_ok=True)
+    np.savez(path, embeddings=embeddings, labels=np.array(labels), descriptions=np.array(descriptions),
+             source=np.array(source))
+    return embeddings, labels, descriptions
+
+
+def training_set(db):
+    """Seed rows plus hand-corrected transactions, with weights and a holdout mask."""
+    import models
+    import vector_index
+
+    X_base, y_base, d_base = base_embeddings()
+
+    T = models.Transaction
+    rows = db.query(T.id, T.description, T.category).filter(T.category_source == "user").all()
+    ids = [r.id for r in rows]
+    missing = vector_index.get_vectors().missing(ids).tolist()
+    if missing:
+        by_id = {r.id: r.description for r in rows}
+        vector_index.index_transactions(missing, [by_id[i] for i in missing])
+    X_user = vector_index.get_vectors().get(ids).astype(np.float16)
+
+    parts = [X for X in (X_base, X_user) if len(X)]
+    X = np.vstack(parts) if parts else np.zeros((0, 0), dtype=np.float16)
+    y = list(y_base) + [r.category for r in rows]
+    weights = np.array([1.0] * len(y_base) + [CORRECTION_WEIGHT] * len(rows))
+    holdout = np.array([_holdout(d) for d in d_base] + [_holdout(f"tx-{i}") for i in ids], dtype=bool)
+    return X, np.array(y), weights, holdout, len(rows)
+
+
+# ------------------------------
+# FIT (runs in a child process)
+# ------------------------------
+def _accuracy(model, X, y, weights) -> float | None:
+    if not len(y):
+        return None
+    return float(np.average(model.predict(X) == y, weights=weights))
+
+
+def fit(X, y, weights, holdout, current_artifact: str, version: int) -> tuple[object, dict]:
+    from sklearn.linear_model import SGDClassifier
+
+    started = time.perf_counter()
+    X = X.astype(np.float32)
+    if not holdout.any() or holdout.all():
+        holdout = np.zeros(len(y), dtype=bool)
+    train, test = ~holdout, holdout
+
+    current = load(current_artifact)
+    classes = np.unique(y[train])
+    clf = SGDClassifier(loss="log_loss", alpha=1e-4, max_iter=50, tol=1e-4, random_state=0)
+    init = {}
+    # Warm start from the previous linear version when the label set is unchanged
+    if (
+        isinstance(current, LinearHead) and current.kind == "linear"
+        and len(classes) > 2 and np.array_equal(current.classes_, classes)
+    ):
+        init = {"coef_init": current.coef_, "intercept_init": current.intercept_}
+    clf.fit(X[train], y[train], sample_weight=weights[train], **init)
+    head = LinearHead.from_estimator(clf)
+    if test.any():
+        head.calibrate(X[test], y[test])
+
+    metrics = {
+        "version": version,
+        "artifact": f"head_v{version}.npy",
+        "model": "linear head (SGD, log loss)",
+        "warm_start": bool(init),
+        "trained_rows": int(train.sum()),
+        "holdout_rows": int(test.sum()),
+        "holdout_accuracy": _accuracy(head, X[test], y[test], weights[test]),
+        "previous_holdout_accuracy": _accuracy(current, X[test], y[test], weights[test]),
+        "fit_seconds": round(time.perf_counter() - started, 2),
+        "temperature": head.temperature,
+        "classes": classes.tolist(),
+    }
+    return head, metrics
+
+
+# ------------------------------
+# TRAINER (process-wide)
+# ------------------------------
+class CategoryTrainer:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._training = threading.Lock()
+        self._pending = 0
+        self._last_run = 0.0
+        self.last_result = None
+
+    def note_correction(self, count: int = 1):
+        """Count corrections and retrain in the background once enough pile up."""
+        with self._lock:
+            self._pending += count
+            due = (
+                self._pending >= RETRAIN_MIN_CORRECTIONS
+                and time.monotonic() - self._last_run >= RETRAIN_MIN_INTERVAL
+            )
+        if due:
+            self.retrain_in_background()
+
+    def retrain_in_background(self) -> bool:
+        if self._training.locked():
+            return False
+        threading.Thread(target=self.retrain, name="category-retrain", daemon=True).start()
+        return True
+
+    def retrain(self, promote: bool = True) -> dict | None:
+        if not self._training.acquire(blocking=False):
+            return None
+        pending = 0
+        try:
+            from database import SessionLocal
+
+            with self._lock:
+                pending, self._pending = self._pending, 0
+                self._last_run = time.monotonic()
+
+            db = SessionLocal()
+            try:
+                X, y, weights, holdout, corrections = training_set(db)
+            finally:
+                db.close()
+            if len(np.unique(y)) < 2:
+                self.last_result = {"promoted": False, "reason": "not enough labeled data"}
+                return self.last_result
+
+            version = next_version()
+            # A separate process keeps the fit off the API's GIL
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+                model, meta = pool.submit(fit, X, y, weights, holdout, current_path(), version).result()
+
+            meta.update({
+                "corrections": corrections,
+                "previous": read_pointer()["version"],
+                "trained_at": time.time(),
+            })
+            save_version(model, meta)
+
+            new, old = meta["holdout_accuracy"], meta["previous_holdout_accuracy"]
+            meta["promoted"] = promote and (new is None or old is None or new >= old - PROMOTE_TOLERANCE)
+            if meta["promoted"]:
+                write_pointer({k: v for k, v in meta.items() if k != "promoted"})
+                activate()
+            self.last_result = meta
+            return meta
+        except Exception:
+            logger.exception("Category classifier retraining failed")
+            with self._lock:
+                self._pending += pending
+            self.last_result = {"promoted": False, "reason": "training failed"}
+            return self.last_result
+        finally:
+            self._training.release()
+
+    def stats(self) -> dict:
+        return {
+            "training": self._training.locked(),
+            "pending_corrections": self._pending,
+            "retrain_min_corrections": RETRAIN_MIN_CORRECTIONS,
+            "last_result": self.last_result,
+        }
+
+
+trainer = CategoryTrainer()
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    command = argv[0] if argv else None
+
+    if command == "versions":
+        for meta in versions():
+            marker = "*" if meta["active"] else " "
+            print(f"{marker} v{meta['version']}: {meta['model']}  holdout={meta.get('holdout_accuracy')}")
+        return 0
+    if command == "rollback":
+        meta = rollback(int(argv[1]) if len(argv) > 1 else None)
+        print(f"Active classifier: v{meta['version']}")
+        return 0
+    if command == "train":
+        meta = trainer.retrain()
+        print(json.dumps(meta, indent=2))
+        return 0 if meta and meta.get("promoted") else 1
+
+    print(__doc__)
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
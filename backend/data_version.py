@@ -0,0 +1,112 @@
+"""A counter that changes whenever the transactions table does.
+
+Any session that writes `transactions` also bumps `data_version.version`
+in the same DB transaction. That covers ORM flushes as well as ORM-enabled
+insert()/update()/delete() statements. A rolled-back write therefore
+leaves the counter alone, and other processes see the change as soon as
+it commits. Statements run with
+`execution_options(bump_data_version=False)` are not counted; anomaly
+rescoring uses this, since nothing cached depends on its scores. Derived
+results (forecasts, dashboards) cache on this number instead of
+re-reading the data, and HTTP responses derived from it use the number
+as their ETag.
+"""
+import threading
+
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.orm import Session
+
+import metrics
+import models
+
+
+_BUMPED = "data_version_bumped"
+
+
+def _bump(session):
+    # Once per DB transaction is enough; the flag is cleared on commit/rollback
+    if session.info.get(_BUMPED):
+        return
+    session.info[_BUMPED] = True
+    session.connection().execute(
+        update(models.DataVersion).where(models.DataVersion.id == 1).values(version=models.DataVersion.version + 1)
+    )
+
+
+def _touches_transactions(objects) -> bool:
+    return any(isinstance(obj, models.Transaction) for obj in objects)
+
+
+@event.listens_for(Session, "after_flush")
+def _after_flush(session, flush_context):
+    if (
+        _touches_transactions(session.new)
+        or _touches_transactions(session.deleted)
+        or any(isinstance(obj, models.Transaction) and session.is_modified(obj) for obj in session.dirty)
+    ):
+        _bump(session)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _on_execute(state):
+    if (
+        (state.is_insert or state.is_update or state.is_delete)
+        and state.bind_mapper is models.Transaction.__mapper__
+        and state.execution_options.get("bump_data_version", True)
+    ):
+        _bump(state.session)
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _reset(session):
+    session.info.pop(_BUMPED, None)
+
+
+def ensure_row(conn):
+    if conn.execute(select(models.DataVersion.id).where(models.DataVersion.id == 1)).first() is None:
+        conn.execute(insert(models.DataVersion).values(id=1, version=0))
+
+
+def current(db) -> int:
+    return db.scalar(select(models.DataVersion.version).where(models.DataVersion.id == 1)) or 0
+
+
+def etag(version: int, *parts) -> str:
+    """Strong ETag for a response derived from `version` (plus anything else it depends on)."""
+    return '"' + "-".join(str(p) for p in (version, *parts)) + '"'
+
+
+class VersionedCache:
+    """Results of `compute()` per key, all dropped when the data version moves on."""
+
+    def __init__(self, name: str, maxsize: int = 32):
+        self.name = name
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._version = None
+        self.maxsize = maxsize
+        self.hits = self.misses = 0
+
+    def get(self, version: int, key, compute):
+        with self._lock:
+            if version != self._version:
+                self._entries, self._version = {}, version
+            if key in self._entries:
+                self.hits += 1
+                metrics.cache_lookup(self.name, "hit")
+                return self._entries[key]
+        metrics.cache_lookup(self.name, "miss")
+        result = compute()
+        with self._lock:
+            self.misses += 1
+            # A write may have landed while computing; don't cache under the new version
+            if self._version == version:
+                if len(self._entries) >= self.maxsize:
+                    self._entries.pop(next(iter(self._entries)))
+                self._entries[key] = result
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"version": self._version, "entries": len(self._entries), "hits": self.hits, "misses": self.misses}
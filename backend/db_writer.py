@@ -0,0 +1,67 @@
+"""Single-writer group commit for small, frequent writes.
+
+SQLite allows one writer at a time, and each commit costs a WAL sync.
+Every write path (add, update, delete, bulk import chunks, OCR saves,
+duplicate merges, anomaly rescoring) hands its writes to one thread
+instead of racing for the lock. That thread runs every job that arrives
+within DB_WRITE_WINDOW_MS (plus whatever queued up during the previous
+commit) in one transaction and commits once. If any job in a group
+raises, the group is rolled back and its jobs are replayed one per
+transaction, so a bad row only fails its own request. PostgreSQL gets
+the same code path and the same semantics.
+
+A job is `fn(session) -> result`. It may run more than once, so it
+should build its ORM objects itself, not add ones created outside it,
+and should re-read the rows it changes. Report a missing row through
+the return value; raising would roll back and replay the whole group.
+Sessions don't expire on commit, so returned objects stay readable.
+"""
+import os
+
+from sqlalchemy.orm import sessionmaker
+
+from database import engine
+import metrics
+from micro_batcher import MicroBatcher
+
+
+DB_WRITE_WINDOW_MS = float(os.getenv("DB_WRITE_WINDOW_MS", "1"))
+DB_WRITE_MAX_BATCH = int(os.getenv("DB_WRITE_MAX_BATCH", "256"))
+DB_WRITE_TIMEOUT = float(os.getenv("DB_WRITE_TIMEOUT", "30"))
+
+WriterSession = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+
+def _commit_group(jobs) -> list[tuple[bool, object]]:
+    db = WriterSession()
+    try:
+        with metrics.span("db.write_jobs"):
+            results = [job(db) for job in jobs]
+        with metrics.span("db.commit"):
+            db.commit()
+        return [(True, r) for r in results]
+    except Exception as exc:
+        db.rollback()
+        if len(jobs) == 1:
+            return [(False, exc)]
+    finally:
+        db.close()
+    # Replay one by one so only the failing job's caller sees the error
+    return [_commit_group([job])[0] for job in jobs]
+
+
+writer = MicroBatcher(
+    _commit_group, window_ms=DB_WRITE_WINDOW_MS, max_batch=DB_WRITE_MAX_BATCH, name="db-writer"
+)
+
+
+def write(job, timeout: float | None = DB_WRITE_TIMEOUT):
+    """Run `job(session)` in the next group commit and return its result."""
+    ok, result = writer.call(job, timeout=timeout)
+    if not ok:
+        raise result
+    return result
+
+
+def stats() -> dict:
+    return writer.stats()
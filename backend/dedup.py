@@ -0,0 +1,455 @@
+"""Duplicate detection for transactions and receipt photos.
+
+Transactions are blocked on (amount, type, date +- DEDUP_DATE_WINDOW_DAYS)
+through ix_transactions_amount_date, then compared by description. Each
+description's MiniLM embedding is reduced to a 256-bit SimHash (signs of
+random projections) stored in a memory-mapped file next to the DB,
+addressed by transaction id. The Hamming distance between two signatures
+estimates the angle between the embeddings, so checking a candidate is a
+32-byte XOR and popcount instead of loading and comparing embeddings.
+Signatures missing from the file (older rows, a new embedding model) are
+computed the first time a row shows up as a candidate.
+
+Income rows are never embedded, and nothing is embedded while the embedder
+is still loading or has failed: those rows are matched within the same
+block on an identical (normalized) description instead, so a check never
+has to wait for the model.
+
+Receipt photos are matched on their 64-bit dHash through a multi-index
+hash table: the hash is split into 8 bands of 8 bits, and two hashes at
+most 7 bits apart always share at least one band exactly.
+
+    python dedup.py scan     # flag suspected pairs across the whole table
+"""
+import json
+import os
+import sys
+import threading
+from datetime import timedelta
+
+import numpy as np
+from sqlalchemy import select
+
+import models
+from model_registry import ModelNotReady, registry
+from prediction_cache import fingerprint, normalize
+from routers.ml import EMBEDDING_MODEL_PATH, embed_many
+
+
+DEDUP_DATE_WINDOW_DAYS = int(os.getenv("DEDUP_DATE_WINDOW_DAYS", "3"))
+DEDUP_SIMILARITY = float(os.getenv("DEDUP_SIMILARITY", "0.85"))          # flag for review
+DEDUP_SKIP_SIMILARITY = float(os.getenv("DEDUP_SKIP_SIMILARITY", "0.97"))  # skipped on import
+DEDUP_IMPORT_MODE = os.getenv("DEDUP_IMPORT_MODE", "flag")                 # flag | skip
+DEDUP_IMAGE_DISTANCE = int(os.getenv("DEDUP_IMAGE_DISTANCE", "6"))         # of 64 bits, max 7
+DEDUP_INDEX_PATH = os.getenv("DEDUP_INDEX_PATH", "finance.simhash")
+# A batch is looked up in date blocks at most this wide (plus the window)
+DEDUP_BLOCK_DAYS = int(os.getenv("DEDUP_BLOCK_DAYS", "31"))
+
+SIMHASH_BITS = 256
+SIGNATURE_BYTES = SIMHASH_BITS // 8
+SIMHASH_SEED = 20240601
+INITIAL_ROWS = 1 << 16
+IMAGE_BANDS = 8
+
+POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint16)
+
+
+def _field(tx, name):
+    return tx.get(name) if isinstance(tx, dict) else getattr(tx, name)
+
+
+# ------------------------------
+# DESCRIPTION SIGNATURES
+# ------------------------------
+def similarity(signature: np.ndarray, others: np.ndarray) -> np.ndarray:
+    """Estimated cosine similarity between one signature and each row of `others`."""
+    distance = POPCOUNT[np.bitwise_xor(others, signature)].sum(axis=1)
+    return np.cos(np.pi * distance / SIMHASH_BITS)
+
+
+class SignatureIndex:
+    """SimHash signatures addressed by transaction id, memory-mapped from disk.
+
+    Row `id` holds the signature of transaction `id`; an all-zero row means
+    "not computed yet". Writes go straight to the mapped file.
+    """
+
+    def __init__(self, path: str, model_fingerprint: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._planes = None
+
+        meta_path = path + ".json"
+        meta = {}
+        if os.path.exists(meta_path):
+            with open(meta_path) as fh:
+                meta = json.load(fh)
+        if meta.get("fingerprint") != model_fingerprint or not os.path.exists(path):
+            # Signatures from another embedding model are meaningless
+            with open(path, "wb") as fh:
+                fh.truncate(INITIAL_ROWS * SIGNATURE_BYTES)
+            with open(meta_path, "w") as fh:
+                json.dump({"fingerprint": model_fingerprint, "bits": SIMHASH_BITS}, fh)
+        self._open()
+
+    def _open(self):
+        rows = os.path.getsize(self.path) // SIGNATURE_BYTES
+        self._map = np.memmap(self.path, dtype=np.uint8, mode="r+", shape=(rows, SIGNATURE_BYTES))
+
+    def _grow(self, min_rows: int):
+        rows = max(min_rows, 2 * len(self._map))
+        self._map.flush()
+        del self._map
+        with open(self.path, "r+b") as fh:
+            fh.truncate(rows * SIGNATURE_BYTES)
+        self._open()
+
+    def sign(self, embeddings) -> np.ndarray:
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if self._planes is None or self._planes.shape[0] != embeddings.shape[1]:
+            rng = np.random.default_rng(SIMHASH_SEED)
+            self._planes = rng.standard_normal((embeddings.shape[1], SIMHASH_BITS)).astype(np.float32)
+        signatures = np.packbits(embeddings @ self._planes > 0, axis=1)
+        # All-zero is reserved for "missing"
+        signatures[~signatures.any(axis=1), 0] = 1
+        return signatures
+
+    def get(self, ids) -> np.ndarray:
+        ids = np.asarray(ids, dtype=np.int64)
+        out = np.zeros((len(ids), SIGNATURE_BYTES), dtype=np.uint8)
+        with self._lock:
+            inside = ids < len(self._map)
+            out[inside] = self._map[ids[inside]]
+        return out
+
+    def put(self, ids, signatures):
+        ids = np.asarray(ids, dtype=np.int64)
+        if not len(ids):
+            return
+        with self._lock:
+            if ids.max() >= len(self._map):
+                self._grow(int(ids.max()) + 1)
+            self._map[ids] = signatures
+
+    def clear(self, ids):
+        ids = np.asarray([i for i in ids if i < len(self._map)], dtype=np.int64)
+        with self._lock:
+            self._map[ids] = 0
+
+    def stats(self) -> dict:
+        return {"path": self.path, "capacity": len(self._map), "bits": SIMHASH_BITS}
+
+
+def _load_signatures():
+    # Keyed by model files only: torch and ONNX embeddings agree closely
+    # enough that their signatures are interchangeable, and deletes don't
+    # have to wait for the embedder to load
+    return SignatureIndex(DEDUP_INDEX_PATH, fingerprint(EMBEDDING_MODEL_PATH))
+
+
+registry.register("dedup_signatures", _load_signatures)
+
+
+def get_signatures() -> SignatureIndex:
+    return registry.get("dedup_signatures")
+
+
+# ------------------------------
+# RECEIPT IMAGE HASHES
+# ------------------------------
+def to_signed(image_hash: int) -> int:
+    """64-bit unsigned hash -> signed, so it fits a BIGINT column."""
+    return image_hash - (1 << 64) if image_hash >= 1 << 63 else image_hash
+
+
+class ImageHashIndex:
+    """Multi-index hash table over receipt dHashes."""
+
+    def __init__(self):
+        self._bands = [{} for _ in range(IMAGE_BANDS)]
+        self._entries = {}   # scan id -> (hash, transaction id)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _keys(image_hash: int):
+        return [(image_hash >> (8 * band)) & 0xFF for band in range(IMAGE_BANDS)]
+
+    def add(self, scan_id: int, image_hash: int, transaction_id: int | None):
+        image_hash &= (1 << 64) - 1
+        with self._lock:
+            self._entries[scan_id] = (image_hash, transaction_id)
+            for band, key in zip(self._bands, self._keys(image_hash)):
+                band.setdefault(key, []).append(scan_id)
+
+    def find(self, image_hash: int, max_distance: int = DEDUP_IMAGE_DISTANCE) -> list[tuple[int, int | None, int]]:
+        """[(scan id, transaction id, distance)] within `max_distance`, closest first."""
+        image_hash &= (1 << 64) - 1
+        with self._lock:
+            candidates = {
+                scan_id
+                for band, key in zip(self._bands, self._keys(image_hash))
+                for scan_id in band.get(key, ())
+            }
+            matches = []
+            for scan_id in candidates:
+                other, transaction_id = self._entries[scan_id]
+                distance = (other ^ image_hash).bit_count()
+                if distance <= max_distance:
+                    matches.append((scan_id, transaction_id, distance))
+        return sorted(matches, key=lambda m: m[2])
+
+    def relink(self, old_transaction_id: int, new_transaction_id: int):
+        with self._lock:
+            for scan_id, (image_hash, transaction_id) in self._entries.items():
+                if transaction_id == old_transaction_id:
+                    self._entries[scan_id] = (image_hash, new_transaction_id)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def _load_images():
+    from database import SessionLocal
+
+    index = ImageHashIndex()
+    db = SessionLocal()
+    try:
+        rows = db.execute(
+            select(models.ReceiptScan.id, models.ReceiptScan.image_hash, models.ReceiptScan.transaction_id)
+            .where(models.ReceiptScan.image_hash.is_not(None))
+        )
+        for scan_id, image_hash, transaction_id in rows:
+            index.add(scan_id, image_hash, transaction_id)
+    finally:
+        db.close()
+    return index
+
+
+registry.register("dedup_images", _load_images)
+
+
+def get_images() -> ImageHashIndex:
+    return registry.get("dedup_images")
+
+
+# ------------------------------
+# CHECK / RECORD
+# ------------------------------
+def _date_blocks(txs, window):
+    """(first date, last date, amounts) per cluster of nearby dates.
+
+    A batch spanning months becomes several small lookups, each covering at
+    most DEDUP_BLOCK_DAYS plus the window, instead of one over the whole span.
+    """
+    blocks = []
+    for tx in sorted(txs, key=lambda tx: _field(tx, "date")):
+        date = _field(tx, "date")
+        if (
+            blocks
+            and date - blocks[-1][1] <= 2 * window
+            and date - blocks[-1][0] <= timedelta(days=DEDUP_BLOCK_DAYS)
+        ):
+            blocks[-1][1] = date
+            blocks[-1][2].add(_field(tx, "amount"))
+        else:
+            blocks.append([date, date, {_field(tx, "amount")}])
+    return blocks
+
+
+def _embedder_ready() -> bool:
+    # timeout=0 starts a pending load without waiting for it
+    try:
+        registry.get("embedder", timeout=0)
+    except ModelNotReady:
+        return False
+    return True
+
+
+def _sign(index, descriptions, types, ready: bool) -> np.ndarray:
+    """Signatures for expense descriptions; all-zero ("missing") for the rest."""
+    signatures = np.zeros((len(descriptions), SIGNATURE_BYTES), dtype=np.uint8)
+    todo = [i for i, tx_type in enumerate(types) if tx_type != "income"] if ready else []
+    if todo:
+        signatures[todo] = index.sign(embed_many([descriptions[i] or "" for i in todo]))
+    return signatures
+
+
+def _similarities(signature, description: str, others: np.ndarray, other_descriptions: list[str]) -> np.ndarray:
+    """SimHash similarity where both sides are signed, else 1.0/0.0 on the
+    normalized description."""
+    sims = np.array([float(d == description) for d in other_descriptions])
+    if signature.any():
+        both = others.any(axis=1)
+        if both.any():
+            sims[both] = similarity(signature, others[both])
+    return sims
+
+
+def find_duplicates(db, txs, exclude_ids=()):
+    """Signatures for `txs` (dicts or Transactions) and, per tx, its suspected
+    originals as [(transaction id, similarity)], most similar first.
+
+    Rows without a signature on either side are compared by normalized
+    description (similarity 1.0 or no match).
+    """
+    matches = [[] for _ in txs]
+    if not txs:
+        return np.zeros((0, SIGNATURE_BYTES), dtype=np.uint8), matches
+
+    index = get_signatures()
+    ready = _embedder_ready()
+    signatures = _sign(
+        index, [_field(tx, "description") for tx in txs], [_field(tx, "type") for tx in txs], ready
+    )
+
+    dated = [tx for tx in txs if _field(tx, "date") is not None and _field(tx, "amount") is not None]
+    if not dated:
+        return signatures, matches
+
+    window = timedelta(days=DEDUP_DATE_WINDOW_DAYS)
+    T = models.Transaction
+    found = {}
+    for first, last, amounts in _date_blocks(dated, window):
+        for row in db.execute(
+            select(T.id, T.amount, T.date, T.type, T.description).where(
+                T.amount.in_(amounts), T.date.between(first - window, last + window)
+            )
+        ):
+            found[row.id] = row
+    exclude_ids = set(exclude_ids)
+    rows = [r for r in found.values() if r.id not in exclude_ids]
+    if not rows:
+        return signatures, matches
+
+    # Candidates without a signature yet get one now (expenses only)
+    candidate_signatures = index.get([r.id for r in rows])
+    missing = np.flatnonzero(~candidate_signatures.any(axis=1))
+    if len(missing):
+        computed = _sign(index, [rows[i].description for i in missing], [rows[i].type for i in missing], ready)
+        signed = computed.any(axis=1)
+        index.put([rows[i].id for i in missing[signed]], computed[signed])
+        candidate_signatures[missing] = computed
+
+    blocks = {}
+    for position, row in enumerate(rows):
+        blocks.setdefault(row.amount, []).append(position)
+
+    for i, tx in enumerate(txs):
+        date = _field(tx, "date")
+        if date is None:
+            continue
+        block = [
+            p for p in blocks.get(_field(tx, "amount"), ())
+            if rows[p].type == _field(tx, "type") and abs(rows[p].date - date) <= window
+        ]
+        if not block:
+            continue
+        sims = _similarities(
+            signatures[i], normalize(_field(tx, "description") or ""),
+            candidate_signatures[block], [normalize(rows[p].description or "") for p in block],
+        )
+        matches[i] = sorted(
+            ((rows[p].id, round(float(s), 4)) for p, s in zip(block, sims) if s >= DEDUP_SIMILARITY),
+            key=lambda m: -m[1],
+        )
+    return signatures, matches
+
+
+def find_within(txs, signatures):
+    """Per tx, the earlier txs of the same batch it looks like a copy of, as
+    [(position in txs, similarity)], most similar first.
+
+    Blocks and compares like find_duplicates, with the signatures it
+    returned, so a batch not yet in the DB is checked against itself.
+    """
+    matches = [[] for _ in txs]
+    window = timedelta(days=DEDUP_DATE_WINDOW_DAYS)
+    blocks = {}
+    for i, tx in enumerate(txs):
+        if _field(tx, "date") is not None and _field(tx, "amount") is not None:
+            blocks.setdefault((_field(tx, "amount"), _field(tx, "type")), []).append(i)
+    descriptions = [normalize(_field(tx, "description") or "") for tx in txs]
+
+    for members in blocks.values():
+        for k, i in enumerate(members):
+            date = _field(txs[i], "date")
+            block = [j for j in members[:k] if abs(_field(txs[j], "date") - date) <= window]
+            if not block:
+                continue
+            sims = _similarities(signatures[i], descriptions[i], signatures[block], [descriptions[j] for j in block])
+            matches[i] = sorted(
+                ((j, round(float(s), 4)) for j, s in zip(block, sims) if s >= DEDUP_SIMILARITY),
+                key=lambda m: -m[1],
+            )
+    return matches
+
+
+def record(db, ids, signatures, matches, reason: str = "description"):
+    """Store signatures for newly inserted ids and queue their suspected pairs."""
+    get_signatures().put(ids, signatures)
+    pairs = [
+        models.DuplicatePair(transaction_id=tx_id, duplicate_of_id=original, reason=reason, similarity=sim)
+        for tx_id, found in zip(ids, matches)
+        for original, sim in found
+    ]
+    db.add_all(pairs)
+    return len(pairs)
+
+
+def invalidate(ids):
+    """Drop signatures whose description changed; they're recomputed on demand."""
+    get_signatures().clear(ids)
+
+
+def forget(db, ids):
+    """Remove deleted transactions from the index and from review.
+
+    Merged pairs are kept as the record of the merge.
+    """
+    invalidate(ids)
+    T = models.DuplicatePair
+    db.query(T).filter(
+        (T.transaction_id.in_(ids)) | (T.duplicate_of_id.in_(ids)), T.status != "merged"
+    ).delete(synchronize_session=False)
+
+
+def scan(db, batch_size: int = 1000) -> int:
+    """Flag suspected pairs across the whole table (each pair once)."""
+    T = models.Transaction
+    flagged = 0
+    last_id = 0
+    known = {(p.transaction_id, p.duplicate_of_id) for p in db.query(models.DuplicatePair)}
+    while True:
+        batch = db.query(T).filter(T.id > last_id).order_by(T.id).limit(batch_size).all()
+        if not batch:
+            break
+        last_id = batch[-1].id
+        signatures, matches = find_duplicates(db, batch)
+        # Only pair each transaction with earlier ones, so A~B is flagged once
+        matches = [
+            [(original, sim) for original, sim in found if original < tx.id and (tx.id, original) not in known]
+            for tx, found in zip(batch, matches)
+        ]
+        flagged += record(db, [tx.id for tx in batch], signatures, matches)
+        db.commit()
+    return flagged
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] != ["scan"]:
+        print(__doc__)
+        return 2
+
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        print(f"{scan(db)} suspected duplicate pairs flagged")
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,219 @@
+"""Interchangeable inference backends for the MiniLM sentence embedder.
+
+`torch` runs the Hugging Face model eagerly and is always available. `onnx`
+and `onnx-int8` export the same model to ONNX (the latter with dynamic int8
+weight quantization) and serve it through onnxruntime. Any failure to set up
+an ONNX backend falls back to torch.
+
+Command line (run from backend/):
+
+    python embedders.py export [--quantize]
+    python embedders.py parity --backend onnx-int8 --csv ../data/transactions.csv
+"""
+import argparse
+import logging
+import os
+import sys
+
+import numpy as np
+
+import metrics
+
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+ONNX_DIR = "models/onnx"
+
+
+def mean_pool(hidden, attention_mask):
+    # Average over real tokens only, so padding doesn't dilute short texts
+    mask = attention_mask[..., None].astype(hidden.dtype)
+    return (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+
+class TorchEmbedder:
+    name = "torch"
+
+    def __init__(self, model_path: str):
+        import torch
+        from transformers import AutoModel, AutoTokenizer
+
+        self._torch = torch
+        self.tokenizer = AutoTokenizer.from_pretrained(model_path)
+        self.model = AutoModel.from_pretrained(model_path)
+        self.model.eval()
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        with metrics.span("embed.tokenize"):
+            inputs = self.tokenizer(texts, return_tensors="pt", padding=True, truncation=True)
+        with metrics.span("embed.forward"), self._torch.no_grad():
+            outputs = self.model(**inputs)
+        with metrics.span("embed.pool"):
+            return mean_pool(
+                outputs.last_hidden_state.numpy(), inputs["attention_mask"].numpy()
+            )
+
+
+class OnnxEmbedder:
+    def __init__(self, model_path: str, onnx_path: str, name: str):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        self.name = name
+        self.tokenizer = AutoTokenizer.from_pretrained(model_path)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        threads = os.getenv("ONNX_INTRA_OP_THREADS")
+        if threads:
+            options.intra_op_num_threads = int(threads)
+        self.session = ort.InferenceSession(
+            onnx_path, sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self._input_names = {i.name for i in self.session.get_inputs()}
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        with metrics.span("embed.tokenize"):
+            inputs = self.tokenizer(texts, return_tensors="np", padding=True, truncation=True)
+            feed = {k: v.astype(np.int64) for k, v in inputs.items() if k in self._input_names}
+        with metrics.span("embed.forward"):
+            hidden = self.session.run(None, feed)[0]
+        with metrics.span("embed.pool"):
+            return mean_pool(hidden, inputs["attention_mask"])
+
+
+# ------------------------------
+# EXPORT
+# ------------------------------
+def onnx_path(quantized: bool) -> str:
+    return os.path.join(ONNX_DIR, "minilm.int8.onnx" if quantized else "minilm.onnx")
+
+
+def export_onnx(model_path: str, quantize: bool = False) -> str:
+    """Export the local model to ONNX (and optionally quantize it)."""
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(ONNX_DIR, exist_ok=True)
+    fp32_path = onnx_path(quantized=False)
+
+    if not os.path.exists(fp32_path):
+        tokenizer = AutoTokenizer.from_pretrained(model_path)
+        model = AutoModel.from_pretrained(model_path)
+        model.eval()
+        sample = tokenizer(["sample transaction"], return_tensors="pt")
+        names = list(sample.keys())
+        dynamic = {name: {0: "batch", 1: "sequence"} for name in names}
+        dynamic["last_hidden_state"] = {0: "batch", 1: "sequence"}
+        with torch.no_grad():
+            torch.onnx.export(
+                model,
+                tuple(sample[n] for n in names),
+                fp32_path,
+                input_names=names,
+                output_names=["last_hidden_state"],
+                dynamic_axes=dynamic,
+                opset_version=14,
+            )
+
+    if not quantize:
+        return fp32_path
+
+    int8_path = onnx_path(quantized=True)
+    if not os.path.exists(int8_path):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+    return int8_path
+
+
+def load_embedder(backend: str, model_path: str):
+    """Build the requested backend, falling back to eager torch on failure."""
+    if backend not in BACKENDS:
+        logger.warning("Unknown EMBEDDING_BACKEND %r, using torch", backend)
+        backend = "torch"
+
+    if backend != "torch":
+        try:
+            path = export_onnx(model_path, quantize=backend == "onnx-int8")
+            return OnnxEmbedder(model_path, path, backend)
+        except Exception:
+            logger.exception("Could not start %s embedder, falling back to torch", backend)
+
+    return TorchEmbedder(model_path)
+
+
+# ------------------------------
+# PARITY CHECK
+# ------------------------------
+def parity_check(csv_path: str, backend: str, model_path: str, classifier_path: str,
+                 batch_size: int = 64) -> dict:
+    """Compare a backend against torch on every distinct CSV description."""
+    import joblib
+    import pandas as pd
+
+    texts = pd.read_csv(csv_path)["description"].dropna().astype(str).unique().tolist()
+    reference = TorchEmbedder(model_path)
+    candidate = load_embedder(backend, model_path)
+    classifier = joblib.load(classifier_path)
+
+    def run(embedder):
+        return np.vstack([
+            embedder.embed(texts[i:i + batch_size])
+            for i in range(0, len(texts), batch_size)
+        ])
+
+    ref, cand = run(reference), run(candidate)
+    cosine = (ref * cand).sum(axis=1) / (
+        np.linalg.norm(ref, axis=1) * np.linalg.norm(cand, axis=1)
+    )
+    ref_pred, cand_pred = classifier.predict(ref), classifier.predict(cand)
+    drifted = [
+        {"description": t, "torch": str(a), backend: str(b)}
+        for t, a, b in zip(texts, ref_pred, cand_pred)
+        if a != b
+    ]
+
+    return {
+        "backend": candidate.name,
+        "descriptions": len(texts),
+        "cosine_min": float(cosine.min()),
+        "cosine_mean": float(cosine.mean()),
+        "category_agreement": 1 - len(drifted) / len(texts),
+        "drifted": drifted,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="models/minilm_embedding_model")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    export = sub.add_parser("export", help="export the embedder to ONNX")
+    export.add_argument("--quantize", action="store_true", help="also write a dynamic int8 model")
+
+    parity = sub.add_parser("parity", help="compare a backend's categories against torch")
+    parity.add_argument("--backend", choices=BACKENDS[1:], default="onnx-int8")
+    parity.add_argument("--csv", default="../data/transactions.csv")
+    parity.add_argument("--classifier", default="models/category_classifier_sbert.pkl")
+    parity.add_argument("--min-agreement", type=float, default=1.0)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        print(export_onnx(args.model, quantize=args.quantize))
+        return 0
+
+    report = parity_check(args.csv, args.backend, args.model, args.classifier)
+    print(f"backend:            {report['backend']}")
+    print(f"descriptions:       {report['descriptions']}")
+    print(f"cosine min / mean:  {report['cosine_min']:.5f} / {report['cosine_mean']:.5f}")
+    print(f"category agreement: {report['category_agreement']:.2%}")
+    for row in report["drifted"]:
+        print(f"  drift: {row}")
+    return 0 if report["category_agreement"] >= args.min_agreement else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+"""Per-category expense forecasts from the materialized monthly rollups.
+
+History comes from `monthly_rollups` (one row per month and category), so
+a forecast never scans the transactions table. The only raw read is the
+current month's daily expense totals, a range on ix_transactions_type_date.
+Every category is forecast at once from a (categories x months) matrix:
+
+- ses: simple exponential smoothing. Each category gets the alpha, from
+  a small grid, with the lowest one-step-ahead error on its own history.
+- seasonal_naive: each future month repeats the same month last year.
+- auto: seasonal_naive once SEASONAL_MIN_MONTHS of history exist, else ses.
+
+The month-end projection is month-to-date spending plus the current
+month's forecast scaled to the days left. Callers cache results in
+`cache` under the data version, so they are recomputed only after a write.
+"""
+import calendar
+from datetime import date
+
+import numpy as np
+from sqlalchemy import func, select
+
+import data_version
+import installments
+import metrics
+import models
+
+
+METHODS = ("auto", "ses", "seasonal_naive")
+ALPHAS = np.linspace(0.1, 0.9, 9)
+SEASONAL_MIN_MONTHS = 24
+CACHE_SIZE = 32
+
+
+# ------------------------------
+# SERIES
+# ------------------------------
+def monthly_history(db, before: date) -> tuple[list[str], list[str], np.ndarray]:
+    """(categories, months, totals) for every full month before `before`."""
+    R = models.MonthlyRollup
+    current = before.strftime("%Y-%m")
+    rows = db.execute(
+        select(R.category, R.month, R.total)
+        .where(R.type == "expense", R.month != "", R.month < current)
+    ).all()
+    metrics.read_rows("forecast.history", len(rows))
+    if not rows:
+        return [], [], np.zeros((0, 0))
+
+    categories = sorted({r.category for r in rows})
+    first = min(r.month for r in rows)
+    start = date(int(first[:4]), int(first[5:7]), 1)
+    span = (before.year - start.year) * 12 + before.month - start.month
+    months = [installments.add_months(start, i).strftime("%Y-%m") for i in range(span)]
+
+    # Months without spending stay 0 rather than being skipped
+    matrix = np.zeros((len(categories), len(months)))
+    cat_index = {c: i for i, c in enumerate(categories)}
+    month_index = {m: i for i, m in enumerate(months)}
+    for r in rows:
+        matrix[cat_index[r.category], month_index[r.month]] += r.total
+    return categories, months, matrix
+
+
+def month_to_date(db, today: date) -> dict:
+    """Expense totals per category for the current month so far."""
+    T = models.Transaction
+    first = today.replace(day=1)
+    rows = db.execute(
+        select(T.category, func.sum(T.amount))
+        .where(T.type == "expense", T.date >= first, T.date <= today)
+        .group_by(T.category)
+    ).all()
+    metrics.read_rows("forecast.month_to_date", len(rows))
+    return {category or "": float(total or 0.0) for category, total in rows}
+
+
+# ------------------------------
+# MODELS (vectorized over categories)
+# ------------------------------
+def ses(matrix: np.ndarray, alphas=ALPHAS) -> tuple[np.ndarray, np.ndarray]:
+    """Final smoothed level per category and the alpha picked for it."""
+    n_cat, n_months = matrix.shape
+    if n_months == 0:
+        return np.zeros(n_cat), np.full(n_cat, np.nan)
+    alphas = np.asarray(alphas)[:, None]                     # (A, 1)
+    level = np.repeat(matrix[None, :, 0], len(alphas), axis=0)   # (A, C)
+    sse = np.zeros_like(level)
+    for t in range(1, n_months):
+        error = matrix[:, t] - level
+        sse += error ** 2
+        level = level + alphas * error
+    best = sse.argmin(axis=0)
+    return level[best, np.arange(n_cat)], alphas[best, 0]
+
+
+def seasonal_naive(matrix: np.ndarray, horizon: int) -> np.ndarray:
+    """(categories x horizon): the value 12 months before each target month."""
+    n_months = matrix.shape[1]
+    lags = n_months - 12 + (np.arange(horizon) % 12)
+    return matrix[:, lags]
+
+
+# ------------------------------
+# FORECAST
+# ------------------------------
+def compute(db, months: int = 3, method: str = "auto", today: date | None = None) -> dict:
+    today = today or date.today()
+    categories, history_months, matrix = monthly_history(db, today)
+    mtd = month_to_date(db, today)
+    for category in mtd:
+        if category not in categories:
+            categories.append(category)
+    if len(categories) > matrix.shape[0]:
+        matrix = np.vstack([matrix, np.zeros((len(categories) - matrix.shape[0], matrix.shape[1]))])
+
+    if method == "auto":
+        method = "seasonal_naive" if len(history_months) >= SEASONAL_MIN_MONTHS else "ses"
+    # horizon 0 is the current month, 1..months the ones after it
+    if method == "seasonal_naive" and len(history_months) >= 12:
+        path = seasonal_naive(matrix, months + 1)
+        alphas = None
+    else:
+        method = "ses"
+        level, alphas = ses(matrix)
+        path = np.repeat(level[:, None], months + 1, axis=1)
+    path = np.maximum(path, 0.0)
+
+    days = calendar.monthrange(today.year, today.month)[1]
+    remaining = (days - today.day) / days
+    spent = np.array([mtd.get(c, 0.0) for c in categories])
+    month_end = spent + path[:, 0] * remaining
+
+    future = [installments.add_months(today, i).strftime("%Y-%m") for i in range(1, months + 1)]
+    order = np.argsort(-month_end, kind="stable")
+    return {
+        "as_of": today.isoformat(),
+        "method": method,
+        "history_months": len(history_months),
+        "month": today.strftime("%Y-%m"),
+        "month_to_date": round(float(spent.sum()), 2),
+        "projected_month_end": round(float(month_end.sum()), 2),
+        "forecast": [
+            {"month": m, "amount": round(float(v), 2)} for m, v in zip(future, path[:, 1:].sum(axis=0))
+        ],
+        "categories": [
+            {
+                "category": categories[i],
+                "month_to_date": round(float(spent[i]), 2),
+                "projected_month_end": round(float(month_end[i]), 2),
+                # NaN when there is no full month of history to pick it on
+                "alpha": None if alphas is None or np.isnan(alphas[i]) else round(float(alphas[i]), 2),
+                "forecast": [{"month": m, "amount": round(float(v), 2)} for m, v in zip(future, path[i, 1:])],
+            }
+            for i in order
+        ],
+    }
+
+
+cache = data_version.VersionedCache("forecast", maxsize=CACHE_SIZE)
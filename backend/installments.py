@@ -0,0 +1,167 @@
+"""Credit-card installment schedule maintenance.
+
+A credit-card expense paid in N installments gets N rows in
+`installment_schedule`, one per due month starting with the purchase
+month. Each row holds that month's payment. Write paths call
+`schedule()`/`unschedule()` inside their own transaction, like the
+monthly rollups, so questions about future months ("what is due in
+March?") become a range query on `due_month`. To repair the table from
+transactions (run from backend/):
+
+    python installments.py check
+    python installments.py rebuild
+"""
+import sys
+from datetime import date
+
+from sqlalchemy import delete, func, insert, select
+
+import metrics
+import models
+
+
+def _field(tx, name):
+    return tx.get(name) if isinstance(tx, dict) else getattr(tx, name)
+
+
+def month_start(value: date) -> date:
+    return value.replace(day=1)
+
+
+def add_months(value: date, months: int) -> date:
+    index = value.year * 12 + value.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _rows(tx_id, tx) -> list[dict]:
+    installments = _field(tx, "installments") or 0
+    start = _field(tx, "date")
+    if (
+        _field(tx, "type") != "expense"
+        or _field(tx, "payment_method") != "credit_card"
+        or installments <= 0
+        or start is None
+    ):
+        return []
+    first = month_start(start)
+    amount = _field(tx, "monthly_payment") or 0.0
+    return [
+        {"transaction_id": tx_id, "number": n + 1, "due_month": add_months(first, n), "amount": amount}
+        for n in range(installments)
+    ]
+
+
+def schedule(db, ids, txs) -> int:
+    """Insert schedule rows for new transactions (ORM objects or dicts). Does not commit."""
+    rows = [row for tx_id, tx in zip(ids, txs) for row in _rows(tx_id, tx)]
+    if rows:
+        db.execute(insert(models.InstallmentSchedule), rows)
+    return len(rows)
+
+
+def unschedule(db, ids):
+    """Drop the schedule of deleted (or about to be rewritten) transactions."""
+    S = models.InstallmentSchedule
+    db.execute(delete(S).where(S.transaction_id.in_(list(ids))))
+
+
+def reschedule(db, tx):
+    unschedule(db, [tx.id])
+    schedule(db, [tx.id], [tx])
+
+
+# ------------------------------
+# QUERIES
+# ------------------------------
+def projection(db, start: date, months: int) -> list[dict]:
+    """Installments due per month from `start` for `months` months (zeros included)."""
+    S = models.InstallmentSchedule
+    first, end = month_start(start), add_months(start, months)
+    due = {
+        row.due_month: row
+        for row in db.execute(
+            select(S.due_month, func.sum(S.amount).label("amount"), func.count().label("installments"))
+            .where(S.due_month >= first, S.due_month < end)
+            .group_by(S.due_month)
+        )
+    }
+    metrics.read_rows("installments.projection", len(due))
+    out = []
+    for n in range(months):
+        month = add_months(first, n)
+        row = due.get(month)
+        out.append({
+            "month": month.strftime("%Y-%m"),
+            "amount": round(row.amount, 2) if row else 0.0,
+            "installments": row.installments if row else 0,
+        })
+    return out
+
+
+# ------------------------------
+# REPAIR / CONSISTENCY
+# ------------------------------
+def _eligible(db):
+    T = models.Transaction
+    return db.execute(
+        select(T.id, T.date, T.type, T.payment_method, T.installments, T.monthly_payment).where(
+            T.type == "expense", T.payment_method == "credit_card", T.installments > 0, T.date.is_not(None)
+        )
+    ).mappings()
+
+
+def check(db) -> list[dict]:
+    """Transactions whose schedule differs from what their fields imply."""
+    S = models.InstallmentSchedule
+    actual = {}
+    for row in db.execute(select(S.transaction_id, S.number, S.due_month, S.amount)):
+        actual.setdefault(row.transaction_id, set()).add((row.number, row.due_month, round(row.amount, 2)))
+    problems = []
+    for tx in _eligible(db):
+        expected = {(r["number"], r["due_month"], round(r["amount"], 2)) for r in _rows(tx["id"], tx)}
+        if actual.pop(tx["id"], set()) != expected:
+            problems.append({"transaction_id": tx["id"], "problem": "schedule does not match transaction"})
+    problems.extend({"transaction_id": tx_id, "problem": "orphaned schedule"} for tx_id in sorted(actual))
+    return problems
+
+
+def ensure_populated(db):
+    """Build the schedule on first start against an existing database."""
+    if db.query(models.InstallmentSchedule).first() is None and next(iter(_eligible(db)), None):
+        rebuild(db)
+
+
+def rebuild(db) -> int:
+    """Regenerate every schedule row. Returns the number of rows."""
+    db.execute(delete(models.InstallmentSchedule))
+    txs = list(_eligible(db))
+    count = schedule(db, [tx["id"] for tx in txs], txs)
+    db.commit()
+    return count
+
+
+def main(argv=None):
+    from database import Base, SessionLocal, engine
+
+    argv = sys.argv[1:] if argv is None else argv
+    if argv not in (["check"], ["rebuild"]):
+        print(__doc__)
+        return 2
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        if argv == ["rebuild"]:
+            print(f"Rebuilt installment_schedule: {rebuild(db)} rows")
+            return 0
+        problems = check(db)
+        for p in problems:
+            print(p)
+        print("OK" if not problems else f"{len(problems)} transactions with a wrong schedule")
+        return 1 if problems else 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,16 +1,118 @@
-from fastapi import FastAPI
-from database import engine, Base
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from database import SessionLocal
+import installments
+import metrics
 import models
-from routers import transactions, ml, analytics
+import migrations
+import profiler
+import rollups
+from model_registry import ModelNotReady, warm_up_from_env
+from routers import transactions, ml, analytics, health, duplicates
 from routers import ocr
 
 
-app = FastAPI(title="Personal Finance ML API")
+def populate_rollups():
+    db = SessionLocal()
+    try:
+        rollups.ensure_populated(db)
+    finally:
+        db.close()
 
-Base.metadata.create_all(bind=engine)
+
+def populate_installments():
+    db = SessionLocal()
+    try:
+        installments.ensure_populated(db)
+    finally:
+        db.close()
+
+
+def warm_models():
+    # Models load in the background; routes that don't need them serve immediately
+    warm_up_from_env()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    populate_rollups()
+    populate_installments()
+    warm_models()
+    yield
+
+
+app = FastAPI(title="Personal Finance ML API", lifespan=lifespan)
+
+# Creates missing tables and upgrades an existing finance.db in place
+migrations.run()
 
 app.include_router(transactions.router)
 app.include_router(ml.router)
 app.include_router(analytics.router)
+app.include_router(duplicates.router)
 app.include_router(ocr.router)
+app.include_router(health.router)
+
+
+def _observe_latency(request: Request, elapsed: float, status: int):
+    # Route template ("/transactions/{transaction_id}"), not the raw path
+    route = request.scope.get("route")
+    metrics.http_requests.observe(
+        elapsed,
+        method=request.method,
+        route=route.path if route is not None else "unmatched",
+        status=status,
+    )
+
+
+@app.middleware("http")
+async def record_latency(request: Request, call_next):
+    """Per-route latency histogram, plus a sampled profile of slow requests.
+
+    Latency and profiling run until the last body chunk is sent, so streamed
+    responses (NDJSON, Arrow exports) count their whole body, not just the
+    headers.
+    """
+    sampler = profiler.Sampler().__enter__() if profiler.requested(request.headers) else None
+    forced = request.headers.get("x-profile") == "1"
+    started = time.perf_counter()
+
+    def finish(status: int):
+        elapsed = time.perf_counter() - started
+        _observe_latency(request, elapsed, status)
+        if sampler is not None:
+            sampler.__exit__(None, None, None)
+            if forced or 1000 * elapsed >= profiler.PROFILE_THRESHOLD_MS:
+                sampler.dump(f"{request.method} {request.url.path}", 1000 * elapsed)
+
+    try:
+        response = await call_next(request)
+    except Exception:
+        finish(500)
+        raise
+    if sampler is not None and forced:
+        # Always written, once the body is sent; the id is known up front
+        response.headers["X-Profile-Id"] = sampler.id
+
+    body = response.body_iterator
+
+    async def timed_body():
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            finish(response.status_code)
+
+    response.body_iterator = timed_body()
+    return response
+
 
+@app.exception_handler(ModelNotReady)
+def model_not_ready(request: Request, exc: ModelNotReady):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc), "model": exc.name, "state": exc.state},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
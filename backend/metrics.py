@@ -0,0 +1,164 @@
+"""In-process metrics exported in Prometheus text format on GET /metrics.
+
+- http_request_duration_seconds{method,route,status}: every request,
+  recorded by the middleware in main.py under its route template.
+- span_duration_seconds{span}: timed sections inside a request
+  (tokenize, forward pass, classifier predict, DB commit, OCR stages,
+  analytics). Use `with metrics.span("name"):` or `@metrics.timed("name")`.
+- cache_lookups_total{cache,result}: prediction / forecast / dashboard
+  cache hits and misses.
+- db_rows_read_total{query}: rows the read paths pulled from the database.
+  SQLite exposes no per-statement scan counter, so this counts rows
+  returned to Python, which is what each endpoint pays for.
+
+Each process keeps its own numbers (run one worker per scrape target, or
+scrape every worker). Stdlib only.
+"""
+import functools
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+
+# Seconds; from sub-millisecond cache hits up to slow OCR jobs
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+# ------------------------------
+# METRIC TYPES
+# ------------------------------
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels[n] for n in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.labels, key)} {_number(v)}" for key, v in values]
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = BUCKETS):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._series = {}   # labels -> [per-bucket counts..., +Inf count, sum]
+
+    def observe(self, seconds: float, **labels):
+        key = tuple(labels[n] for n in self.labels)
+        index = bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += seconds
+
+    def render(self) -> list[str]:
+        with self._lock:
+            series = sorted((k, list(v)) for k, v in self._series.items())
+        lines = []
+        for key, counts in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, key)} {_number(counts[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+# ------------------------------
+# REGISTRY
+# ------------------------------
+_metrics = []
+
+
+def counter(name: str, help: str, labels: tuple = ()) -> Counter:
+    metric = Counter(name, help, labels)
+    _metrics.append(metric)
+    return metric
+
+
+def histogram(name: str, help: str, labels: tuple = (), buckets: tuple = BUCKETS) -> Histogram:
+    metric = Histogram(name, help, labels, buckets)
+    _metrics.append(metric)
+    return metric
+
+
+def render() -> str:
+    lines = []
+    for metric in _metrics:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+http_requests = histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template.", ("method", "route", "status")
+)
+spans = histogram("span_duration_seconds", "Time spent in named sections of a request.", ("span",))
+cache_lookups = counter("cache_lookups_total", "Cache lookups by cache and result.", ("cache", "result"))
+rows_read = counter("db_rows_read_total", "Rows returned by database reads, by query.", ("query",))
+
+
+# ------------------------------
+# SPANS
+# ------------------------------
+@contextmanager
+def span(name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        spans.observe(time.perf_counter() - started, span=name)
+
+
+def timed(name: str):
+    """Decorator form of span(); keeps the signature FastAPI inspects."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+
+def cache_lookup(cache: str, result: str, count: int = 1):
+    if count:
+        cache_lookups.inc(count, cache=cache, result=result)
+
+
+def read_rows(query: str, count: int):
+    rows_read.inc(count, query=query)
+    return count
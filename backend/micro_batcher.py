@@ -0,0 +1,126 @@
+import threading
+import time
+from concurrent.futures import Future
+from queue import Queue, Empty
+
+
+class MicroBatcher:
+    """Coalesces single calls into calls of a batch function.
+
+    Callers submit one item at a time. A worker thread collects everything
+    that arrives within `window_ms` (or until `max_batch` items are waiting)
+    and runs `process_batch` once for the whole group. `process_batch`
+    returns one result per item, in order.
+    """
+
+    def __init__(self, process_batch, window_ms: float = 5.0, max_batch: int = 64,
+                 name: str = "micro-batcher"):
+        self.process_batch = process_batch
+        self.name = name
+        self.window_ms = window_ms
+        self.max_batch = max(1, max_batch)
+
+        self._queue = Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._started_at = time.perf_counter()
+
+        # Stats
+        self._batches = 0
+        self._items = 0
+        self._errors = 0
+        self._largest_batch = 0
+        self._busy_seconds = 0.0
+        self._wait_seconds = 0.0
+        self._size_histogram = {}
+
+    # ------------------------------
+    # PUBLIC API
+    # ------------------------------
+    def submit(self, item) -> Future:
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((item, future, time.perf_counter()))
+        return future
+
+    def call(self, item, timeout: float | None = None):
+        return self.submit(item).result(timeout=timeout)
+
+    def stats(self) -> dict:
+        with self._lock:
+            uptime = time.perf_counter() - self._started_at
+            return {
+                "window_ms": self.window_ms,
+                "max_batch": self.max_batch,
+                "queued": self._queue.qsize(),
+                "batches": self._batches,
+                "items": self._items,
+                "errors": self._errors,
+                "avg_batch_size": round(self._items / self._batches, 2) if self._batches else 0.0,
+                "largest_batch": self._largest_batch,
+                "batch_size_histogram": dict(sorted(self._size_histogram.items())),
+                "avg_queue_wait_ms": round(1000 * self._wait_seconds / self._items, 3) if self._items else 0.0,
+                "avg_batch_ms": round(1000 * self._busy_seconds / self._batches, 3) if self._batches else 0.0,
+                "items_per_busy_second": round(self._items / self._busy_seconds, 1) if self._busy_seconds else 0.0,
+                "items_per_second": round(self._items / uptime, 2) if uptime else 0.0,
+            }
+
+    # ------------------------------
+    # WORKER
+    # ------------------------------
+    def _ensure_worker(self):
+        if self._worker is not None:
+            return
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(
+                    target=self._run, name=self.name, daemon=True
+                )
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.perf_counter() + self.window_ms / 1000
+
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                try:
+                    if remaining > 0:
+                        batch.append(self._queue.get(timeout=remaining))
+                    else:
+                        # Window closed: still take whatever is already queued
+                        batch.append(self._queue.get_nowait())
+                except Empty:
+                    break
+
+            self._process(batch)
+
+    def _process(self, batch):
+        items = [item for item, _, _ in batch]
+        started = time.perf_counter()
+
+        try:
+            results = self.process_batch(items)
+        except Exception as exc:
+            for _, future, _ in batch:
+                future.set_exception(exc)
+            failed = True
+        else:
+            for (_, future, _), result in zip(batch, results):
+                future.set_result(result)
+            failed = False
+
+        elapsed = time.perf_counter() - started
+        waited = sum(started - queued_at for _, _, queued_at in batch)
+
+        with self._lock:
+            size = len(batch)
+            bucket = 1 << (size - 1).bit_length()
+            self._batches += 1
+            self._items += size
+            self._errors += size if failed else 0
+            self._largest_batch = max(self._largest_batch, size)
+            self._busy_seconds += elapsed
+            self._wait_seconds += waited
+            self._size_histogram[bucket] = self._size_histogram.get(bucket, 0) + 1
@@ -0,0 +1,130 @@
+"""Idempotent schema migrations for an existing finance.db.
+
+Runs automatically on startup; can also be run by hand (from backend/):
+
+    python migrations.py
+"""
+import sys
+from datetime import datetime
+
+from sqlalchemy import insert, inspect, text
+
+from database import Base, engine
+import data_version
+import models
+
+
+_DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%Y/%m/%d", "%d-%m-%Y", "%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S")
+
+
+def _parse_date(value: str):
+    value = value.strip()
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def normalize_dates(conn) -> dict:
+    """Rewrite legacy string dates as ISO "YYYY-MM-DD".
+
+    The column used to be a free-form String; the OCR route stored
+    DD/MM/YYYY. Values that match no known format are set to NULL and
+    their original text is kept in unparsed_dates. On PostgreSQL the
+    column is then converted to DATE, which only casts ISO strings.
+    """
+    postgresql = conn.dialect.name == "postgresql"
+    if postgresql:
+        column = next(c for c in inspect(conn).get_columns("transactions") if c["name"] == "date")
+        if column["type"].__class__.__name__.upper() == "DATE":
+            return {"converted": 0, "unparsed": []}
+        query = "SELECT id, date FROM transactions WHERE date IS NOT NULL"
+    else:
+        query = (
+            "SELECT id, date FROM transactions WHERE date IS NOT NULL AND ("
+            " typeof(date) != 'text' OR length(date) != 10"
+            " OR date NOT GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]')"
+        )
+
+    converted, unparsed = [], []
+    for tx_id, value in conn.execute(text(query)).all():
+        value = str(value)
+        parsed = _parse_date(value)
+        if parsed is None:
+            unparsed.append({"transaction_id": tx_id, "value": value})
+        elif parsed.isoformat() != value:
+            converted.append({"id": tx_id, "d": parsed.isoformat()})
+
+    if converted:
+        conn.execute(text("UPDATE transactions SET date = :d WHERE id = :id"), converted)
+    if unparsed:
+        models.UnparsedDate.__table__.create(conn, checkfirst=True)
+        conn.execute(insert(models.UnparsedDate), unparsed)
+        conn.execute(text("UPDATE transactions SET date = NULL WHERE id = :transaction_id"), unparsed)
+    if postgresql:
+        conn.execute(text("ALTER TABLE transactions ALTER COLUMN date TYPE DATE USING date::date"))
+    return {"converted": len(converted), "unparsed": [u["transaction_id"] for u in unparsed]}
+
+
+def add_missing_columns(conn) -> list[str]:
+    """create_all() never alters existing tables, so add new model columns."""
+    added = []
+    for table in Base.metadata.sorted_tables:
+        if not inspect(conn).has_table(table.name):
+            continue
+        existing = {c["name"] for c in inspect(conn).get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                column_type = column.type.compile(dialect=conn.dialect)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {column_type}'))
+                added.append(f"{table.name}.{column.name}")
+    return added
+
+
+def create_indexes(conn) -> list[str]:
+    """create_all() only builds indexes with new tables, so add missing ones."""
+    existing = {i["name"] for i in inspect(conn).get_indexes("transactions")}
+    created = []
+    for index in models.Transaction.__table__.indexes:
+        if index.name not in existing:
+            index.create(conn)
+            created.append(index.name)
+    return created
+
+
+def drop_pair_foreign_keys(conn) -> list[str]:
+    """duplicate_pairs used to cascade-delete with its transactions, which
+    would drop merged pairs on PostgreSQL (SQLite doesn't enforce them)."""
+    if conn.dialect.name != "postgresql":
+        return []
+    dropped = []
+    for fk in inspect(conn).get_foreign_keys("duplicate_pairs"):
+        if fk.get("name"):
+            conn.execute(text(f'ALTER TABLE duplicate_pairs DROP CONSTRAINT "{fk["name"]}"'))
+            dropped.append(fk["name"])
+    return dropped
+
+
+def run() -> dict:
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        columns = add_missing_columns(conn)
+        dates = normalize_dates(conn)
+        indexes = create_indexes(conn)
+        foreign_keys = drop_pair_foreign_keys(conn)
+        data_version.ensure_row(conn)
+    return {"columns": columns, "dates": dates, "indexes": indexes, "dropped_foreign_keys": foreign_keys}
+
+
+if __name__ == "__main__":
+    report = run()
+    print(f"Columns added: {', '.join(report['columns']) or 'none'}")
+    print(f"Dates converted to ISO: {report['dates']['converted']}")
+    if report["dates"]["unparsed"]:
+        print(f"Unparseable dates kept in unparsed_dates (ids): {report['dates']['unparsed']}")
+    print(f"Indexes created: {', '.join(report['indexes']) or 'none'}")
+    if report["dropped_foreign_keys"]:
+        print(f"Foreign keys dropped: {', '.join(report['dropped_foreign_keys'])}")
+    sys.exit(0)
@@ -0,0 +1,162 @@
+import os
+import threading
+import time
+
+
+MODEL_WAIT_TIMEOUT = float(os.getenv("MODEL_WAIT_TIMEOUT", "5"))
+RETRY_AFTER_SECONDS = int(os.getenv("MODEL_RETRY_AFTER", "5"))
+# A failed load is retried on a later get(), backing off up to this long
+MAX_RETRY_BACKOFF = float(os.getenv("MODEL_MAX_RETRY_BACKOFF", "300"))
+
+
+class ModelNotReady(Exception):
+    """Raised when a request needs a model that is still loading (or failed)."""
+
+    def __init__(self, name: str, state: str, retry_after: int = RETRY_AFTER_SECONDS):
+        super().__init__(f"Model '{name}' is {state}")
+        self.name = name
+        self.state = state
+        self.retry_after = retry_after
+
+
+class _Entry:
+    def __init__(self, name, loader, warm):
+        self.name = name
+        self.loader = loader
+        self.warm = warm
+        self.state = "pending"
+        self.value = None
+        self.error = None
+        self.load_seconds = None
+        self.failures = 0
+        self.retry_at = 0.0
+        self.lock = threading.Lock()
+        self.loaded = threading.Event()
+
+    def retry_after(self) -> int:
+        if self.state != "failed":
+            return RETRY_AFTER_SECONDS
+        return max(1, int(self.retry_at - time.monotonic() + 0.999))
+
+
+class ModelRegistry:
+    """Loads heavy models on first use or in a background warm-up thread.
+
+    Nothing is loaded at import time, so routes that need no model are
+    served as soon as the app starts. A loader may get() the models it
+    depends on; those nested waits have no timeout. A failed load is
+    retried by a later get(), with exponential backoff.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._local = threading.local()
+
+    def register(self, name: str, loader, warm: bool = True):
+        self._entries[name] = _Entry(name, loader, warm)
+
+    def get(self, name: str, timeout: float | None = MODEL_WAIT_TIMEOUT):
+        entry = self._entries[name]
+        if entry.state == "ready":
+            return entry.value
+
+        if getattr(self._local, "loading", 0):
+            # Called from another model's loader: failing here would fail that model too
+            timeout = None
+        self._start(entry)
+        entry.loaded.wait(timeout)
+        if entry.state != "ready":
+            raise ModelNotReady(name, entry.state, entry.retry_after())
+        return entry.value
+
+    def warm_up(self, names=None):
+        """Load models in a background thread, one after another."""
+        if names is None:
+            names = [n for n, e in self._entries.items() if e.warm]
+        # Readiness only waits for the models being warmed
+        for name, entry in self._entries.items():
+            entry.warm = name in names
+
+        def run():
+            for name in names:
+                self._load(self._entries[name])
+
+        threading.Thread(target=run, name="model-warm-up", daemon=True).start()
+
+    def swap(self, name: str, value):
+        """Replace a loaded model in place (hot reload); readers see old or new."""
+        entry = self._entries[name]
+        with entry.lock:
+            entry.value = value
+            entry.state = "ready"
+            entry.error = None
+            entry.loaded.set()
+
+    def status(self) -> dict:
+        return {
+            name: {
+                "state": e.state,
+                "load_seconds": e.load_seconds,
+                "error": e.error,
+                "failures": e.failures,
+            }
+            for name, e in self._entries.items()
+        }
+
+    def ready(self) -> bool:
+        return all(e.state == "ready" for e in self._entries.values() if e.warm)
+
+    # ------------------------------
+    # LOADING
+    # ------------------------------
+    def _start(self, entry):
+        if entry.state == "failed" and time.monotonic() >= entry.retry_at:
+            with entry.lock:
+                if entry.state == "failed":
+                    entry.state = "pending"
+                    entry.loaded.clear()
+        if entry.state == "pending":
+            threading.Thread(
+                target=self._load, args=(entry,), name=f"load-{entry.name}", daemon=True
+            ).start()
+
+    def _load(self, entry):
+        with entry.lock:
+            if entry.state == "ready":
+                return
+            if entry.state == "failed" and time.monotonic() < entry.retry_at:
+                return
+            entry.state = "loading"
+            started = time.perf_counter()
+            self._local.loading = getattr(self._local, "loading", 0) + 1
+            try:
+                entry.value = entry.loader()
+            except Exception as exc:
+                entry.state = "failed"
+                entry.error = f"{exc.__class__.__name__}: {exc}"
+                entry.failures += 1
+                backoff = min(RETRY_AFTER_SECONDS * 2 ** (entry.failures - 1), MAX_RETRY_BACKOFF)
+                entry.retry_at = time.monotonic() + backoff
+            else:
+                entry.state = "ready"
+                entry.error = None
+                entry.failures = 0
+            finally:
+                self._local.loading -= 1
+            entry.load_seconds = round(time.perf_counter() - started, 3)
+            entry.loaded.set()
+
+
+registry = ModelRegistry()
+
+
+def warm_up_from_env():
+    """Warm the models named in WARM_MODELS ("all" by default, or "none")."""
+    setting = os.getenv("WARM_MODELS", "all").strip()
+    if setting == "none":
+        names = []
+    elif setting == "all":
+        names = None
+    else:
+        names = [n.strip() for n in setting.split(",") if n.strip()]
+    registry.warm_up(names)
@@ -1,15 +1,115 @@
-from sqlalchemy import Column, Integer, String, Float, Date
+from sqlalchemy import BigInteger, Column, Integer, String, Float, Date, DateTime, ForeignKey, Index, Text, UniqueConstraint, func
 from database import Base
 
 class Transaction(Base):
     __tablename__ = "transactions"
+    __table_args__ = (
+        Index("ix_transactions_type_date", "type", "date"),
+        Index("ix_transactions_payment_type_installments", "payment_method", "type", "installments"),
+        Index("ix_transactions_anomaly_score", "anomaly_score"),
+        Index("ix_transactions_amount_date", "amount", "date"),   # duplicate blocking
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    date = Column(String)
+    date = Column(Date)
     amount = Column(Float)
     description = Column(String)
     category = Column(String)
     type = Column(String)
     payment_method = Column(String)
     installments = Column(Integer)
-    monthly_payment = Column(Float)
\ No newline at end of file
+    monthly_payment = Column(Float)
+    anomaly_score = Column(Float, nullable=True)   # set for expenses once a model exists
+    category_source = Column(String, nullable=True)   # "model" | "user" (hand-corrected); NULL on older rows
+
+
+class MonthlyRollup(Base):
+    """Running totals per (month, type, category), kept in step with transactions."""
+    __tablename__ = "monthly_rollups"
+
+    month = Column(String, primary_key=True)      # "2025-05", "" if the date is unparseable
+    type = Column(String, primary_key=True)       # "" when the transaction has no type
+    category = Column(String, primary_key=True)
+    total = Column(Float, nullable=False, default=0.0)
+    count = Column(Integer, nullable=False, default=0)
+
+
+class DataVersion(Base):
+    """Single-row counter bumped by every transaction that writes `transactions`."""
+    __tablename__ = "data_version"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+
+class InstallmentSchedule(Base):
+    """One row per credit-card installment: which transaction, due when, how much."""
+    __tablename__ = "installment_schedule"
+    __table_args__ = (
+        Index("ix_installment_schedule_due_month", "due_month", "amount"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    transaction_id = Column(Integer, ForeignKey("transactions.id", ondelete="CASCADE"), nullable=False, index=True)
+    number = Column(Integer, nullable=False)        # 1..installments
+    due_month = Column(Date, nullable=False)        # first day of the month it is due
+    amount = Column(Float, nullable=False)
+
+
+class ReceiptScan(Base):
+    """One OCR run over an uploaded receipt, with per-engine timings."""
+    __tablename__ = "receipt_scans"
+
+    id = Column(Integer, primary_key=True, index=True)
+    transaction_id = Column(Integer, ForeignKey("transactions.id", ondelete="SET NULL"), nullable=True, index=True)
+    mode = Column(String, nullable=False)          # engine requested: tesseract | easyocr | cascade
+    engine = Column(String, nullable=False)        # engine whose text was used
+    confidence = Column(Float)
+    ocr_ms = Column(Float)                         # all attempts, excluding preprocessing
+    preprocess_ms = Column(Float)
+    attempts = Column(Text)                        # JSON: [{"engine", "ms", "confidence"}]
+    raw_text = Column(Text)
+    items = Column(Text)                           # JSON: [{"description", "quantity", "amount", "category"}]
+    image_hash = Column(BigInteger, index=True)    # dHash of the photo, as a signed 64-bit int
+    created_at = Column(DateTime, server_default=func.now())
+
+
+class DuplicatePair(Base):
+    """A transaction that looks like a copy of an earlier one, awaiting review.
+
+    No foreign keys: a merged pair is kept as a record of the merge after
+    one of its transactions is deleted.
+    """
+    __tablename__ = "duplicate_pairs"
+    __table_args__ = (UniqueConstraint("transaction_id", "duplicate_of_id"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    transaction_id = Column(Integer, nullable=False, index=True)
+    duplicate_of_id = Column(Integer, nullable=False, index=True)
+    reason = Column(String, nullable=False)        # "image" | "description"
+    similarity = Column(Float)
+    status = Column(String, nullable=False, default="pending", index=True)   # pending | merged | dismissed
+    created_at = Column(DateTime, server_default=func.now())
+
+
+class CategoryCorrection(Base):
+    """A category the user changed by hand; feeds classifier retraining."""
+    __tablename__ = "category_corrections"
+
+    id = Column(Integer, primary_key=True, index=True)
+    transaction_id = Column(Integer, ForeignKey("transactions.id", ondelete="SET NULL"), nullable=True, index=True)
+    description = Column(String, nullable=False)
+    previous_category = Column(String)
+    category = Column(String, nullable=False)
+    created_at = Column(DateTime, server_default=func.now())
+
+
+class UnparsedDate(Base):
+    """The original text of a legacy date the migration couldn't parse.
+
+    The transaction's date is NULL; this keeps the value so it can be fixed by hand.
+    """
+    __tablename__ = "unparsed_dates"
+
+    transaction_id = Column(Integer, primary_key=True)
+    value = Column(String, nullable=False)
@@ -0,0 +1,141 @@
+"""OCR engine interface with tesseract and EasyOCR implementations.
+
+Engines are created lazily, once per worker process. The `cascade` mode runs
+fast tesseract first and only escalates to EasyOCR when tesseract's mean
+word confidence is below OCR_CASCADE_MIN_CONFIDENCE. If tesseract can't be
+used (pytesseract not installed, or no tesseract binary on PATH), the
+cascade logs a warning once and runs EasyOCR alone.
+"""
+import logging
+import os
+import time
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+import receipt_parser
+import receipt_preprocess
+
+
+logger = logging.getLogger(__name__)
+
+OCR_CASCADE_MIN_CONFIDENCE = float(os.getenv("OCR_CASCADE_MIN_CONFIDENCE", "0.6"))
+
+
+class OcrResult:
+    def __init__(self, engine: str, words: list[dict], ms: float):
+        self.engine = engine
+        # [{"text", "confidence" (0-1), "box": [x0, y0, x1, y1]}]
+        self.words = words
+        self.ms = ms
+
+    @property
+    def text(self) -> str:
+        return "\n".join(receipt_parser.group_lines(self.words))
+
+    @property
+    def confidence(self) -> float:
+        if not self.words:
+            return 0.0
+        return float(np.mean([w["confidence"] for w in self.words]))
+
+    def to_dict(self) -> dict:
+        return {
+            "engine": self.engine,
+            "text": self.text,
+            "words": self.words,
+            "confidence": round(self.confidence, 4),
+            "ms": round(self.ms, 1),
+        }
+
+
+class OcrEngine(ABC):
+    name = None
+
+    def read(self, image) -> OcrResult:
+        started = time.perf_counter()
+        words = self._words(image)
+        return OcrResult(self.name, words, 1000 * (time.perf_counter() - started))
+
+    @abstractmethod
+    def _words(self, image) -> list[dict]:
+        """Words found in the image, in OcrResult.words form."""
+
+
+class TesseractEngine(OcrEngine):
+    name = "tesseract"
+
+    def __init__(self):
+        import pytesseract
+        self._tesseract = pytesseract
+        # Fails here, not on the first receipt, when the binary is missing
+        pytesseract.get_tesseract_version()
+
+    def _words(self, image):
+        image = receipt_preprocess.binarize(image)
+        data = self._tesseract.image_to_data(image, output_type=self._tesseract.Output.DICT)
+        words = []
+        for i, text in enumerate(data["text"]):
+            conf = float(data["conf"][i])
+            if not text.strip() or conf < 0:
+                continue
+            x, y, w, h = data["left"][i], data["top"][i], data["width"][i], data["height"][i]
+            words.append({"text": text, "confidence": conf / 100, "box": [x, y, x + w, y + h]})
+        return words
+
+
+class EasyOcrEngine(OcrEngine):
+    name = "easyocr"
+
+    def __init__(self):
+        import easyocr
+        self._reader = easyocr.Reader(["en", "es"], gpu=False)
+
+    def _words(self, image):
+        words = []
+        for points, text, conf in self._reader.readtext(np.array(image.convert("L")), detail=1):
+            xs = [int(p[0]) for p in points]
+            ys = [int(p[1]) for p in points]
+            words.append({"text": text, "confidence": float(conf), "box": [min(xs), min(ys), max(xs), max(ys)]})
+        return words
+
+
+ENGINES = {engine.name: engine for engine in (TesseractEngine, EasyOcrEngine)}
+MODES = (*ENGINES, "cascade")
+
+_instances = {}
+_unavailable = {}
+
+
+def get_engine(name: str) -> OcrEngine:
+    if name not in _instances:
+        if name not in ENGINES:
+            raise ValueError(f"Unknown OCR engine: {name}")
+        _instances[name] = ENGINES[name]()
+    return _instances[name]
+
+
+def recognize(mode: str, image) -> tuple[OcrResult, list[OcrResult]]:
+    """Run one engine, or the cascade. Returns (chosen result, every attempt)."""
+    if mode != "cascade":
+        result = get_engine(mode).read(image)
+        return result, [result]
+
+    if "tesseract" not in _unavailable:
+        try:
+            get_engine("tesseract")
+        except (ImportError, OSError) as exc:
+            # TesseractNotFoundError (no binary) is an OSError
+            _unavailable["tesseract"] = f"{exc.__class__.__name__}: {exc}"
+            logger.warning("tesseract unavailable (%s); the cascade uses EasyOCR only", _unavailable["tesseract"])
+    if "tesseract" in _unavailable:
+        result = get_engine("easyocr").read(image)
+        return result, [result]
+
+    first = get_engine("tesseract").read(image)
+    if first.words and first.confidence >= OCR_CASCADE_MIN_CONFIDENCE:
+        return first, [first]
+
+    second = get_engine("easyocr").read(image)
+    best = second if second.confidence >= first.confidence else first
+    return best, [first, second]
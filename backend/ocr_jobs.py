@@ -0,0 +1,244 @@
+"""OCR job queue backed by a pool of worker processes.
+
+Uploads are turned into jobs and return immediately. Each worker process
+keeps its own warm OCR reader, so the API process never runs OCR itself.
+This module is imported by the spawned workers, so it must not import the
+app (database, routers, models) at module level. Engines live in
+ocr_engines.
+"""
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+
+import metrics
+
+
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", "2"))
+OCR_MAX_QUEUE = int(os.getenv("OCR_MAX_QUEUE", "16"))
+OCR_JOB_TIMEOUT = float(os.getenv("OCR_JOB_TIMEOUT", "120"))
+OCR_ENGINE = os.getenv("OCR_ENGINE", "cascade")
+# EasyOCR is only preloaded when it is the default engine; the cascade
+# loads it in a worker the first time tesseract isn't confident enough
+OCR_WARM_ENGINES = [
+    e for e in os.getenv("OCR_WARM_ENGINES", "easyocr" if OCR_ENGINE == "easyocr" else "").split(",") if e
+]
+OCR_PREPROCESS = os.getenv("OCR_PREPROCESS", "1") != "0"
+KEEP_FINISHED_JOBS = 1000
+
+TERMINAL_STATES = ("done", "failed")
+
+
+# ------------------------------
+# WORKER PROCESS SIDE
+# ------------------------------
+def _init_worker(engines):
+    import ocr_engines
+
+    for engine in engines:
+        ocr_engines.get_engine(engine)
+
+
+def _ping():
+    return os.getpid()
+
+
+def run_ocr(mode: str, image_bytes: bytes, preprocess: bool = OCR_PREPROCESS) -> dict:
+    import io
+    import ocr_engines
+    import receipt_preprocess
+
+    started = time.time()
+    info = None
+    try:
+        image = receipt_preprocess.load(io.BytesIO(image_bytes))
+        image_hash = receipt_preprocess.dhash(image)
+        if preprocess:
+            image, info = receipt_preprocess.preprocess(image)
+        best, attempts = ocr_engines.recognize(mode, image)
+    except Exception as exc:
+        # Engine exceptions aren't always picklable; an unpicklable one
+        # would take down the whole pool instead of failing this job
+        raise RuntimeError(f"{exc.__class__.__name__}: {exc}") from None
+
+    return {
+        **best.to_dict(),
+        "attempts": [
+            {"engine": a.engine, "ms": round(a.ms, 1), "confidence": round(a.confidence, 4)}
+            for a in attempts
+        ],
+        "preprocess": info,
+        "image_hash": image_hash,
+        "pid": os.getpid(),
+        "started": started,
+        "finished": time.time(),
+    }
+
+
+# ------------------------------
+# API PROCESS SIDE
+# ------------------------------
+class QueueFull(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, mode: str):
+        self.id = uuid.uuid4().hex
+        self.mode = mode
+        self.status = "queued"
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.timings = {}
+        self.result = None
+        self.error = None
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "mode": self.mode,
+            "status": self.status,
+            "submitted_at": self.submitted_at,
+            "finished_at": self.finished_at,
+            "timings_ms": self.timings,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class OcrJobQueue:
+    """Bounded job queue in front of a process pool.
+
+    `submit()` raises QueueFull once `max_queue` jobs are queued or running.
+    A pool whose worker crashed, or whose worker overran the job timeout, is
+    torn down and replaced; jobs that were running on it are retried once.
+    `finish(job, ocr)` runs in the API process after OCR (parsing,
+    prediction, persistence) with the dict returned by `run_ocr`, and its
+    return value becomes the job result.
+    """
+
+    def __init__(self, workers: int = OCR_WORKERS, max_queue: int = OCR_MAX_QUEUE,
+                 timeout: float = OCR_JOB_TIMEOUT):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._pool = None
+        self._recycled = 0
+        self._dispatch = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ocr-job")
+
+    def _processes(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # spawn, not fork: the API process holds torch/threads that don't survive fork
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(OCR_WARM_ENGINES,),
+                )
+            return self._pool
+
+    def _recycle(self, pool: ProcessPoolExecutor):
+        with self._lock:
+            if self._pool is not pool:
+                return   # another job already replaced it
+            self._pool = None
+            self._recycled += 1
+        # Kill the workers: shutdown() alone would wait on a stuck one forever
+        for process in list((pool._processes or {}).values()):
+            process.terminate()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def warm_up(self):
+        """Start every worker process and wait for its readers to load."""
+        pool = self._processes()
+        return sorted({f.result() for f in [pool.submit(_ping) for _ in range(self.workers)]})
+
+    def submit(self, mode: str, image_bytes: bytes, finish) -> Job:
+        job = Job(mode)
+        with self._lock:
+            active = sum(1 for j in self._jobs.values() if j.status not in TERMINAL_STATES)
+            if active >= self.max_queue:
+                raise QueueFull(f"{active} OCR jobs already pending")
+            self._jobs[job.id] = job
+            self._prune()
+        self._dispatch.submit(self._run, job, image_bytes, finish)
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        return self._jobs.get(job_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        by_status = {}
+        for job in jobs:
+            by_status[job.status] = by_status.get(job.status, 0) + 1
+        done = [j.timings["total"] for j in jobs if j.status == "done"]
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "jobs": by_status,
+            "avg_total_ms": round(sum(done) / len(done), 1) if done else None,
+            "pools_recycled": self._recycled,
+        }
+
+    def _ocr(self, job: Job, image_bytes: bytes) -> dict:
+        for attempt in range(2):
+            pool = self._processes()
+            try:
+                return pool.submit(run_ocr, job.mode, image_bytes).result(timeout=self.timeout)
+            except TimeoutError:
+                # The worker would keep running and hold its slot; free it
+                self._recycle(pool)
+                raise
+            except BrokenProcessPool:
+                # A worker died (or the pool was recycled under this job)
+                self._recycle(pool)
+                if attempt:
+                    raise
+
+    def _run(self, job: Job, image_bytes: bytes, finish):
+        job.status = "running"
+        job.started_at = time.time()
+        status = "failed"
+        try:
+            ocr = self._ocr(job, image_bytes)
+            for attempt in ocr["attempts"]:
+                metrics.spans.observe(attempt["ms"] / 1000, span=f"ocr.engine.{attempt['engine']}")
+            post_started = time.time()
+            job.result = finish(job, ocr)
+            preprocess_ms = ocr["preprocess"]["ms"] if ocr["preprocess"] else 0.0
+            job.timings = {
+                "queue": round(1000 * (ocr["started"] - job.submitted_at), 1),
+                "preprocess": preprocess_ms,
+                "ocr": round(1000 * (ocr["finished"] - ocr["started"]) - preprocess_ms, 1),
+                "post": round(1000 * (time.time() - post_started), 1),
+            }
+            status = "done"
+        except TimeoutError:
+            job.error = f"OCR did not finish within {self.timeout:.0f}s"
+        except Exception as exc:
+            job.error = f"{exc.__class__.__name__}: {exc}"
+        finally:
+            job.finished_at = time.time()
+            job.timings["total"] = round(1000 * (job.finished_at - job.submitted_at), 1)
+            job.status = status
+            # Stages ran in a worker process; record them here, where /metrics lives
+            for stage, ms in job.timings.items():
+                metrics.spans.observe(ms / 1000, span=f"ocr.{stage}")
+
+    def _prune(self):
+        finished = [k for k, j in self._jobs.items() if j.status in TERMINAL_STATES]
+        for key in finished[:max(0, len(finished) - KEEP_FINISHED_JOBS)]:
+            del self._jobs[key]
+
+
+jobs = OcrJobQueue()
@@ -0,0 +1,225 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+import metrics
+
+
+_WHITESPACE = re.compile(r"\s+")
+# Another model's entries are deleted once nothing has opened or written them for this long
+FINGERPRINT_TTL_SECONDS = float(os.getenv("PREDICTION_CACHE_FINGERPRINT_TTL", str(7 * 86400)))
+
+
+def normalize(text: str) -> str:
+    """Cache key for a description: case- and whitespace-insensitive."""
+    return _WHITESPACE.sub(" ", text).strip().lower()
+
+
+def fingerprint(*paths: str) -> str:
+    """Content hash of model files, so a new model never reuses old entries."""
+    digest = hashlib.sha256()
+    for path in paths:
+        if os.path.isdir(path):
+            files = sorted(
+                os.path.join(root, name)
+                for root, _, names in os.walk(path)
+                for name in names
+            )
+        else:
+            files = [path]
+        for file in files:
+            digest.update(os.path.relpath(file, path).encode())
+            with open(file, "rb") as fh:
+                for block in iter(lambda: fh.read(1 << 20), b""):
+                    digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+class LRUCache:
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class DiskCache:
+    """SQLite table of (fingerprint, text) -> (category, embedding).
+
+    Processes running different models (another worker, a rollback) can
+    share the file, so each fingerprint records when it was last used.
+    """
+
+    def __init__(self, path: str, model_fingerprint: str):
+        self.model_fingerprint = model_fingerprint
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS prediction_cache ("
+                " fingerprint TEXT NOT NULL,"
+                " text TEXT NOT NULL,"
+                " category TEXT NOT NULL,"
+                " embedding BLOB NOT NULL,"
+                " PRIMARY KEY (fingerprint, text))"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS prediction_cache_fingerprints ("
+                " fingerprint TEXT PRIMARY KEY,"
+                " last_used REAL NOT NULL)"
+            )
+            self._touch()
+            # Entries of models nobody uses any more can never be hit again
+            stale = time.time() - FINGERPRINT_TTL_SECONDS
+            self._conn.execute(
+                "DELETE FROM prediction_cache WHERE fingerprint NOT IN"
+                " (SELECT fingerprint FROM prediction_cache_fingerprints WHERE last_used >= ?)",
+                (stale,),
+            )
+            self._conn.execute("DELETE FROM prediction_cache_fingerprints WHERE last_used < ?", (stale,))
+
+    def _touch(self):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO prediction_cache_fingerprints VALUES (?, ?)",
+            (self.model_fingerprint, time.time()),
+        )
+
+    def close(self):
+        """Release the connection; the cache then behaves as empty."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def get_many(self, keys: list[str]) -> dict:
+        found = {}
+        with self._lock:
+            if self._conn is None:
+                return found
+            # Stay well under SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                part = keys[start:start + 500]
+                marks = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT text, category, embedding FROM prediction_cache"
+                    f" WHERE fingerprint = ? AND text IN ({marks})",
+                    (self.model_fingerprint, *part),
+                )
+                for text, category, blob in rows:
+                    found[text] = (category, np.frombuffer(blob, dtype=np.float32))
+        return found
+
+    def put_many(self, entries: dict):
+        with self._lock:
+            if self._conn is None:
+                return
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO prediction_cache VALUES (?, ?, ?, ?)",
+                    [
+                        (self.model_fingerprint, key, category, np.asarray(emb, dtype=np.float32).tobytes())
+                        for key, (category, emb) in entries.items()
+                    ],
+                )
+                self._touch()
+
+    def __len__(self):
+        with self._lock:
+            if self._conn is None:
+                return 0
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM prediction_cache WHERE fingerprint = ?",
+                (self.model_fingerprint,),
+            ).fetchone()[0]
+
+
+class PredictionCache:
+    """In-process LRU in front of a persistent SQLite store.
+
+    Values are (category, embedding) pairs keyed by normalized description.
+    """
+
+    def __init__(self, path: str, model_fingerprint: str, maxsize: int = 10_000):
+        self.memory = LRUCache(maxsize)
+        self.disk = DiskCache(path, model_fingerprint)
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get_many(self, texts: list[str]) -> dict:
+        """Return {normalized text: (category, embedding)} for cached texts."""
+        found, missing = {}, []
+        for key in dict.fromkeys(normalize(t) for t in texts):
+            value = self.memory.get(key)
+            if value is None:
+                missing.append(key)
+            else:
+                found[key] = value
+
+        from_disk = self.disk.get_many(missing) if missing else {}
+        for key, value in from_disk.items():
+            self.memory.put(key, value)
+        found.update(from_disk)
+
+        with self._lock:
+            self.disk_hits += len(from_disk)
+            self.memory_hits += len(found) - len(from_disk)
+            self.misses += len(missing) - len(from_disk)
+        metrics.cache_lookup("prediction", "memory_hit", len(found) - len(from_disk))
+        metrics.cache_lookup("prediction", "disk_hit", len(from_disk))
+        metrics.cache_lookup("prediction", "miss", len(missing) - len(from_disk))
+        return found
+
+    def get(self, text: str):
+        return self.get_many([text]).get(normalize(text))
+
+    def peek(self, text: str):
+        """Memory-tier lookup that doesn't count towards hit/miss stats."""
+        return self.memory.get(normalize(text))
+
+    def put_many(self, entries: dict):
+        """Store {normalized text: (category, embedding)}."""
+        for key, value in entries.items():
+            self.memory.put(key, value)
+        self.disk.put_many(entries)
+
+    def close(self):
+        self.disk.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            hits = self.memory_hits + self.disk_hits
+            return {
+                "fingerprint": self.disk.model_fingerprint,
+                "memory_entries": len(self.memory),
+                "memory_max_entries": self.memory.maxsize,
+                "disk_entries": len(self.disk),
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            }
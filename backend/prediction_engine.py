@@ -0,0 +1,16 @@
+from micro_batcher import MicroBatcher
+
+
+class PredictionEngine(MicroBatcher):
+    """Micro-batching front end for a batch prediction function.
+
+    Concurrent predict() calls are grouped and `predict_batch` runs once
+    per group (see MicroBatcher).
+    """
+
+    def __init__(self, predict_batch, window_ms: float = 5.0, max_batch: int = 64,
+                 name: str = "prediction-engine"):
+        super().__init__(predict_batch, window_ms=window_ms, max_batch=max_batch, name=name)
+
+    def predict(self, item, timeout: float | None = None):
+        return self.call(item, timeout=timeout)
@@ -0,0 +1,90 @@
+"""Opt-in sampling profiler for slow requests.
+
+While a request is profiled, a background thread samples every thread's
+Python stack every PROFILE_INTERVAL_MS. Stacks are written in the
+"folded" format (`frame;frame;frame count`), which flamegraph.pl,
+speedscope and inferno read directly:
+
+    flamegraph.pl profiles/<file>.folded > flame.svg
+
+Turn it on per request with an `X-Profile: 1` header, or for every
+request with PROFILE_REQUESTS=1. Only requests slower than
+PROFILE_THRESHOLD_MS are written to PROFILE_DIR; a header-requested
+profile is written regardless of its duration, and the response's
+`X-Profile-Id` header names its file (`PROFILE_DIR/<id>-*.folded`).
+All threads are sampled (sync endpoints run on a worker pool), so
+profile on a quiet server to keep other requests out of the picture.
+"""
+import os
+import re
+import secrets
+import sys
+import threading
+import time
+from collections import Counter
+
+
+PROFILE_REQUESTS = os.getenv("PROFILE_REQUESTS", "0") == "1"
+PROFILE_THRESHOLD_MS = float(os.getenv("PROFILE_THRESHOLD_MS", "500"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+# A sampler whose request never finishes its body stops on its own after this
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "120"))
+
+# Leaf frames of threads that are just waiting for work
+_IDLE = {("threading.py", "wait"), ("queue.py", "get"), ("selectors.py", "select"),
+         ("threading.py", "_wait_for_tstate_lock")}
+
+
+def requested(headers) -> bool:
+    return PROFILE_REQUESTS or headers.get("x-profile") == "1"
+
+
+class Sampler:
+    def __init__(self, interval_ms: float = PROFILE_INTERVAL_MS):
+        self.id = f"{time.strftime('%Y%m%d-%H%M%S')}-{secrets.token_hex(4)}"
+        self.interval = interval_ms / 1000
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        me = threading.get_ident()
+        names = {}
+        deadline = time.monotonic() + PROFILE_MAX_SECONDS
+        while not self._stop.wait(self.interval) and time.monotonic() < deadline:
+            self.samples += 1
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                code = frame.f_code
+                if (os.path.basename(code.co_filename), code.co_name) in _IDLE:
+                    continue
+                if ident not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def dump(self, label: str, elapsed_ms: float) -> str:
+        """Write the folded stacks under PROFILE_DIR; returns the profile id."""
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", label).strip("_")
+        path = os.path.join(PROFILE_DIR, f"{self.id}-{slug}-{elapsed_ms:.0f}ms.folded")
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        return self.id
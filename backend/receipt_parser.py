@@ -0,0 +1,231 @@
+"""Structured parsing of OCR'd receipts.
+
+Rebuilds text lines from OCR word boxes, then finds the merchant, date
+(normalized to ISO), TOTAL / subtotal / tax and line items. Amounts may use
+either `1.234,56` or `1,234.56`. Everything is regex on a few dozen lines, so
+it runs inline in the request; categorizing the items is left to the caller
+as one batched prediction.
+"""
+import datetime as dt
+import re
+
+
+# ------------------------------
+# PATTERNS
+# ------------------------------
+NUMERIC_DATE = re.compile(r"(?<!\d)(\d{1,4})[/.\-](\d{1,2})[/.\-](\d{2,4})(?!\d)")
+DAY_MONTH_YEAR = re.compile(r"\b(\d{1,2})\s+(?:de\s+)?([a-záé]{3,10})\.?,?\s+(?:de\s+)?(\d{4})\b", re.IGNORECASE)
+MONTH_DAY_YEAR = re.compile(r"\b([a-z]{3,9})\.?\s+(\d{1,2}),?\s+(\d{4})\b", re.IGNORECASE)
+TIME = re.compile(r"\b\d{1,2}:\d{2}(?::\d{2})?\b")
+
+# A number with a decimal part, or any number right after a currency sign
+AMOUNT = re.compile(
+    r"(?<![\d.,])(-)?(?:([$€£])\s?)?"
+    r"(\d{1,3}(?:[.,]\d{3})+(?:[.,]\d{1,2})?|\d+[.,]\d{1,2}|(?<=[$€£])\d+|(?<=[$€£]\s)\d+)"
+    r"(?!\d|[.,]\d)"
+)
+BARE_NUMBER = re.compile(r"(?<![\d.,])(\d+)(?![\d.,])")
+
+TOTAL = re.compile(
+    r"\b(?:(grand\s+total|total\s+a\s+pagar|importe\s+total|amount\s+due|balance\s+due)|(total|a\s+pagar))\b",
+    re.IGNORECASE,
+)
+SUBTOTAL = re.compile(r"\bsub\s*-?\s*total\b", re.IGNORECASE)
+TAX = re.compile(r"\b(?:tax|iva|vat|impuestos?)\b", re.IGNORECASE)
+NOT_AN_ITEM = re.compile(
+    r"\b(?:cash|efectivo|change|cambio|vuelto|card|tarjeta|visa|mastercard|amex|debit|d[eé]bito|credit|"
+    r"cr[eé]dito|payment|pago|tip|propina|items?|art[ií]culos?|cuit|tel|phone|invoice|factura|ticket)\b",
+    re.IGNORECASE,
+)
+QUANTITY = re.compile(r"^\s*(\d{1,3})\s*(?:x|@|×|un\.?)\s+", re.IGNORECASE)
+LETTERS = re.compile(r"[^\W\d_]{2,}")
+
+MONTHS = {
+    "jan": 1, "ene": 1, "feb": 2, "mar": 3, "apr": 4, "abr": 4, "may": 5, "jun": 6,
+    "jul": 7, "aug": 8, "ago": 8, "sep": 9, "set": 9, "oct": 10, "nov": 11, "dec": 12, "dic": 12,
+}
+
+
+# ------------------------------
+# LINES
+# ------------------------------
+def group_lines(words: list[dict]) -> list[str]:
+    """Rebuild text lines from OCR words with `box = [x0, y0, x1, y1]`.
+
+    A word joins the current line while its vertical middle falls inside
+    the line's running top/bottom, which tolerates mixed font sizes and the
+    slight skew left after deskewing.
+    """
+    lines = []  # [top, bottom, words]
+    for word in sorted(words, key=lambda w: (w["box"][1] + w["box"][3]) / 2):
+        x0, y0, x1, y1 = word["box"]
+        middle = (y0 + y1) / 2
+        if lines and lines[-1][0] <= middle <= lines[-1][1]:
+            line = lines[-1]
+            n = len(line[2])
+            line[0] = (line[0] * n + y0) / (n + 1)
+            line[1] = (line[1] * n + y1) / (n + 1)
+            line[2].append(word)
+        else:
+            lines.append([y0, y1, [word]])
+    return [" ".join(w["text"] for w in sorted(line[2], key=lambda w: w["box"][0])) for line in lines]
+
+
+# ------------------------------
+# VALUES
+# ------------------------------
+def parse_amount(number: str) -> float:
+    """'1.234,56', '1,234.56', '1234,5', '1,234' -> float."""
+    if "," in number and "." in number:
+        decimal = "," if number.rfind(",") > number.rfind(".") else "."
+    elif number.count(",") + number.count(".") == 1:
+        sep = "," if "," in number else "."
+        whole, frac = number.split(sep)
+        # One separator followed by exactly three digits is a thousands separator
+        decimal = None if len(frac) == 3 and whole != "0" else sep
+    else:
+        decimal = None
+    thousands = {",", "."} - {decimal}
+    for sep in thousands:
+        number = number.replace(sep, "")
+    return float(number.replace(",", ".") if decimal else number)
+
+
+def _valid_date(year: int, month: int, day: int, today: dt.date):
+    if year < 100:
+        year += 2000
+    try:
+        date = dt.date(year, month, day)
+    except ValueError:
+        return None
+    # Anything outside this range is a misread or another number entirely
+    return date if dt.date(2000, 1, 1) <= date <= today + dt.timedelta(days=1) else None
+
+
+def find_dates(line: str, today: dt.date | None = None) -> list[dt.date]:
+    today = today or dt.date.today()
+    dates = []
+    for a, b, c in NUMERIC_DATE.findall(line):
+        if len(a) == 4:
+            date = _valid_date(int(a), int(b), int(c), today)
+        else:
+            # Day first, falling back to US month-first when that's impossible
+            date = _valid_date(int(c), int(b), int(a), today) or _valid_date(int(c), int(a), int(b), today)
+        if date:
+            dates.append(date)
+    for day, month, year in DAY_MONTH_YEAR.findall(line):
+        month = MONTHS.get(month[:3].lower())
+        date = month and _valid_date(int(year), month, int(day), today)
+        if date:
+            dates.append(date)
+    for month, day, year in MONTH_DAY_YEAR.findall(line):
+        month = MONTHS.get(month[:3].lower())
+        date = month and _valid_date(int(year), month, int(day), today)
+        if date:
+            dates.append(date)
+    return dates
+
+
+def find_amounts(line: str) -> list[float]:
+    """Amounts in a line, left to right, ignoring dates and times."""
+    line = TIME.sub(" ", NUMERIC_DATE.sub(" ", line))
+    return [
+        -parse_amount(number) if minus else parse_amount(number)
+        for minus, _, number in AMOUNT.findall(line)
+    ]
+
+
+# ------------------------------
+# RECEIPT
+# ------------------------------
+def _total(lines: list[str], amounts: list[list[float]]):
+    """(line index, amount) of the best TOTAL line, or None."""
+    best = None
+    for i, line in enumerate(lines):
+        match = TOTAL.search(SUBTOTAL.sub(" ", line))
+        if not match:
+            continue
+        values = amounts[i]
+        if not values:
+            # "TOTAL" on its own line with the amount printed below it
+            if i + 1 < len(lines) and amounts[i + 1]:
+                values = amounts[i + 1]
+            else:
+                values = [float(n) for n in BARE_NUMBER.findall(TIME.sub(" ", NUMERIC_DATE.sub(" ", line)))]
+        if not values:
+            continue
+        # Explicit "grand total" / "total a pagar" beats a plain "total"
+        rank = (match.group(1) is not None, values[-1])
+        if best is None or rank > best[0]:
+            best = (rank, i, values[-1])
+    return (best[1], best[2]) if best else None
+
+
+def _item(line: str, values: list[float]):
+    if not values or TOTAL.search(line) or SUBTOTAL.search(line) or TAX.search(line) or NOT_AN_ITEM.search(line):
+        return None
+    # Description is what's left of the line before the first amount
+    description = AMOUNT.split(TIME.sub(" ", NUMERIC_DATE.sub(" ", line)), maxsplit=1)[0]
+    quantity = QUANTITY.match(description)
+    if quantity:
+        description = description[quantity.end():]
+    description = description.strip(" .:-*$€£")
+    if not LETTERS.search(description):
+        return None
+    return {
+        "description": description,
+        "quantity": int(quantity.group(1)) if quantity else 1,
+        "amount": values[-1],
+    }
+
+
+def parse_lines(lines: list[str], today: dt.date | None = None) -> dict:
+    lines = [line.strip() for line in lines if line.strip()]
+    amounts = [find_amounts(line) for line in lines]
+
+    date = None
+    for line in lines:
+        found = find_dates(line, today)
+        if found:
+            date = found[0]
+            break
+
+    subtotal = next((a[-1] for line, a in zip(lines, amounts) if a and SUBTOTAL.search(line)), None)
+    tax = next((a[-1] for line, a in zip(lines, amounts) if a and TAX.search(line) and not TOTAL.search(line)), None)
+
+    total = _total(lines, amounts)
+    if total is not None:
+        total_line, total_amount = total
+    else:
+        total_line = len(lines)
+        if subtotal is not None:
+            total_amount = round(subtotal + (tax or 0), 2)
+        else:
+            total_amount = max((v for a in amounts for v in a), default=None)
+
+    # Items are priced lines above the totals block
+    end = min([total_line] + [i for i, line in enumerate(lines) if SUBTOTAL.search(line)])
+    items = [item for item in (_item(lines[i], amounts[i]) for i in range(end)) if item]
+
+    merchant = next(
+        (line for line, a in zip(lines, amounts) if not a and LETTERS.search(line) and not find_dates(line, today)),
+        None,
+    )
+
+    return {
+        "merchant": merchant[:60] if merchant else None,
+        "date": date,
+        "total": total_amount,
+        "subtotal": subtotal,
+        "tax": tax,
+        "items": items,
+        "lines": lines,
+    }
+
+
+def parse_text(text: str, today: dt.date | None = None) -> dict:
+    return parse_lines(text.splitlines(), today)
+
+
+def parse_words(words: list[dict], today: dt.date | None = None) -> dict:
+    return parse_lines(group_lines(words), today)
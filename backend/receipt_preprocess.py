@@ -0,0 +1,146 @@
+"""Image clean-up ahead of OCR for phone-camera receipt photos.
+
+Steps: EXIF orientation fix, downscale (decoding JPEGs at reduced size where
+possible), grayscale, crop to the bright paper region, deskew, then crop
+to the area that actually contains ink so the recognizer only sees text.
+Engines that want a binary image call `binarize()` themselves. Pure PIL +
+NumPy, so it runs inside the OCR worker processes.
+"""
+import os
+import time
+
+import numpy as np
+from PIL import Image, ImageOps
+
+
+# ~2000 px on the long side is ~300 DPI for a typical 80 mm x 170 mm receipt
+OCR_MAX_SIDE = int(os.getenv("OCR_MAX_SIDE", "2000"))
+ANALYSIS_SIDE = 400            # working size for paper detection
+DESKEW_SIDE = 800              # working size for skew detection (text must stay legible)
+DESKEW_ANGLES = np.arange(-6.0, 6.01, 0.5)
+MARGIN = 0.02                  # fraction of width/height kept around crops
+
+
+def otsu_threshold(gray: np.ndarray) -> int:
+    hist = np.bincount(gray.ravel(), minlength=256).astype(float)
+    total = hist.sum()
+    weight_bg = np.cumsum(hist)
+    weight_fg = total - weight_bg
+    cum_mean = np.cumsum(hist * np.arange(256))
+    mean_bg = cum_mean / np.maximum(weight_bg, 1)
+    mean_fg = (cum_mean[-1] - cum_mean) / np.maximum(weight_fg, 1)
+    between = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+    return int(np.argmax(between))
+
+
+def _bounding_box(mask: np.ndarray, min_fraction: float, max_fraction: float = 1.0):
+    """Rows/cols where between `min_fraction` and `max_fraction` of pixels are set."""
+    row_fill, col_fill = mask.mean(axis=1), mask.mean(axis=0)
+    rows = np.flatnonzero((row_fill > min_fraction) & (row_fill <= max_fraction))
+    cols = np.flatnonzero((col_fill > min_fraction) & (col_fill <= max_fraction))
+    if len(rows) == 0 or len(cols) == 0:
+        return None
+    return cols[0], rows[0], cols[-1] + 1, rows[-1] + 1
+
+
+def _scale_box(box, from_size, to_size, margin=MARGIN):
+    sx, sy = to_size[0] / from_size[0], to_size[1] / from_size[1]
+    mx, my = margin * to_size[0], margin * to_size[1]
+    left, top, right, bottom = box
+    return (
+        max(0, int(left * sx - mx)),
+        max(0, int(top * sy - my)),
+        min(to_size[0], int(right * sx + mx)),
+        min(to_size[1], int(bottom * sy + my)),
+    )
+
+
+def _paper_box(small: np.ndarray):
+    """Bright receipt paper against a darker background, if there is one."""
+    paper = small > otsu_threshold(small)
+    box = _bounding_box(paper, 0.3)
+    if box is None:
+        return None
+    area = (box[2] - box[0]) * (box[3] - box[1]) / small.size
+    # Nothing to gain (or a bad detection) outside this range
+    return box if 0.15 < area < 0.9 else None
+
+
+def _skew_angle(image: Image.Image) -> float:
+    """Angle whose row-projection profile of ink is sharpest."""
+    small = image.copy()
+    small.thumbnail((DESKEW_SIDE, DESKEW_SIDE))
+    w, h = small.size
+    # Inset so paper edges and background corners don't count as ink
+    small = np.asarray(small.crop((w // 20, h // 20, w - w // 20, h - h // 20)))
+    ink = Image.fromarray(((small < otsu_threshold(small)) * 255).astype(np.uint8))
+    best, best_score = 0.0, -1.0
+    for angle in DESKEW_ANGLES:
+        profile = np.asarray(ink.rotate(angle, fillcolor=0), dtype=float).sum(axis=1)
+        score = profile.var()
+        if score > best_score:
+            best, best_score = float(angle), score
+    return best
+
+
+def binarize(image: Image.Image) -> Image.Image:
+    """Otsu black/white version of a grayscale image."""
+    gray = np.asarray(image.convert("L"))
+    return Image.fromarray(np.where(gray < otsu_threshold(gray), 0, 255).astype(np.uint8))
+
+
+def dhash(image: Image.Image, size: int = 8) -> int:
+    """64-bit difference hash; re-uploads of one photo land a few bits apart."""
+    small = ImageOps.exif_transpose(image).convert("L").resize((size + 1, size), Image.BILINEAR)
+    pixels = np.asarray(small, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def load(image_bytes_or_file, max_side: int = OCR_MAX_SIDE) -> Image.Image:
+    image = Image.open(image_bytes_or_file)
+    # draft() changes .size; preprocess() reports the size of the upload
+    image.info["original_size"] = image.size
+    # JPEG decoder can downscale by 1/2, 1/4, 1/8 while decoding
+    image.draft("RGB", (max_side, max_side))
+    return image
+
+
+def preprocess(image: Image.Image, max_side: int = OCR_MAX_SIDE):
+    """Return (cleaned grayscale image, info dict)."""
+    started = time.perf_counter()
+    info = {"original_size": image.info.get("original_size", image.size)}
+
+    image = ImageOps.exif_transpose(image)
+    image = image.convert("L")
+    if max(image.size) > max_side:
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+
+    small_img = image.copy()
+    small_img.thumbnail((ANALYSIS_SIDE, ANALYSIS_SIDE))
+    small = np.asarray(small_img)
+
+    paper = _paper_box(small)
+    if paper is not None:
+        # Slight inset so the paper edge and background don't read as ink
+        image = image.crop(_scale_box(paper, small_img.size, image.size, margin=-0.01))
+    info["paper_crop"] = paper is not None
+
+    angle = _skew_angle(image)
+    if angle:
+        image = image.rotate(angle, resample=Image.BICUBIC, expand=True, fillcolor=255)
+    info["deskew_angle"] = angle
+
+    gray = np.asarray(image)
+    ink = gray < otsu_threshold(gray)
+
+    # Keep only the region that contains text
+    # (near-solid rows/cols are borders or shadows, not text)
+    text_box = _bounding_box(ink, 0.002, 0.6)
+    if text_box is not None:
+        box = _scale_box(text_box, image.size, image.size, margin=0.01)
+        image = image.crop(box)
+
+    info["size"] = image.size
+    info["ms"] = round(1000 * (time.perf_counter() - started), 1)
+    return image, info
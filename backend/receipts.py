@@ -0,0 +1,158 @@
+"""Turn OCR output into a transaction and a receipt_scans row.
+
+Shared by every OCR engine, so what gets stored doesn't depend on which
+engine read the receipt. Runs in the API process after the OCR job; the
+parsing itself lives in receipt_parser.
+"""
+import datetime as dt
+import json
+
+import anomaly
+import db_writer
+import dedup
+import models
+import receipt_parser
+import rollups
+import vector_index
+from database import SessionLocal
+from model_registry import ModelNotReady
+from routers.ml import predict_categories
+
+
+def parse(ocr: dict) -> dict:
+    """Structured fields from a `run_ocr` result, using word boxes when present."""
+    if ocr.get("words"):
+        return receipt_parser.parse_words(ocr["words"])
+    return receipt_parser.parse_text(ocr["text"])
+
+
+def categorize(text: str, items: list[dict]) -> str | None:
+    """Category for the receipt and each line item, in one batched prediction."""
+    texts = ([text] if text.strip() else []) + [item["description"] for item in items]
+    if not texts:
+        return None
+    categories = predict_categories(texts)
+    if not text.strip():
+        categories = [None] + categories
+    for item, category in zip(items, categories[1:]):
+        item["category"] = category
+    return categories[0]
+
+
+def _original_of(db, image_hash) -> int | None:
+    """Transaction already created from (nearly) the same photo, if any."""
+    if image_hash is None:
+        return None
+    for _, transaction_id, _ in dedup.get_images().find(image_hash):
+        if transaction_id is not None and db.get(models.Transaction, transaction_id) is not None:
+            return transaction_id
+    return None
+
+
+def save_receipt(ocr: dict, mode: str, save: bool = True, allow_duplicate: bool = False) -> dict:
+    """Record the scan and, if `save`, store the receipt as a transaction.
+
+    A photo that was already uploaded is not stored again unless
+    `allow_duplicate`; the result then points at the existing transaction.
+    """
+    fields = parse(ocr)
+    category = categorize(ocr["text"], fields["items"])
+    # Always an ISO date in the DB; today when the receipt has none we can read
+    date = fields["date"] or dt.date.today()
+    description = (fields["merchant"] or "Receipt")[:40]
+    tx_type = "income" if category and category.lower() == "income" else "expense"
+
+    preprocess = ocr.get("preprocess") or {}
+    scan_fields = dict(
+        mode=mode,
+        engine=ocr["engine"],
+        confidence=ocr["confidence"],
+        ocr_ms=sum(a["ms"] for a in ocr["attempts"]),
+        preprocess_ms=preprocess.get("ms"),
+        attempts=json.dumps(ocr["attempts"]),
+        raw_text=ocr["text"],
+        items=json.dumps(fields["items"]),
+        image_hash=dedup.to_signed(ocr["image_hash"]) if ocr.get("image_hash") is not None else None,
+    )
+
+    tx = None
+    signatures, matches = None, [[]]
+    db = SessionLocal()
+    try:
+        duplicate_of = _original_of(db, ocr.get("image_hash"))
+        if duplicate_of is not None and not allow_duplicate:
+            save = False
+        if save:
+            tx = dict(
+                date=date,
+                amount=fields["total"],
+                description=description,
+                payment_method="ocr",
+                installments=0,
+                monthly_payment=0,
+                category=category,
+                category_source="model",
+                type=tx_type,
+            )
+            signatures, matches = dedup.find_duplicates(db, [tx])
+            if duplicate_of is not None:
+                # Same photo: reviewed as an image pair, not a description one
+                matches[0] = [m for m in matches[0] if m[0] != duplicate_of]
+            anomaly.detector.score_transactions([tx])
+    finally:
+        db.close()
+
+    def insert(session):
+        tx_id = None
+        if tx is not None:
+            row = models.Transaction(**tx)
+            session.add(row)
+            rollups.apply(session, added=[row])
+            session.flush()
+            tx_id = row.id
+            dedup.record(session, [tx_id], signatures, matches)
+            if duplicate_of is not None:
+                session.add(models.DuplicatePair(
+                    transaction_id=tx_id, duplicate_of_id=duplicate_of, reason="image", similarity=1.0,
+                ))
+        scan = models.ReceiptScan(**scan_fields, transaction_id=tx_id)
+        session.add(scan)
+        session.flush()
+        return scan.id, tx_id
+
+    scan_id, tx_id = db_writer.write(insert)
+    possible_duplicates = [original for original, _ in matches[0]]
+    if tx_id is not None and duplicate_of is not None:
+        possible_duplicates.insert(0, duplicate_of)
+
+    if scan_fields["image_hash"] is not None:
+        dedup.get_images().add(scan_id, scan_fields["image_hash"], tx_id)
+    if tx_id is not None:
+        try:
+            vector_index.index_transactions([tx_id], [description])
+        except ModelNotReady:
+            pass   # already saved; the backfill embeds it once the embedder is up
+    if save:
+        anomaly.detector.note_changes()
+
+    return {
+        "saved": save,
+        "id": tx_id,
+        "scan_id": scan_id,
+        "duplicate_of": duplicate_of,
+        "possible_duplicates": possible_duplicates,
+        "amount": fields["total"],
+        "subtotal": fields["subtotal"],
+        "tax": fields["tax"],
+        "date": date.isoformat(),
+        "date_found": fields["date"] is not None,
+        "category": category,
+        "type": tx_type,
+        "description": description,
+        "merchant": fields["merchant"],
+        "items": fields["items"],
+        "raw_text": ocr["text"],
+        "engine": ocr["engine"],
+        "confidence": ocr["confidence"],
+        "attempts": ocr["attempts"],
+    }
@@ -0,0 +1,179 @@
+"""Monthly rollup table maintenance.
+
+Every write path calls `apply()` inside its own DB transaction, so
+`monthly_rollups` always matches `transactions`. If it ever drifts, repair it
+from a full scan (run from backend/):
+
+    python rollups.py check
+    python rollups.py rebuild
+"""
+import re
+import sys
+from collections import defaultdict
+from datetime import date
+
+from sqlalchemy import delete, func
+from sqlalchemy.dialects import postgresql, sqlite
+
+from database import month_expr
+import models
+
+
+_ISO = re.compile(r"^(\d{4})-(\d{2})")
+_DMY = re.compile(r"^(\d{2})/(\d{2})/(\d{4})")
+_TOLERANCE = 0.005
+
+
+def month_of(value) -> str:
+    """Month key ("YYYY-MM") of a date or date string; "" if unparseable."""
+    if isinstance(value, date):
+        return value.strftime("%Y-%m")
+    value = (value or "").strip()
+    match = _ISO.match(value)
+    if match:
+        return f"{match.group(1)}-{match.group(2)}"
+    match = _DMY.match(value)
+    if match:
+        return f"{match.group(3)}-{match.group(2)}"
+    return ""
+
+
+def _field(tx, name):
+    return tx.get(name) if isinstance(tx, dict) else getattr(tx, name)
+
+
+def _key(tx):
+    return (
+        month_of(_field(tx, "date")),
+        _field(tx, "type") or "",
+        _field(tx, "category") or "",
+    )
+
+
+def _deltas(added=(), removed=()):
+    deltas = defaultdict(lambda: [0.0, 0])
+    for sign, txs in ((1, added), (-1, removed)):
+        for tx in txs:
+            d = deltas[_key(tx)]
+            d[0] += sign * (_field(tx, "amount") or 0.0)
+            d[1] += sign
+    return deltas
+
+
+def _upsert(db):
+    dialect = db.get_bind().dialect.name
+    insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+    return insert(models.MonthlyRollup)
+
+
+def apply(db, added=(), removed=()):
+    """Add/subtract transactions (ORM objects or dicts) from the rollup.
+
+    Increments happen in SQL (upsert with total = total + delta) so
+    concurrent writers never lose updates. Does not commit.
+    """
+    rows = [
+        {"month": m, "type": t, "category": c, "total": total, "count": count}
+        for (m, t, c), (total, count) in _deltas(added, removed).items()
+        if count or total
+    ]
+    # An edit that touches none of the rollup fields nets out to nothing
+    if not rows:
+        return
+
+    stmt = _upsert(db)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["month", "type", "category"],
+        set_={
+            "total": models.MonthlyRollup.total + stmt.excluded.total,
+            "count": models.MonthlyRollup.count + stmt.excluded.count,
+        },
+    )
+    db.execute(stmt, rows)
+    db.execute(delete(models.MonthlyRollup).where(models.MonthlyRollup.count <= 0))
+
+
+def snapshot(tx) -> dict:
+    """The fields the rollup depends on, captured before an update."""
+    return {name: getattr(tx, name) for name in ("date", "type", "category", "amount")}
+
+
+# ------------------------------
+# REPAIR / CONSISTENCY
+# ------------------------------
+def _scan(db) -> dict:
+    T = models.Transaction
+    month = func.coalesce(month_expr(T.date), "")
+    tx_type = func.coalesce(T.type, "")
+    category = func.coalesce(T.category, "")
+    rows = (
+        db.query(month, tx_type, category, func.coalesce(func.sum(T.amount), 0.0), func.count())
+        .group_by(month, tx_type, category)
+        .all()
+    )
+    return {(m, t, c): (total, count) for m, t, c, total, count in rows}
+
+
+def check(db) -> list[dict]:
+    """Differences between the rollup table and a full scan of transactions."""
+    expected = _scan(db)
+    actual = {
+        (r.month, r.type, r.category): (r.total, r.count)
+        for r in db.query(models.MonthlyRollup)
+    }
+    problems = []
+    for key in sorted(set(expected) | set(actual)):
+        exp_total, exp_count = expected.get(key, (0.0, 0))
+        act_total, act_count = actual.get(key, (0.0, 0))
+        if exp_count != act_count or abs(exp_total - act_total) > _TOLERANCE:
+            problems.append({
+                "month": key[0], "type": key[1], "category": key[2],
+                "expected_total": round(exp_total, 2), "actual_total": round(act_total, 2),
+                "expected_count": exp_count, "actual_count": act_count,
+            })
+    return problems
+
+
+def ensure_populated(db):
+    """Build the rollup on first start against an existing database."""
+    if db.query(models.MonthlyRollup).first() is None and db.query(models.Transaction).first():
+        rebuild(db)
+
+
+def rebuild(db) -> int:
+    """Replace the rollup with a full scan. Returns the number of rollup rows."""
+    expected = _scan(db)
+    db.execute(delete(models.MonthlyRollup))
+    db.add_all(
+        models.MonthlyRollup(month=m, type=t, category=c, total=total, count=count)
+        for (m, t, c), (total, count) in expected.items()
+    )
+    db.commit()
+    return len(expected)
+
+
+def main(argv=None):
+    from database import Base, SessionLocal, engine
+
+    argv = sys.argv[1:] if argv is None else argv
+    if argv not in (["check"], ["rebuild"]):
+        print(__doc__)
+        return 2
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        if argv == ["rebuild"]:
+            print(f"Rebuilt monthly_rollups: {rebuild(db)} rows")
+            return 0
+        problems = check(db)
+        for p in problems:
+            print(p)
+        print("OK" if not problems else f"{len(problems)} mismatched rollup rows")
+        return 1 if problems else 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import case, func, select
 from sqlalchemy.orm import Session
 from database import SessionLocal
+import anomaly
+import data_version
+import forecast
+import installments
+import metrics
 import models
 import schemas 
-import pandas as pd
-from datetime import datetime, date
+from datetime import date
 
 
 router = APIRouter()
@@ -23,40 +28,133 @@ def get_db():
 
 
 # ------------------------------
-# MONTHLY SUMMARY ENDPOINT
+# CONDITIONAL REQUESTS
 # ------------------------------
-@router.get("/analytics/monthly-summary", response_model=list[schemas.MonthlySummary])
-def monthly_summary(db: Session = Depends(get_db)):
-    # Fetch all transactions
-    txs = db.query(models.Transaction).all()
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+_dashboard_cache = data_version.VersionedCache("dashboard", maxsize=4)
+
 
-    if not txs:
-        return []
+def _not_modified(request: Request, response: Response, etag: str) -> Response | None:
+    """Tag the response; a 304 to return instead if the client already has this version."""
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+    sent = {tag.strip() for tag in request.headers.get("if-none-match", "").split(",")}
+    if etag in sent or "*" in sent:
+        return Response(status_code=304, headers=dict(response.headers))
+    return None
 
-    # Build DataFrame from DB entries
-    df = pd.DataFrame([{
-        "date": t.date,
-        "amount": t.amount,
-        "type": t.type
-    } for t in txs])
 
-    # Convert to datetime
-    df["date"] = pd.to_datetime(df["date"])
+# ------------------------------
+# DASHBOARD ENDPOINT
+# ------------------------------
+def _dashboard(db: Session, today: date) -> dict:
+    R, T = models.MonthlyRollup, models.Transaction
+    current_month = today.strftime("%Y-%m")
+
+    totals = dict(
+        db.query(R.type, func.sum(R.total))
+        .filter(R.type.in_(["expense", "income"]))
+        .group_by(R.type)
+        .all()
+    )
+    income = totals.get("income") or 0.0
+    expenses = totals.get("expense") or 0.0
+
+    by_category = (
+        db.query(R.category, R.month == current_month, func.sum(R.total))
+        .filter(R.type == "expense")
+        .group_by(R.category, R.month == current_month)
+        .all()
+    )
+    categories, this_month = {}, {}
+    for category, is_current, total in by_category:
+        categories[category] = categories.get(category, 0.0) + total
+        if is_current:
+            this_month[category] = total
+    metrics.read_rows("dashboard.rollups", len(totals) + len(by_category))
+
+    # The only scan of transactions: one row per (day, type) via ix_transactions_type_date
+    daily = {}
+    weekday = [0.0] * 7
+    rows = 0
+    for day, tx_type, total in db.execute(
+        select(T.date, T.type, func.sum(T.amount))
+        .where(T.type.in_(["expense", "income"]), T.date.is_not(None))
+        .group_by(T.type, T.date)
+    ):
+        rows += 1
+        daily.setdefault(day, {"expense": 0.0, "income": 0.0})[tx_type] = total
+        if tx_type == "expense":
+            weekday[day.weekday()] += total
+    days = sorted(daily)
+    metrics.read_rows("dashboard.daily", rows)
+
+    ranked = lambda totals: [
+        {"category": c, "amount": round(a, 2)}
+        for c, a in sorted(totals.items(), key=lambda item: -item[1])
+        if a
+    ]
+    return {
+        "month": current_month,
+        "balance": {
+            "income": round(income, 2),
+            "expenses": round(expenses, 2),
+            "balance": round(income - expenses, 2),
+        },
+        # Columnar: one list per series instead of a dict per point
+        "daily": {
+            "date": [d.isoformat() for d in days],
+            "income": [round(daily[d]["income"], 2) for d in days],
+            "expense": [round(daily[d]["expense"], 2) for d in days],
+        },
+        "categories": ranked(categories),
+        "weekday": [{"weekday": name, "amount": round(a, 2)} for name, a in zip(WEEKDAYS, weekday)],
+        "top_categories": ranked(this_month)[:5],
+    }
 
-    # Create YYYY-MM grouping key
-    df["month"] = df["date"].dt.to_period("M").astype(str)
 
-    # Separate expenses and incomes
-    expenses = df[df["type"] == "expense"].groupby("month")["amount"].sum()
-    income = df[df["type"] == "income"].groupby("month")["amount"].sum()
+@router.get("/analytics/dashboard")
+@metrics.timed("analytics.dashboard")
+def dashboard(request: Request, response: Response, db: Session = Depends(get_db)):
+    """Every series the analytics page draws, in one response.
 
-    # Ensure consistent months
-    all_months = sorted(set(expenses.index).union(set(income.index)))
+    Tagged with the data version: a client sending If-None-Match with the
+    ETag it already has gets an empty 304 until a transaction changes.
+    """
+    today = date.today()
+    version = data_version.current(db)
+    cached = _not_modified(request, response, data_version.etag(version, today.strftime("%Y-%m")))
+    if cached is not None:
+        return cached
+    return _dashboard_cache.get(version, today, lambda: _dashboard(db, today))
+
+
+# ------------------------------
+# MONTHLY SUMMARY ENDPOINT
+# ------------------------------
+@router.get("/analytics/monthly-summary", response_model=list[schemas.MonthlySummary])
+@metrics.timed("analytics.monthly_summary")
+def monthly_summary(db: Session = Depends(get_db)):
+    # Read the per-month rollup instead of scanning every transaction
+    R = models.MonthlyRollup
+    rows = (
+        db.query(R.month, R.type, func.sum(R.total))
+        .filter(R.month != "", R.type.in_(["expense", "income"]))
+        .group_by(R.month, R.type)
+        .order_by(R.month)
+        .all()
+    )
+
+    totals = {}
+    metrics.read_rows("analytics.monthly_summary", len(rows))
+    for month, tx_type, total in rows:
+        totals.setdefault(month, {"expense": 0.0, "income": 0.0})[tx_type] = total
 
     summaries = []
-    for m in all_months:
-        total_exp = float(expenses.get(m, 0.0))
-        total_inc = float(income.get(m, 0.0))
+    for m, t in totals.items():
+        total_exp = float(t["expense"])
+        total_inc = float(t["income"])
         net = total_inc - total_exp
 
         summaries.append(
@@ -71,10 +169,18 @@ def monthly_summary(db: Session = Depends(get_db)):
     return summaries
 
 @router.get("/analytics/balance")
+@metrics.timed("analytics.balance")
 def balance(db: Session = Depends(get_db)):
-    txs = db.query(models.Transaction).all()
-    income = sum(t.amount for t in txs if t.type == "income")
-    expenses = sum(t.amount for t in txs if t.type == "expense")
+    R = models.MonthlyRollup
+    totals = dict(
+        db.query(R.type, func.sum(R.total))
+        .filter(R.type.in_(["expense", "income"]))
+        .group_by(R.type)
+        .all()
+    )
+    metrics.read_rows("analytics.balance", len(totals))
+    income = totals.get("income") or 0.0
+    expenses = totals.get("expense") or 0.0
     return {
         "income": round(income, 2),
         "expenses": round(expenses, 2),
@@ -83,35 +189,50 @@ def balance(db: Session = Depends(get_db)):
 
 
 @router.get("/analytics/credit-overview")
-def credit_overview(db: Session = Depends(get_db)):
-    txs = db.query(models.Transaction).filter(
-        models.Transaction.type == "expense",
-        models.Transaction.payment_method == "credit_card",
-        models.Transaction.installments > 0
-    ).all()
-
-    today = date.today()
-    items = []
-
-    for t in txs:
-        start_date = datetime.strptime(t.date, "%Y-%m-%d").date()
-        months_elapsed = (today.year - start_date.year) * 12 + (today.month - start_date.month)
-        remaining_installments = max(0, t.installments - months_elapsed)
-        remaining_debt = remaining_installments * t.monthly_payment
-
+@metrics.timed("analytics.credit_overview")
+def credit_overview(include_paid: bool = False, db: Session = Depends(get_db)):
+    """Open installment plans, aggregated from the installment schedule."""
+    S, T = models.InstallmentSchedule, models.Transaction
+    current = installments.month_start(date.today())
+    remaining = (
+        select(
+            S.transaction_id,
+            func.count().label("remaining_installments"),
+            func.sum(S.amount).label("remaining_debt"),
+            func.sum(case((S.due_month == current, S.amount), else_=0.0)).label("due_now"),
+        )
+        .where(S.due_month >= current)
+        .group_by(S.transaction_id)
+        .subquery()
+    )
+    columns = (
+        T.id, T.description, T.date, T.amount, T.installments, T.monthly_payment,
+        remaining.c.remaining_installments, remaining.c.remaining_debt, remaining.c.due_now,
+    )
+    if include_paid:
+        # Paid-off plans too: every installment purchase, open or not
+        stmt = select(*columns).outerjoin(remaining, remaining.c.transaction_id == T.id).where(
+            T.type == "expense", T.payment_method == "credit_card", T.installments > 0, T.date.is_not(None)
+        )
+    else:
+        stmt = select(*columns).join(remaining, remaining.c.transaction_id == T.id)
+
+    items, total_monthly, total_remaining = [], 0.0, 0.0
+    for row in db.execute(stmt.order_by(T.date, T.id)):
+        debt = row.remaining_debt or 0.0
+        total_monthly += row.due_now or 0.0
+        total_remaining += debt
         items.append({
-            "id": t.id,
-            "description": t.description,
-            "start_date": t.date,
-            "amount": t.amount,
-            "installments": t.installments,
-            "remaining_installments": remaining_installments,
-            "monthly_payment": t.monthly_payment,
-            "remaining_debt": round(remaining_debt, 2)
+            "id": row.id,
+            "description": row.description,
+            "start_date": row.date,
+            "amount": row.amount,
+            "installments": row.installments,
+            "remaining_installments": row.remaining_installments or 0,
+            "monthly_payment": row.monthly_payment,
+            "remaining_debt": round(debt, 2),
         })
-
-    total_monthly = sum(i["monthly_payment"] for i in items if i["remaining_installments"] > 0)
-    total_remaining = sum(i["remaining_debt"] for i in items)
+    metrics.read_rows("analytics.credit_overview", len(items))
 
     return {
         "items": items,
@@ -120,32 +241,67 @@ def credit_overview(db: Session = Depends(get_db)):
     }
 
 
-@router.get("/analytics/anomalies")
-def anomalies(db: Session = Depends(get_db)):
-    from sklearn.ensemble import IsolationForest
-
-    txs = db.query(models.Transaction).filter(models.Transaction.type == "expense").all()
-    if len(txs) < 10:
-        # Not enough data to do anomaly detection
-        return {"anomalies": []}
-
-    df = pd.DataFrame([{
-        "id": t.id,
-        "date": t.date,
-        "amount": t.amount,
-        "description": t.description,
-    } for t in txs])
-
-    df["date"] = pd.to_datetime(df["date"])
-    df["day_of_week"] = df["date"].dt.weekday + 1
-    df["month"] = df["date"].dt.month
+@router.get("/analytics/cashflow-projection")
+@metrics.timed("analytics.cashflow_projection")
+def cashflow_projection(months: int = Query(12, ge=1, le=120), db: Session = Depends(get_db)):
+    """Installment payments falling due in each of the next `months` months."""
+    schedule = installments.projection(db, date.today(), months)
+    return {
+        "months": schedule,
+        "total": round(sum(m["amount"] for m in schedule), 2),
+    }
 
-    features = df[["amount", "day_of_week", "month"]]
 
-    model_if = IsolationForest(contamination=0.1, random_state=42)
-    df["anomaly_score"] = model_if.fit_predict(features)
+@router.get("/analytics/forecast")
+@metrics.timed("analytics.forecast")
+def spending_forecast(
+    request: Request,
+    response: Response,
+    months: int = Query(3, ge=1, le=24),
+    method: str = Query("auto", pattern="^(auto|ses|seasonal_naive)$"),
+    db: Session = Depends(get_db),
+):
+    """Projected month-end spending and the next `months` months, per category."""
+    today = date.today()
+    version = data_version.current(db)
+    cached = _not_modified(request, response, data_version.etag(version, today, months, method))
+    if cached is not None:
+        return cached
+    return forecast.cache.get(version, (today, months, method), lambda: forecast.compute(db, months, method, today))
 
-    anomalies_df = df[df["anomaly_score"] == -1].sort_values("amount", ascending=False)
 
-    anomalies = anomalies_df[["id", "date", "amount", "description"]].to_dict(orient="records")
-    return {"anomalies": anomalies}
\ No newline at end of file
+@router.get("/analytics/anomalies")
+@metrics.timed("analytics.anomalies")
+def anomalies(
+    threshold: float | None = None,
+    limit: int = Query(50, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db),
+):
+    model = anomaly.detector.current()
+    if model is None:
+        # Not trained yet (or not enough data); kick off a fit for next time
+        anomaly.detector.retrain_in_background()
+        return {"anomalies": [], "model_version": None, "threshold": None}
+
+    if threshold is None:
+        threshold = model.threshold
+
+    T = models.Transaction
+    rows = (
+        db.query(T.id, T.date, T.amount, T.description, T.category, T.anomaly_score)
+        .filter(T.type == "expense", T.anomaly_score >= threshold)
+        .order_by(T.anomaly_score.desc(), T.id)
+        .offset(offset)
+        .limit(limit)
+        .all()
+    )
+
+    metrics.read_rows("analytics.anomalies", len(rows))
+    return {
+        "anomalies": [row._asdict() for row in rows],
+        "model_version": model.version,
+        "threshold": round(threshold, 4),
+        "limit": limit,
+        "offset": offset,
+    }
@@ -0,0 +1,142 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import func
+from sqlalchemy.orm import Session, aliased
+from typing import Literal
+from database import SessionLocal
+import anomaly
+import db_writer
+import dedup
+import installments
+import models
+import rollups
+import schemas
+import vector_index
+
+
+router = APIRouter()
+
+
+# ------------------------------
+# DATABASE SESSION DEPENDENCY
+# ------------------------------
+
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def _get_pair(db: Session, pair_id: int) -> models.DuplicatePair:
+    pair = db.get(models.DuplicatePair, pair_id)
+    if pair is None:
+        raise HTTPException(status_code=404, detail="Duplicate pair not found")
+    if pair.status != "pending":
+        raise HTTPException(status_code=409, detail=f"Pair already {pair.status}")
+    return pair
+
+
+# ------------------------------
+# REVIEW SUSPECTED DUPLICATES
+# ------------------------------
+@router.get("/duplicates", response_model=list[schemas.DuplicatePairResponse])
+def list_duplicates(
+    status: Literal["pending", "dismissed", "merged"] = "pending",
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db),
+):
+    P = models.DuplicatePair
+    New, Original = aliased(models.Transaction), aliased(models.Transaction)
+    rows = (
+        db.query(P, New, Original)
+        # Outer joins: a merged pair outlives the transaction it removed
+        .outerjoin(New, New.id == P.transaction_id)
+        .outerjoin(Original, Original.id == P.duplicate_of_id)
+        .filter(P.status == status)
+        .order_by(P.similarity.desc(), P.id)
+        .offset(offset)
+        .limit(limit)
+        .all()
+    )
+    return [
+        {
+            "id": pair.id,
+            "reason": pair.reason,
+            "similarity": pair.similarity,
+            "status": pair.status,
+            "transaction": new,
+            "duplicate_of": original,
+        }
+        for pair, new, original in rows
+    ]
+
+
+@router.post("/duplicates/{pair_id}/merge", response_model=schemas.TransactionResponse)
+def merge_duplicate(
+    pair_id: int,
+    keep: Literal["original", "duplicate"] = "original",
+    db: Session = Depends(get_db),
+):
+    """Delete one side of the pair; its receipt scans move to the one kept.
+
+    The pair itself stays, marked "merged"; the removed side's other pairs go.
+    """
+    pair = _get_pair(db, pair_id)
+    kept_id, removed_id = pair.duplicate_of_id, pair.transaction_id
+    if keep == "duplicate":
+        kept_id, removed_id = removed_id, kept_id
+    db.close()
+
+    def merge(session):
+        kept = session.get(models.Transaction, kept_id)
+        removed = session.get(models.Transaction, removed_id)
+        if kept is None or removed is None:
+            return None
+        session.query(models.ReceiptScan).filter(models.ReceiptScan.transaction_id == removed_id).update(
+            {models.ReceiptScan.transaction_id: kept_id}, synchronize_session=False
+        )
+        rollups.apply(session, removed=[removed])
+        installments.unschedule(session, [removed_id])
+        # Marked first: forget() drops every other pair of the removed side
+        session.query(models.DuplicatePair).filter(models.DuplicatePair.id == pair_id).update(
+            {models.DuplicatePair.status: "merged"}, synchronize_session=False
+        )
+        dedup.forget(session, [removed_id])
+        session.delete(removed)
+        return kept
+
+    kept = db_writer.write(merge)
+    if kept is None:
+        raise HTTPException(status_code=404, detail="Transaction not found")
+    dedup.get_images().relink(removed_id, kept_id)
+    vector_index.forget([removed_id])
+    anomaly.detector.note_changes()
+    return kept
+
+
+@router.post("/duplicates/{pair_id}/dismiss")
+def dismiss_duplicate(pair_id: int, db: Session = Depends(get_db)):
+    """Not a duplicate: keep both transactions and stop suggesting the pair."""
+    _get_pair(db, pair_id)
+    db.close()
+
+    def dismiss(session):
+        pair = session.get(models.DuplicatePair, pair_id)
+        if pair is not None:
+            pair.status = "dismissed"
+
+    db_writer.write(dismiss)
+    return {"detail": "Pair dismissed"}
+
+
+@router.get("/duplicates/stats")
+def duplicate_stats(db: Session = Depends(get_db)):
+    P = models.DuplicatePair
+    counts = dict(db.query(P.status, func.count()).group_by(P.status).all())
+    return {
+        "pairs": counts,
+        "signatures": dedup.get_signatures().stats(),
+        "image_hashes": len(dedup.get_images()),
+    }
@@ -0,0 +1,35 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse, PlainTextResponse
+from model_registry import registry
+import database
+import db_writer
+import metrics
+
+router = APIRouter()
+
+
+# ------------------------------
+# LIVENESS / READINESS
+# ------------------------------
+@router.get("/health/live")
+def live():
+    return {"status": "alive"}
+
+
+@router.get("/health/ready")
+def ready():
+    body = {"ready": registry.ready(), "models": registry.status()}
+    return JSONResponse(body, status_code=200 if body["ready"] else 503)
+
+
+@router.get("/health/db")
+def db_status():
+    return {**database.pool_status(), "writer": db_writer.stats()}
+
+
+# ------------------------------
+# PROMETHEUS
+# ------------------------------
+@router.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
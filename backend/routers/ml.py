@@ -1,29 +1,275 @@
-from fastapi import APIRouter
-import torch
-from transformers import AutoTokenizer, AutoModel
-import joblib
+from fastapi import APIRouter, HTTPException
+import os
+import threading
+import time
+import schemas
+import numpy as np
+from embedders import load_embedder
+from model_registry import registry
+from prediction_engine import PredictionEngine
+from prediction_cache import PredictionCache, fingerprint, normalize
+from category_head import LinearHead, top_k
+import category_model
+import metrics
+import vector_index
 
 router = APIRouter()
 
-# Load tokenizer + model (local)
-tokenizer = AutoTokenizer.from_pretrained("models/minilm_embedding_model")
-model = AutoModel.from_pretrained("models/minilm_embedding_model")
+EMBEDDING_MODEL_PATH = "models/minilm_embedding_model"
+# Below this calibrated confidence the UI asks the user to pick from the top-k
+CATEGORY_MIN_CONFIDENCE = float(os.getenv("CATEGORY_MIN_CONFIDENCE", "0.5"))
+CATEGORY_TOP_K = int(os.getenv("CATEGORY_TOP_K", "3"))
 
-# Load classifier
-classifier = joblib.load("models/category_classifier_sbert.pkl")
+# ------------------------------
+# MODELS (loaded lazily / warmed in the background)
+# ------------------------------
 
+def _load_embedder():
+    # EMBEDDING_BACKEND is torch, onnx or onnx-int8
+    return load_embedder(os.getenv("EMBEDDING_BACKEND", "torch"), EMBEDDING_MODEL_PATH)
+
+def _load_cache():
+    # Two-tier (memory + SQLite) cache keyed by normalized description
+    return PredictionCache(
+        os.getenv("PREDICTION_CACHE_PATH", "prediction_cache.db"),
+        f"{fingerprint(EMBEDDING_MODEL_PATH, category_model.current_path())}-{registry.get('embedder').name}",
+        maxsize=int(os.getenv("PREDICTION_CACHE_SIZE", "10000")),
+    )
+
+registry.register("embedder", _load_embedder)
+def _load_classifier():
+    # The version named by models/category/current.json, else the notebook SVC
+    classifier = category_model.load_current()
+    category_model.note_loaded()
+    return classifier
+
+registry.register("classifier", _load_classifier)
+registry.register("prediction_cache", _load_cache)
+
+def get_embedder():
+    return registry.get("embedder")
+
+def get_classifier():
+    category_model.reload_if_changed()
+    return registry.get("classifier")
+
+def get_cache() -> PredictionCache:
+    return registry.get("prediction_cache")
+
+# ------------------------------
+# EMBEDDING + PREDICTION
+# ------------------------------
+
+def embed_batch(texts: list[str]):
+    return get_embedder().embed(texts)
+
+def _predict_uncached(texts: list[str]) -> list[str]:
+    """Run the model on texts and store the results in the cache."""
+    if not texts:
+        return []
+    embeddings = embed_batch(texts)
+    started = time.perf_counter()
+    preds = [str(p) for p in get_classifier().predict(embeddings)]
+    elapsed = time.perf_counter() - started
+    _cost.add(len(texts), elapsed)
+    metrics.spans.observe(elapsed, span="classifier.predict")
+    get_cache().put_many({
+        normalize(t): (p, e) for t, p, e in zip(texts, preds, embeddings)
+    })
+    return preds
+
+class _PredictCost:
+    """Time spent in classifier.predict(), excluding the embedder."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.rows = 0
+        self.seconds = 0.0
+
+    def add(self, rows: int, seconds: float):
+        with self._lock:
+            self.rows += rows
+            self.seconds += seconds
+
+    def stats(self) -> dict:
+        with self._lock:
+            per_row = 1000 * self.seconds / self.rows if self.rows else None
+        return {"rows": self.rows, "ms_per_row": per_row}
+
+_cost = _PredictCost()
+
+def _corrected(categories: list[str], embeddings: list) -> tuple[list[str], list[bool]]:
+    """Let the user's own corrections (kNN) override the classifier.
+
+    Also returns, per row, whether the corrections changed the category.
+    """
+    categories = list(categories)
+    overridden = [False] * len(categories)
+    known = [i for i, e in enumerate(embeddings) if e is not None]
+    if not known:
+        return categories, overridden
+    corrected = vector_index.apply_corrections(
+        np.vstack([embeddings[i] for i in known]), [categories[i] for i in known]
+    )
+    for i, category in zip(known, corrected):
+        overridden[i] = category != categories[i]
+        categories[i] = category
+    return categories, overridden
+
+def _with_corrections(categories: list[str], embeddings: list) -> list[str]:
+    return _corrected(categories, embeddings)[0]
+
+def _lookup_corrected(texts: list[str], compute) -> tuple[list[str], list[bool]]:
+    """Serve cached predictions and send only distinct misses to `compute`."""
+    found = get_cache().get_many(texts)
+    keys = [normalize(t) for t in texts]
+    missing = {}
+    for text, key in zip(texts, keys):
+        if key not in found:
+            missing.setdefault(key, text)
+    if missing:
+        preds = compute(list(missing.values()))
+        for (key, text), pred in zip(missing.items(), preds):
+            # compute() just cached the embedding alongside the prediction
+            found[key] = (pred, (get_cache().peek(text) or (None, None))[1])
+    return _corrected([found[key][0] for key in keys], [found[key][1] for key in keys])
+
+def _lookup(texts: list[str], compute) -> list[str]:
+    return _lookup_corrected(texts, compute)[0]
+
+@metrics.timed("embed")
 def embed(text: str):
-    inputs = tokenizer(text, return_tensors="pt", truncation=True)
-    with torch.no_grad():
-        outputs = model(**inputs)
-    embeddings = outputs.last_hidden_state.mean(dim=1)
-    return embeddings.numpy()
+    hit = get_cache().get(text)
+    if hit is not None:
+        return hit[1].reshape(1, -1)
+    return embed_batch([text])
+
+@metrics.timed("embed")
+def embed_many(texts: list[str]):
+    """Embeddings for texts, reusing the cached ones; shape (len(texts), dim)."""
+    found = get_cache().get_many(texts)
+    missing = list({normalize(t): t for t in texts if normalize(t) not in found}.values())
+    if missing:
+        _predict_uncached(missing)
+        found.update(get_cache().get_many(missing))
+    return np.vstack([found[normalize(t)][1] for t in texts])
+
+@metrics.timed("predict_categories")
+def predict_categories(texts: list[str]) -> list[str]:
+    return _lookup(texts, _predict_uncached)
+
+BULK_CHUNK_SIZE = int(os.getenv("PREDICT_BULK_CHUNK_SIZE", "256"))
+
+def _chunked(chunk_size: int):
+    """Classify a large list in fixed-size batches.
+
+    Texts are sorted by length first so each padded batch wastes as few
+    tokens as possible; results come back in the original order.
+    """
+    def compute(misses):
+        order = sorted(range(len(misses)), key=lambda i: len(misses[i]))
+        results = [None] * len(misses)
+        for start in range(0, len(order), chunk_size):
+            idx = order[start:start + chunk_size]
+            for i, pred in zip(idx, _predict_uncached([misses[i] for i in idx])):
+                results[i] = pred
+        return results
+
+    return compute
+
+def predict_categories_chunked(texts: list[str], chunk_size: int = BULK_CHUNK_SIZE) -> list[str]:
+    return _lookup(texts, _chunked(chunk_size))
+
+# Concurrent single predictions are coalesced into one forward pass
+engine = PredictionEngine(
+    _predict_uncached,
+    window_ms=float(os.getenv("PREDICT_BATCH_WINDOW_MS", "5")),
+    max_batch=int(os.getenv("PREDICT_MAX_BATCH", "64")),
+)
+
+@metrics.timed("predict_category")
+def _predict_one(text: str) -> tuple[str, bool]:
+    hit = get_cache().get(text)
+    if hit is None:
+        category = engine.predict(text)
+        hit = get_cache().peek(text) or (category, None)
+    categories, overridden = _corrected([hit[0]], [hit[1]])
+    return categories[0], overridden[0]
 
 def predict_category(text: str):
-    emb = embed(text)
-    pred = classifier.predict(emb)[0]
-    return pred
+    return _predict_one(text)[0]
 
-@router.post("/predict-category")
+def with_confidence(texts: list[str], categories: list[str], overridden: list[bool]) -> list[dict]:
+    """Calibrated confidence per prediction, plus top-k choices when it is low.
+
+    Only the .npy heads report a confidence: their predict() is the argmax
+    of the same probabilities the choices are ranked by (see top_k). A
+    category taken from the user's own corrections never needs review.
+    """
+    ranked = top_k(get_classifier(), embed_many(texts), CATEGORY_TOP_K) if texts else []
+    results = []
+    for category, was_overridden, choices in zip(categories, overridden, ranked):
+        confidence = None if was_overridden else dict(choices).get(category)
+        needs_review = confidence is not None and confidence < CATEGORY_MIN_CONFIDENCE
+        results.append({
+            "category": category,
+            "confidence": confidence,
+            "needs_review": needs_review,
+            "alternatives": [{"category": c, "confidence": p} for c, p in choices] if needs_review else [],
+        })
+    return results
+
+def classifier_cost() -> dict:
+    classifier = get_classifier()
+    if isinstance(classifier, LinearHead):
+        info = classifier.describe()
+    else:
+        info = {"kind": type(classifier).__name__}
+        if hasattr(classifier, "n_support_"):
+            # Kernel SVC predict cost grows with this
+            info["support_vectors"] = int(classifier.n_support_.sum())
+    return {"version": category_model.read_pointer()["version"], **info, "predict": _cost.stats()}
+
+# ------------------------------
+# ENDPOINTS
+# ------------------------------
+
+@router.post("/predict-category", response_model=schemas.CategoryPrediction)
 def predict_api(description: str):
-    return {"category": predict_category(description)}
\ No newline at end of file
+    category, overridden = _predict_one(description)
+    return {"description": description, **with_confidence([description], [category], [overridden])[0]}
+
+@router.post("/predict-category/batch", response_model=list[schemas.CategoryPrediction])
+def predict_batch_api(descriptions: list[str]):
+    categories, overridden = _lookup_corrected(descriptions, _chunked(BULK_CHUNK_SIZE))
+    return [
+        {"description": d, **scored}
+        for d, scored in zip(descriptions, with_confidence(descriptions, categories, overridden))
+    ]
+
+@router.get("/predict-category/stats")
+def predict_stats():
+    return {
+        "backend": get_embedder().name,
+        "engine": engine.stats(),
+        "cache": get_cache().stats(),
+        "corrections": vector_index.get_corrections().stats(),
+        "classifier": classifier_cost(),
+    }
+
+@router.get("/predict-category/model")
+def classifier_versions():
+    return {"versions": category_model.versions(), "trainer": category_model.trainer.stats()}
+
+@router.post("/predict-category/model/retrain", status_code=202)
+def retrain_classifier():
+    started = category_model.trainer.retrain_in_background()
+    return {"detail": "Retraining started" if started else "Retraining already running"}
+
+@router.post("/predict-category/model/rollback")
+def rollback_classifier(version: int | None = None):
+    try:
+        meta = category_model.rollback(version)
+    except ValueError as exc:
+        raise HTTPException(status_code=404, detail=str(exc))
+    return {"detail": f"Classifier v{meta['version']} active"}
@@ -1,42 +1,97 @@
-from fastapi import APIRouter, UploadFile, File
-import easyocr
-import numpy as np
-from PIL import Image
-import io
-import re
-from routers.ml import predict_category
+from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
+from typing import Literal
+import asyncio
+import json
+import metrics
+import ocr_engines
+import ocr_jobs
+import receipts
+from model_registry import registry
 
 router = APIRouter()
 
-# Load OCR model once
-ocr_reader = easyocr.Reader(['en', 'es'], gpu=False)
+# Worker processes (each with its own warm engines) start during warm-up
+registry.register("ocr_workers", ocr_jobs.jobs.warm_up)
 
 
-@router.post("/ocr-receipt")
-async def ocr_receipt(file: UploadFile = File(...)):
-    # Read image bytes
-    image_bytes = await file.read()
-    image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-    image_np = np.array(image)
+# ------------------------------
+# JOB SUBMISSION / STATUS
+# ------------------------------
+def submit_ocr_job(engine: str, image_bytes: bytes, finish):
+    try:
+        job = ocr_jobs.jobs.submit(engine, image_bytes, finish)
+    except ocr_jobs.QueueFull as exc:
+        raise HTTPException(status_code=429, detail=str(exc), headers={"Retry-After": "2"})
 
-    # OCR extraction
-    results = ocr_reader.readtext(image_np, detail=0)
-    text = " ".join(results)
+    return JSONResponse(
+        status_code=202,
+        content={
+            "job_id": job.id,
+            "status": job.status,
+            "status_url": f"/ocr/jobs/{job.id}",
+            "events_url": f"/ocr/jobs/{job.id}/events",
+        },
+    )
 
-    # Extract amount
-    amount_match = re.search(r"(\d+[.,]\d+)", text)
-    amount = amount_match.group(1) if amount_match else None
 
-    # Extract date
-    date_match = re.search(r"(\d{4}[/-]\d{2}[/-]\d{2})", text)
-    date = date_match.group(1) if date_match else None
+def _get_job(job_id: str):
+    job = ocr_jobs.jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="OCR job not found")
+    return job
 
-    # Predict category using SBERT
-    category = predict_category(text) if text else None
 
-    return {
-        "raw_text": text,
-        "amount": amount,
-        "date": date,
-        "predicted_category": category,
-    }
\ No newline at end of file
+@router.get("/ocr/jobs/stats")
+def ocr_job_stats():
+    return ocr_jobs.jobs.stats()
+
+
+@router.get("/ocr/jobs/{job_id}")
+def ocr_job_status(job_id: str):
+    return _get_job(job_id).to_dict()
+
+
+@router.get("/ocr/jobs/{job_id}/events")
+async def ocr_job_events(job_id: str):
+    """Server-sent events: one `status` event per state change."""
+    job = _get_job(job_id)
+
+    async def events():
+        last = None
+        while True:
+            state = job.to_dict()
+            if state["status"] != last:
+                last = state["status"]
+                yield f"event: status\ndata: {json.dumps(state)}\n\n"
+            if last in ocr_jobs.TERMINAL_STATES:
+                break
+            await asyncio.sleep(0.25)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+# ------------------------------
+# OCR RECEIPT ENDPOINT
+# ------------------------------
+@router.post("/ocr-receipt", status_code=202)
+async def ocr_receipt(
+    engine: Literal[ocr_engines.MODES] = ocr_jobs.OCR_ENGINE,
+    save: bool = True,
+    allow_duplicate: bool = False,
+    file: UploadFile = File(...),
+):
+    """Queue OCR for a receipt photo; poll the returned job for the result.
+
+    `engine=cascade` tries tesseract first and only runs EasyOCR when
+    tesseract isn't confident. With `save=false` nothing but the scan
+    record is stored. A photo that was uploaded before is not saved again
+    unless `allow_duplicate=true`.
+    """
+
+    def finish(job, ocr: dict) -> dict:
+        return receipts.save_receipt(ocr, engine, save=save, allow_duplicate=allow_duplicate)
+
+    with metrics.span("ocr.upload"):
+        image_bytes = await file.read()
+        return submit_ocr_job(engine, image_bytes, finish)
@@ -1,13 +1,25 @@
-﻿from fastapi import APIRouter, Depends, HTTPException, File, UploadFile
+﻿from fastapi import APIRouter, Depends, HTTPException, Request, Response, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from database import SessionLocal
+from typing import Literal
+from database import SessionLocal, engine
 import models, schemas
-from routers.ml import predict_category
-from datetime import datetime
-import pytesseract
-from PIL import Image
-from io import BytesIO
-import re
+import anomaly
+import category_model
+import db_writer
+import bulk_import
+import dedup
+import installments
+import columnar_export
+import metrics
+import rollups
+import transaction_queries as query
+import vector_index
+from model_registry import ModelNotReady
+from routers.ml import embed_many, predict_category
+import json
 
 router = APIRouter()
 
@@ -31,7 +43,7 @@ def add_transaction(tx: schemas.TransactionCreate, db: Session = Depends(get_db)
     else:
         predicted_category = predict_category(tx.description)
 
-    new_tx = models.Transaction(
+    fields = dict(
         date=tx.date,
         amount=tx.amount,
         description=tx.description,
@@ -39,14 +51,73 @@ def add_transaction(tx: schemas.TransactionCreate, db: Session = Depends(get_db)
         installments=tx.installments,
         monthly_payment=tx.monthly_payment,
         category=predicted_category,
+        category_source="model",
         type=tx.type
     )
+    signatures, matches = dedup.find_duplicates(db, [fields])
+    anomaly.detector.score_transactions([fields])
+    db.close()   # reads are done; don't hold a connection while queued
 
-    db.add(new_tx)
-    db.commit()
-    db.refresh(new_tx)
+    def insert(session):
+        row = models.Transaction(**fields)
+        session.add(row)
+        rollups.apply(session, added=[row])
+        session.flush()
+        dedup.record(session, [row.id], signatures, matches)
+        installments.schedule(session, [row.id], [row])
+        return row
+
+    # Committed together with other concurrent inserts (one WAL sync)
+    new_tx = db_writer.write(insert)
+    try:
+        vector_index.index_transactions([new_tx.id], [new_tx.description])
+    except ModelNotReady:
+        pass   # already saved; the backfill embeds it once the embedder is up
+    anomaly.detector.note_changes()
+    # Saved either way; suspected copies are queued for review under /duplicates
+    new_tx.possible_duplicates = [original for original, _ in matches[0]]
     return new_tx
 
+# ------------------------------
+# BULK IMPORT (JSON array or CSV)
+# ------------------------------
+async def _read_bulk_payload(request: Request):
+    content_type = request.headers.get("content-type", "")
+
+    if content_type.startswith("application/json"):
+        payload = await request.json()
+        if not isinstance(payload, list):
+            raise HTTPException(status_code=422, detail="Expected a JSON array of transactions")
+        return payload
+
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("file")
+        if upload is None or isinstance(upload, str):
+            raise HTTPException(status_code=422, detail="Missing CSV file in form field 'file'")
+        return bulk_import.rows_from_csv(await upload.read())
+
+    if content_type.startswith("text/csv"):
+        return bulk_import.rows_from_csv(await request.body())
+
+    raise HTTPException(status_code=415, detail="Send application/json, text/csv or a multipart CSV upload")
+
+
+@router.post("/transactions/bulk", response_model=schemas.BulkImportResult)
+async def bulk_transactions(
+    request: Request,
+    chunk_size: int = Query(bulk_import.DEFAULT_CHUNK_SIZE, ge=1, le=5000),
+    stream: bool = False,
+):
+    rows = await _read_bulk_payload(request)
+
+    if stream:
+        # One NDJSON progress line per committed chunk, then a summary line
+        events = (json.dumps(e) + "\n" for e in bulk_import.ingest(rows, chunk_size))
+        return StreamingResponse(events, media_type="application/x-ndjson")
+
+    return await run_in_threadpool(bulk_import.ingest_all, rows, chunk_size)
+
 # ------------------------------
 # UPDATE TRANSACTION
 # ------------------------------
@@ -57,91 +128,203 @@ def update_transaction(transaction_id: int, tx_update: schemas.TransactionUpdate
     if not tx_db:
         raise HTTPException(status_code=404, detail="Transaction not found")
 
-    update_data = tx_update.dict(exclude_unset=True)
+    update_data = tx_update.model_dump(exclude_unset=True)
+    needs_category = any(
+        field in update_data and update_data[field] != getattr(tx_db, field)
+        for field in ("description", "type")
+    )
+    description_changed = update_data.get("description", tx_db.description) != tx_db.description
+    was_corrected = tx_db.category_source == "user"
+    previous_category = tx_db.category
+    corrected = False
+    if description_changed:
+        dedup.invalidate([tx_db.id])
+    # Work out the new values on the loaded copy; the writer applies them
     for field, value in update_data.items():
         setattr(tx_db, field, value)
 
-    # recalculate category
+    # recalculate category only when its inputs changed
     if tx_db.type == "income":
         tx_db.category = "Income"
-    else:
+        tx_db.category_source = "model"
+    elif update_data.get("category"):
+        # A category set by hand is a correction the kNN categorizer learns from;
+        # re-sending the current one changes nothing
+        corrected = tx_db.category != previous_category
+        if corrected:
+            tx_db.category_source = "user"
+    elif needs_category or tx_db.category is None:
         tx_db.category = predict_category(tx_db.description)
+        tx_db.category_source = "model"
+
+    anomaly.detector.score_transactions([tx_db])
+    changes = {
+        field: getattr(tx_db, field)
+        for field in (*update_data, "category", "category_source", "anomaly_score")
+    }
+    db.close()   # the copy above is discarded, not committed
+
+    def apply_update(session):
+        row = session.get(models.Transaction, transaction_id)
+        if row is None:
+            return None
+        before = rollups.snapshot(row)
+        for field, value in changes.items():
+            setattr(row, field, value)
+        if corrected:
+            session.add(models.CategoryCorrection(
+                transaction_id=row.id,
+                description=row.description,
+                previous_category=previous_category,
+                category=row.category,
+            ))
+        rollups.apply(session, added=[row], removed=[before])
+        installments.reschedule(session, row)
+        return row
+
+    tx_db = db_writer.write(apply_update)
+    if tx_db is None:
+        raise HTTPException(status_code=404, detail="Transaction not found")
 
-    db.commit()
-    db.refresh(tx_db)
+    # An amount or date edit leaves both the vector and the correction as they were
+    recorded = tx_db.category_source == "user" and (description_changed or tx_db.category != previous_category)
+    try:
+        if description_changed or recorded:
+            vector_index.index_transactions([tx_db.id], [tx_db.description])
+        if recorded:
+            vector_index.record_correction(tx_db.id, tx_db.category)
+        elif was_corrected and tx_db.category_source != "user":
+            vector_index.get_corrections().remove([tx_db.id])
+    except ModelNotReady:
+        # Already saved. A stale vector is dropped so the backfill re-embeds
+        # the row, and the correction is picked up when the backfill embeds it
+        if description_changed:
+            vector_index.forget([tx_db.id])
+    if corrected:
+        category_model.trainer.note_correction()
+    anomaly.detector.note_changes()
     return tx_db
 
 # ------------------------------
 # DELETE TRANSACTION
 # ------------------------------
 @router.delete("/transactions/{transaction_id}")
-def delete_transaction(transaction_id: int, db: Session = Depends(get_db)):
-    tx_db = db.query(models.Transaction).filter(models.Transaction.id == transaction_id).first()
+def delete_transaction(transaction_id: int):
 
-    if not tx_db:
-        raise HTTPException(status_code=404, detail="Transaction not found")
+    def delete(session):
+        row = session.get(models.Transaction, transaction_id)
+        if row is None:
+            return False
+        rollups.apply(session, removed=[row])
+        installments.unschedule(session, [row.id])
+        dedup.forget(session, [row.id])
+        session.delete(row)
+        return True
 
-    db.delete(tx_db)
-    db.commit()
+    if not db_writer.write(delete):
+        raise HTTPException(status_code=404, detail="Transaction not found")
+    vector_index.forget([transaction_id])
+    anomaly.detector.note_changes()
     return {"detail": "Transaction deleted"}
 
 # ------------------------------
 # GET TRANSACTIONS
 # ------------------------------
+MAX_PAGE_SIZE = 5000
+
+
+def _stream_ndjson(stmt, fields):
+    # Own connection: the request-scoped session is closed before streaming ends
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=1000).execute(stmt)
+        for rows in result.mappings().partitions():
+            metrics.read_rows("transactions.ndjson", len(rows))
+            yield "".join(json.dumps(query.to_json_row(r, fields)) + "\n" for r in rows)
+
+
+@router.get("/transactions/search", response_model=list[schemas.TransactionSearchHit])
+def search_transactions(
+    q: str = Query(..., min_length=1),
+    k: int = Query(10, ge=1, le=100),
+    min_score: float = Query(0.0, ge=-1.0, le=1.0),
+    filters: query.TransactionFilters = Depends(),
+    db: Session = Depends(get_db),
+):
+    """Transactions whose description means something close to `q`."""
+    index = vector_index.get_vectors()
+    ids = None
+    if any(v is not None for v in vars(filters).values()):
+        ids = db.scalars(filters.apply(select(models.Transaction.id))).all()
+        metrics.read_rows("transactions.search_filter", len(ids))
+    hits = [(i, score) for i, score in index.search(embed_many([q])[0], k, ids) if score >= min_score]
+
+    rows = {tx.id: tx for tx in db.query(models.Transaction).filter(models.Transaction.id.in_([i for i, _ in hits]))}
+    return [
+        {**schemas.TransactionResponse.model_validate(rows[i]).model_dump(), "score": round(score, 4)}
+        for i, score in hits
+        if i in rows
+    ]
+
+
 @router.get("/transactions", response_model=list[schemas.TransactionResponse])
-def get_transactions(db: Session = Depends(get_db)):
-    return db.query(models.Transaction).all()
+def get_transactions(
+    request: Request,
+    filters: query.TransactionFilters = Depends(),
+    fields: list[str] = Depends(query.parse_fields),
+    limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    order_by: Literal[query.ORDERINGS] = "id",
+    format: Literal["json", "ndjson"] = "json",
+    db: Session = Depends(get_db),
+):
+    """List transactions, optionally filtered, projected and keyset-paginated.
+
+    When `limit` is set and more rows remain, the next page's cursor is
+    returned in the `X-Next-Cursor` header (and a `Link: rel="next"` header).
+    `format=ndjson` streams every matching row, one JSON object per line.
+    """
+    if format == "ndjson":
+        stmt = query.select_transactions(filters, fields, order_by, cursor)
+        return StreamingResponse(_stream_ndjson(stmt, fields), media_type="application/x-ndjson")
+
+    stmt = query.select_transactions(filters, fields, order_by, cursor, limit)
+    rows = db.execute(stmt).mappings().all()
+    metrics.read_rows("transactions.list", len(rows))
+
+    headers = {}
+    if limit is not None and len(rows) == limit:
+        next_cursor = query.encode_cursor(rows[-1], order_by)
+        next_url = request.url.include_query_params(cursor=next_cursor)
+        headers["X-Next-Cursor"] = next_cursor
+        headers["Link"] = f'<{next_url}>; rel="next"'
+
+    # Rows are already JSON-safe dicts (possibly a sparse field subset),
+    # so skip per-row Pydantic validation
+    return JSONResponse([query.to_json_row(r, fields) for r in rows], headers=headers)
 
 # ------------------------------
-# OCR RECEIPT ENDPOINT
+# COLUMNAR EXPORTS (Arrow IPC / Parquet)
 # ------------------------------
-@router.post("/ocr-receipt")
-def ocr_receipt(file: UploadFile = File(...), db: Session = Depends(get_db)):
-    # Read image
-    image_bytes = file.file.read()
-    image = Image.open(BytesIO(image_bytes))
-
-    # OCR text extraction
-    text = pytesseract.image_to_string(image)
-
-    # ---- Extract amount ----
-    amount_match = re.search(r"(\d+[.,]\d{1,2})", text)
-    amount = float(amount_match.group(1).replace(",", ".")) if amount_match else None
-
-    # ---- Extract date ----
-    date_match = re.search(r"\d{2}/\d{2}/\d{4}", text)
-    date = date_match.group(0) if date_match else datetime.now().strftime("%Y-%m-%d")
-
-    # ---- Simple description ----
-    description = text.split("\n")[0][:40]  # first line cleaned
-
-    # ---- Predict category using SBERT ----
-    category = predict_category(text)
-    tx_type = "income" if category.lower() == "income" else "expense"
-
-    # ===== SAVE TO DATABASE =====
-    new_tx = models.Transaction(
-        date=date,
-        amount=amount,
-        description=description,
-        payment_method="ocr",
-        installments=0,
-        monthly_payment=0,
-        category=category,
-        type=tx_type
+@router.get("/transactions.arrow")
+def export_arrow(
+    filters: query.TransactionFilters = Depends(),
+    fields: list[str] = Depends(query.parse_fields),
+):
+    stmt = query.select_transactions(filters, fields)
+    return StreamingResponse(
+        columnar_export.arrow_stream(stmt, fields),
+        media_type="application/vnd.apache.arrow.stream",
     )
 
-    db.add(new_tx)
-    db.commit()
-    db.refresh(new_tx)
-
-    # Return summary
-    return {
-        "saved": True,
-        "id": new_tx.id,
-        "amount": amount,
-        "date": date,
-        "category": category,
-        "description": description,
-        "raw_text": text
-    }
+
+@router.get("/transactions.parquet")
+def export_parquet(
+    filters: query.TransactionFilters = Depends(),
+    fields: list[str] = Depends(query.parse_fields),
+):
+    stmt = query.select_transactions(filters, fields)
+    return Response(
+        columnar_export.parquet_bytes(stmt, fields),
+        media_type="application/vnd.apache.parquet",
+        headers={"Content-Disposition": 'attachment; filename="transactions.parquet"'},
+    )
@@ -1,8 +1,9 @@
 from pydantic import BaseModel
+import datetime as dt
 
 
 class TransactionCreate(BaseModel):
-    date: str
+    date: dt.date
     amount: float
     description: str
     payment_method: str
@@ -12,19 +13,24 @@ class TransactionCreate(BaseModel):
 
 class TransactionUpdate(BaseModel):
     "Used for editing transactions"
-    date: str | None = None
+    date: dt.date | None = None
     amount: float | None = None
     description: str | None = None
     payment_method: str | None = None
     installments: int | None = None
     monthly_payment: float | None = None
     type: str | None = None
+    category: str | None = None   # set by hand: a correction the kNN categorizer learns from
 
 
 class TransactionResponse(TransactionCreate):
     id: int
+    date: dt.date | None   # NULL when a legacy date string could not be migrated
+    anomaly_score: float | None = None
     category: str
     type: str
+    category_source: str | None = None
+    possible_duplicates: list[int] = []   # ids this looks like a copy of (set on create)
 
     # Pydantic v2 config
     model_config = {
@@ -36,4 +42,45 @@ class MonthlySummary(BaseModel):
     month: str            # "2025-05"
     total_expenses: float
     total_income: float
-    net_cashflow: float
\ No newline at end of file
+    net_cashflow: float
+
+
+class CategoryScore(BaseModel):
+    category: str
+    confidence: float
+
+
+class CategoryPrediction(BaseModel):
+    description: str
+    category: str
+    confidence: float | None = None      # calibrated; None for models without probabilities
+    needs_review: bool = False           # confidence under CATEGORY_MIN_CONFIDENCE
+    alternatives: list[CategoryScore] = []
+
+
+class BulkRowError(BaseModel):
+    row: int              # 1-based position in the uploaded payload
+    errors: list[dict]
+
+
+class BulkImportResult(BaseModel):
+    total: int
+    inserted: int
+    failed: int
+    duplicates: int = 0   # inserted but flagged as suspected duplicates
+    skipped: int = 0      # near-identical to an existing row (DEDUP_IMPORT_MODE=skip)
+    errors: list[BulkRowError]
+
+
+class DuplicatePairResponse(BaseModel):
+    id: int
+    reason: str
+    similarity: float | None
+    status: str
+    # None for the side a merge deleted
+    transaction: TransactionResponse | None
+    duplicate_of: TransactionResponse | None
+
+
+class TransactionSearchHit(TransactionResponse):
+    score: float          # cosine similarity to the query
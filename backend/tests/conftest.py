@@ -0,0 +1,96 @@
+"""Run from backend/:
+
+    python -m pytest -q tests
+
+The app reads its database URL, artifact paths and warm-up list from the
+environment at import time, so they point into a temporary directory
+before any backend module is imported.
+"""
+import os
+import sys
+import tempfile
+import zlib
+
+import numpy as np
+import pytest
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+_DATA = tempfile.mkdtemp(prefix="finance-tests-")
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{os.path.join(_DATA, 'finance.db')}",
+    "WARM_MODELS": "none",
+    "VECTOR_BACKFILL": "0",
+    "VECTOR_INDEX_PATH": os.path.join(_DATA, "finance.vectors"),
+    "DEDUP_INDEX_PATH": os.path.join(_DATA, "finance.simhash"),
+    "PREDICTION_CACHE_PATH": os.path.join(_DATA, "prediction_cache.db"),
+    "ANOMALY_MODEL_DIR": os.path.join(_DATA, "anomaly"),
+    "CATEGORY_MODEL_DIR": os.path.join(_DATA, "category"),
+    "CATEGORY_BASE_DATA": os.path.join(_DATA, "no-seed-data.csv"),
+})
+
+# Descriptions the fake classifier knows, and their categories
+SEED_CATEGORIES = {
+    "Corner grocery": "Food",
+    "Monthly rent": "Rent",
+    "Bus ticket": "Transport",
+}
+
+
+class FakeEmbedder:
+    """Equal descriptions (ignoring case) embed identically; others are unrelated."""
+
+    name = "fake"
+
+    def embed(self, texts):
+        return np.asarray(
+            [np.random.default_rng(zlib.crc32(t.strip().lower().encode())).standard_normal(384) for t in texts],
+            dtype=np.float32,
+        )
+
+
+@pytest.fixture
+def db():
+    """A session on an empty database (the app's own engine, so writer jobs see it)."""
+    import migrations
+    from database import Base, SessionLocal, engine
+
+    Base.metadata.drop_all(bind=engine)
+    migrations.run()   # the tables plus the seeded data_version row
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def models_ready(tmp_path):
+    """Fresh in-process models: a fake embedder and a prototype head over SEED_CATEGORIES."""
+    import dedup
+    import vector_index
+    from category_head import LinearHead
+    from model_registry import registry
+    from prediction_cache import PredictionCache
+
+    embedder = FakeEmbedder()
+    head = LinearHead.prototypes(embedder.embed(list(SEED_CATEGORIES)), list(SEED_CATEGORIES.values()))
+    registry.swap("embedder", embedder)
+    registry.swap("classifier", head)
+    registry.swap("prediction_cache", PredictionCache(str(tmp_path / "prediction_cache.db"), "test"))
+    registry.swap("transaction_vectors", vector_index.VectorIndex(str(tmp_path / "finance.vectors"), "test"))
+    registry.swap("category_corrections", vector_index.CorrectionIndex())
+    registry.swap("dedup_signatures", dedup.SignatureIndex(str(tmp_path / "finance.simhash"), "test"))
+    registry.swap("dedup_images", dedup.ImageHashIndex())
+    return registry
+
+
+@pytest.fixture
+def client(db, models_ready):
+    from fastapi.testclient import TestClient
+
+    from main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
@@ -0,0 +1,66 @@
+from datetime import date
+
+import pytest
+
+import data_version
+import forecast
+from routers import analytics
+
+
+@pytest.fixture(autouse=True)
+def fresh_caches(monkeypatch):
+    # Every test starts a new database at version 0; don't serve another test's results
+    monkeypatch.setattr(analytics, "_dashboard_cache", data_version.VersionedCache("dashboard", maxsize=4))
+    monkeypatch.setattr(forecast, "cache", data_version.VersionedCache("forecast"))
+
+
+def _add(client, description, amount, type="expense", day=None):
+    client.post("/add-transaction", json={
+        "date": (day or date.today()).isoformat(), "amount": amount, "description": description,
+        "payment_method": "card", "installments": 1, "monthly_payment": amount, "type": type,
+    })
+
+
+def test_dashboard_totals_and_series(client):
+    _add(client, "Corner grocery", 40.0, day=date(2025, 3, 3))   # a Monday
+    _add(client, "Monthly rent", 900.0, day=date(2025, 3, 3))
+    _add(client, "Salary", 2500.0, type="income", day=date(2025, 3, 1))
+
+    body = client.get("/analytics/dashboard").json()
+    assert body["balance"] == {"income": 2500.0, "expenses": 940.0, "balance": 1560.0}
+    assert body["daily"] == {
+        "date": ["2025-03-01", "2025-03-03"], "income": [2500.0, 0.0], "expense": [0.0, 940.0],
+    }
+    assert body["categories"] == [{"category": "Rent", "amount": 900.0}, {"category": "Food", "amount": 40.0}]
+    assert body["weekday"][0] == {"weekday": "Monday", "amount": 940.0}
+    assert body["top_categories"] == []
+
+
+def test_dashboard_answers_304_until_a_write_commits(client):
+    _add(client, "Corner grocery", 40.0)
+    first = client.get("/analytics/dashboard")
+    etag = first.headers["ETag"]
+    assert first.json()["top_categories"] == [{"category": "Food", "amount": 40.0}]
+
+    again = client.get("/analytics/dashboard", headers={"If-None-Match": etag})
+    assert (again.status_code, again.content, again.headers["ETag"]) == (304, b"", etag)
+
+    # A rejected write leaves the version alone
+    assert client.delete("/transactions/999").status_code == 404
+    assert client.get("/analytics/dashboard", headers={"If-None-Match": etag}).status_code == 304
+
+    _add(client, "Bus ticket", 2.5)
+    changed = client.get("/analytics/dashboard", headers={"If-None-Match": f'"stale", {etag}'})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+
+
+def test_forecast_is_tagged_per_parameters(client):
+    _add(client, "Corner grocery", 40.0)
+
+    three = client.get("/analytics/forecast", params={"months": 3})
+    six = client.get("/analytics/forecast", params={"months": 6})
+    assert three.headers["ETag"] != six.headers["ETag"]
+    assert client.get(
+        "/analytics/forecast", params={"months": 3}, headers={"If-None-Match": three.headers["ETag"]}
+    ).status_code == 304
@@ -0,0 +1,97 @@
+import json
+from datetime import date, timedelta
+
+import pytest
+
+import anomaly
+import models
+
+
+@pytest.fixture
+def model_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(anomaly, "MODEL_DIR", str(tmp_path / "anomaly"))
+    return tmp_path / "anomaly"
+
+
+def _history(db):
+    """Two months of coffee and groceries at their usual prices, plus salary."""
+    start = date(2025, 1, 1)
+    for day in range(60):
+        db.add(models.Transaction(date=start + timedelta(days=day), amount=3.5 + day % 3 * 0.25,
+                                  description="Corner cafe", category="Food", type="expense"))
+        if day % 7 == 0:
+            db.add(models.Transaction(date=start + timedelta(days=day), amount=80.0 + day % 5,
+                                      description="Supermarket", category="Food", type="expense"))
+    db.add(models.Transaction(date=start, amount=2500.0, description="Salary", category="Income", type="income"))
+    db.commit()
+
+
+def test_train_scores_every_expense_and_saves_a_version(db, model_dir):
+    _history(db)
+
+    model = anomaly.train(db, version=1)
+
+    T = models.Transaction
+    assert db.query(T).filter(T.type == "expense", T.anomaly_score.is_(None)).count() == 0
+    assert db.query(T).filter(T.type == "income").one().anomaly_score is None
+    pointer = json.loads((model_dir / "current.json").read_text())
+    assert pointer["artifact"] == "isolation_forest_v1.joblib"
+    assert pointer["trained_rows"] == model.trained_rows
+    assert anomaly.load_current().version == 1
+
+
+def test_unusual_amount_for_the_merchant_scores_higher(db, model_dir):
+    _history(db)
+    model = anomaly.train(db, version=1)
+
+    usual = {"date": date(2025, 3, 4), "amount": 3.75, "description": "Corner cafe", "category": "Food"}
+    unusual = {**usual, "amount": 95.0}
+    usual_score, unusual_score = model.score([usual, unusual])
+    assert unusual_score > usual_score
+    assert unusual_score > model.threshold
+
+
+def test_too_few_rows_trains_nothing(db, model_dir):
+    db.add(models.Transaction(date=date(2025, 1, 1), amount=3.5, description="Cafe", category="Food", type="expense"))
+    db.commit()
+
+    assert anomaly.train(db, version=1) is None
+    assert anomaly.load_current() is None
+
+
+def test_score_transactions_only_scores_expenses(db, model_dir):
+    _history(db)
+    anomaly.train(db, version=1)
+    detector = anomaly.AnomalyDetector()
+
+    rows = [
+        {"date": date(2025, 3, 4), "amount": 3.5, "description": "Corner cafe", "category": "Food", "type": "expense"},
+        {"date": date(2025, 3, 4), "amount": 2500.0, "description": "Salary", "category": "Income", "type": "income"},
+    ]
+    detector.score_transactions(rows)
+    assert rows[0]["anomaly_score"] is not None
+    assert rows[1]["anomaly_score"] is None
+
+
+def test_unreadable_artifact_disables_scoring_instead_of_failing(model_dir):
+    model_dir.mkdir()
+    (model_dir / "isolation_forest_v1.joblib").write_bytes(b"not a pickle")
+    (model_dir / "current.json").write_text(json.dumps({"artifact": "isolation_forest_v1.joblib", "version": 1}))
+    detector = anomaly.AnomalyDetector()
+
+    tx = {"date": date(2025, 3, 4), "amount": 3.5, "description": "Cafe", "category": "Food", "type": "expense"}
+    detector.score_transactions([tx])
+    assert tx["anomaly_score"] is None
+    assert detector.load_error is not None
+
+
+def test_a_new_version_never_overwrites_an_unreadable_one(model_dir):
+    assert anomaly.next_version() == 1
+    model_dir.mkdir()
+    (model_dir / "isolation_forest_v3.joblib").write_bytes(b"not a pickle")
+    (model_dir / "current.json").write_text(json.dumps({"artifact": "isolation_forest_v3.joblib", "version": 3}))
+    assert anomaly.next_version() == 4
+
+    # An artifact newer than the pointer (e.g. after a rollback) counts too
+    (model_dir / "isolation_forest_v5.joblib").write_bytes(b"")
+    assert anomaly.next_version() == 6
@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+from sklearn.linear_model import LogisticRegression
+from sklearn.svm import SVC
+
+import category_head
+from category_head import LinearHead
+
+
+def _clusters(n=90, seed=0):
+    rng = np.random.default_rng(seed)
+    labels = np.array(["Food", "Rent", "Transport"] * (n // 3))
+    X = 2 * np.eye(3, 16)[np.arange(n) % 3] + 0.5 * rng.standard_normal((n, 16))
+    return X.astype(np.float32), labels
+
+
+def test_head_matches_the_estimator_it_was_copied_from():
+    X, y = _clusters()
+    clf = LogisticRegression(max_iter=1000).fit(X, y)
+
+    head = LinearHead.from_estimator(clf)
+    assert (head.predict(X) == clf.predict(X)).all()
+    np.testing.assert_allclose(head.decision_function(X), clf.decision_function(X), rtol=1e-4, atol=1e-4)
+
+
+def test_binary_estimators_get_two_columns():
+    X, y = _clusters()
+    binary = y != "Transport"
+    clf = LogisticRegression(max_iter=1000).fit(X[binary], y[binary])
+
+    head = LinearHead.from_estimator(clf)
+    assert head.weights.shape == (16, 2)
+    assert (head.predict(X[binary]) == clf.predict(X[binary])).all()
+
+
+def test_prototypes_score_by_cosine_to_each_centroid():
+    X, y = _clusters()
+    head = LinearHead.prototypes(X, y)
+
+    assert head.kind == "prototype"
+    assert (head.predict(X) == y).mean() > 0.9
+    # Scaling an embedding doesn't change a cosine score
+    np.testing.assert_allclose(head.decision_function(10 * X[:5]), head.decision_function(X[:5]), atol=1e-5)
+
+
+def test_calibration_fits_the_temperature_on_holdout_rows():
+    X, y = _clusters()
+    head = LinearHead.prototypes(X[:60], y[:60])
+    before = head.predict_proba(X[60:]).max(axis=1).mean()
+
+    head.calibrate(X[60:], y[60:])
+    assert head.temperature < 1.0
+    # Cosines span [-1, 1]; a sharper softmax makes correct answers confident
+    assert head.predict_proba(X[60:]).max(axis=1).mean() > before
+    np.testing.assert_allclose(head.predict_proba(X).sum(axis=1), 1.0, rtol=1e-5)
+
+
+def test_unknown_kind_is_rejected():
+    with pytest.raises(ValueError):
+        LinearHead(np.zeros((2, 2)), np.zeros(2), ["a", "b"], kind="rbf")
+
+
+def test_save_and_load_without_pickles(tmp_path):
+    X, y = _clusters()
+    head = LinearHead.prototypes(X, y).calibrate(X, y)
+    path = str(tmp_path / "head_v3.npy")
+    head.save(path)
+
+    loaded = LinearHead.load(path)
+    assert loaded.kind == "prototype"
+    assert loaded.temperature == head.temperature
+    np.testing.assert_array_equal(loaded.predict_proba(X), head.predict_proba(X))
+
+
+def test_top_k_is_ordered_and_starts_with_the_prediction():
+    X, y = _clusters()
+    head = LinearHead.from_estimator(LogisticRegression(max_iter=1000).fit(X, y)).calibrate(X, y)
+
+    choices = category_head.top_k(head, X[:4], k=5)
+    assert [len(c) for c in choices] == [3] * 4
+    for row, predicted in zip(choices, head.predict(X[:4])):
+        assert row[0][0] == predicted
+        assert [p for _, p in row] == sorted((p for _, p in row), reverse=True)
+
+
+def test_top_k_is_empty_for_an_svc():
+    X, y = _clusters()
+    assert category_head.top_k(SVC().fit(X, y), X[:2]) == [[], []]
@@ -0,0 +1,82 @@
+import json
+
+import joblib
+import numpy as np
+import pytest
+
+import category_model
+
+
+@pytest.fixture
+def model_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(category_model, "MODEL_DIR", str(tmp_path / "category"))
+    monkeypatch.setattr(category_model, "activate", lambda: None)
+    (tmp_path / "category").mkdir()
+    return tmp_path / "category"
+
+
+def _clusters(n=60, seed=0):
+    """Three well separated clusters labeled Food, Rent and Transport."""
+    rng = np.random.default_rng(seed)
+    centers = 2 * np.eye(3, 8)
+    labels = np.array(["Food", "Rent", "Transport"] * (n // 3))
+    X = centers[np.arange(n) % 3] + 0.2 * rng.standard_normal((n, 8))
+    return X.astype(np.float16), labels
+
+
+def _save_meta(model_dir, version, **extra):
+    meta = {"version": version, "artifact": f"classifier_v{version}.joblib", "model": "SGDClassifier(log_loss)", **extra}
+    (model_dir / f"classifier_v{version}.json").write_text(json.dumps(meta))
+    return meta
+
+
+# The warm-started refit converges within tol on this tiny set
+@pytest.mark.filterwarnings("ignore::sklearn.exceptions.ConvergenceWarning")
+def test_fit_saves_a_head_warm_started_from_the_previous_one(tmp_path):
+    X, y = _clusters()
+    weights = np.ones(len(y))
+    holdout = np.arange(len(y)) % 5 == 0
+
+    from sklearn.svm import SVC
+
+    svc_path = str(tmp_path / "svc.pkl")
+    joblib.dump(SVC().fit(X.astype(np.float32), y), svc_path)
+    first, meta = category_model.fit(X, y, weights, holdout, svc_path, version=1)
+    assert meta["artifact"] == "head_v1.npy"
+    assert not meta["warm_start"]
+    assert meta["trained_rows"] + meta["holdout_rows"] == len(y)
+    assert meta["holdout_accuracy"] == 1.0
+
+    linear_path = str(tmp_path / "head_v1.npy")
+    first.save(linear_path)
+    _, meta = category_model.fit(X, y, weights, holdout, linear_path, version=2)
+    assert meta["warm_start"]
+    assert meta["previous_holdout_accuracy"] == 1.0
+
+
+def test_holdout_is_stable_per_key():
+    keys = [f"tx-{i}" for i in range(1000)]
+    first = [category_model._holdout(k) for k in keys]
+    assert first == [category_model._holdout(k) for k in keys]
+    assert 150 < sum(first) < 250
+
+
+def test_versions_mark_the_active_pointer(model_dir):
+    assert [m["version"] for m in category_model.versions()] == [0]
+    assert category_model.current_path() == category_model.BASE_CLASSIFIER_PATH
+
+    category_model.write_pointer(_save_meta(model_dir, 1, previous=0))
+    assert [(m["version"], m["active"]) for m in category_model.versions()] == [(0, False), (1, True)]
+    assert category_model.current_path() == str(model_dir / "classifier_v1.joblib")
+
+
+def test_rollback_follows_previous_and_back_to_the_shipped_model(model_dir):
+    _save_meta(model_dir, 1, previous=0)
+    category_model.write_pointer(_save_meta(model_dir, 2, previous=1))
+
+    assert category_model.rollback()["version"] == 1
+    assert category_model.read_pointer()["version"] == 1
+    category_model.rollback(0)
+    assert not (model_dir / "current.json").exists()
+    with pytest.raises(ValueError):
+        category_model.rollback(7)
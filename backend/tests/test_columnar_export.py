@@ -0,0 +1,53 @@
+import io
+from datetime import date
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import columnar_export
+import models
+from transaction_queries import FIELDS, TransactionFilters, select_transactions
+
+
+def _seed(db, n):
+    db.add_all(
+        models.Transaction(date=date(2025, 1, 1 + i % 28), amount=i + 0.5, description=f"Shop {i}",
+                           category="Food", type="expense", installments=0)
+        for i in range(n)
+    )
+    db.commit()
+
+
+def test_arrow_stream_round_trip(db, monkeypatch):
+    # Several record batches, each yielded as its own chunk
+    monkeypatch.setattr(columnar_export, "BATCH_ROWS", 4)
+    _seed(db, 10)
+    fields = ["id", "date", "amount", "description"]
+    stmt = select_transactions(TransactionFilters(), fields, "id")
+
+    chunks = list(columnar_export.arrow_stream(stmt, fields, bind=db.get_bind()))
+    table = pa.ipc.open_stream(io.BytesIO(b"".join(chunks))).read_all()
+
+    assert len(chunks) > 2
+    assert table.schema.names == fields
+    assert table.schema.field("date").type == pa.date32()
+    assert table.column("amount").to_pylist() == [i + 0.5 for i in range(10)]
+    assert table.column("date").to_pylist()[0] == date(2025, 1, 1)
+
+
+def test_empty_result_still_has_a_schema(db):
+    stmt = select_transactions(TransactionFilters(type="income"), FIELDS, "id")
+    data = b"".join(columnar_export.arrow_stream(stmt, FIELDS, bind=db.get_bind()))
+
+    table = pa.ipc.open_stream(io.BytesIO(data)).read_all()
+    assert table.num_rows == 0
+    assert table.schema.names == FIELDS
+
+
+def test_parquet_round_trip(db):
+    _seed(db, 5)
+    stmt = select_transactions(TransactionFilters(min_amount=2), FIELDS, "id")
+
+    table = pq.read_table(io.BytesIO(columnar_export.parquet_bytes(stmt, FIELDS, bind=db.get_bind())))
+    assert table.column("amount").to_pylist() == [2.5, 3.5, 4.5]
+    assert table.column("installments").type == pa.int64()
@@ -0,0 +1,73 @@
+from datetime import date
+
+from sqlalchemy import delete, insert, update
+
+import data_version
+import models
+
+
+def _tx(**fields):
+    return models.Transaction(date=date(2025, 3, 14), amount=10.0, description="Corner grocery",
+                              type="expense", **fields)
+
+
+def test_orm_writes_bump_once_per_commit(db):
+    db.add_all([_tx(), _tx()])
+    db.flush()
+    db.add(_tx())
+    db.commit()
+    assert data_version.current(db) == 1
+
+    tx = db.query(models.Transaction).first()
+    tx.amount = 11.0
+    db.commit()
+    db.delete(tx)
+    db.commit()
+    assert data_version.current(db) == 3
+
+
+def test_statements_bump_and_rollbacks_do_not(db):
+    T = models.Transaction
+    db.execute(insert(T), [{"date": date(2025, 3, 14), "amount": 1.0, "description": "x"}])
+    db.execute(update(T).values(amount=2.0))
+    db.commit()
+    assert data_version.current(db) == 1
+
+    db.execute(delete(T))
+    db.rollback()
+    assert data_version.current(db) == 1
+
+
+def test_other_tables_and_opted_out_statements_do_not_bump(db):
+    db.add(models.MonthlyRollup(month="2025-03", type="expense", category="Food", total=1.0, count=1))
+    db.add(_tx())
+    db.commit()
+    before = data_version.current(db)
+
+    db.add(models.MonthlyRollup(month="2025-04", type="expense", category="Food", total=1.0, count=1))
+    db.execute(
+        update(models.Transaction).values(anomaly_score=0.5).execution_options(bump_data_version=False)
+    )
+    db.commit()
+    assert data_version.current(db) == before
+
+
+def test_versioned_cache_computes_once_per_version():
+    cache = data_version.VersionedCache("test", maxsize=2)
+    calls = []
+
+    def compute(value):
+        return lambda: calls.append(value) or value
+
+    assert cache.get(1, "a", compute("a1")) == "a1"
+    assert cache.get(1, "a", compute("other")) == "a1"
+    assert cache.get(2, "a", compute("a2")) == "a2"
+    for key in ("b", "c", "a"):
+        cache.get(2, key, compute(key))
+    assert calls == ["a1", "a2", "b", "c", "a"]
+    assert cache.stats() == {"version": 2, "entries": 2, "hits": 1, "misses": 5}
+
+
+def test_etag_is_quoted_and_covers_every_part():
+    assert data_version.etag(7) == '"7"'
+    assert data_version.etag(7, "2025-03", 3) == '"7-2025-03-3"'
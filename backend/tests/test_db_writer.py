@@ -0,0 +1,76 @@
+import threading
+from datetime import date
+
+import pytest
+from sqlalchemy import event
+
+import db_writer
+import models
+from database import engine
+
+
+def _insert(description):
+    def job(session):
+        row = models.Transaction(date=date(2025, 3, 14), amount=10.0, description=description, type="expense")
+        session.add(row)
+        session.flush()
+        return row.id
+    return job
+
+
+@pytest.fixture
+def commits():
+    counted = []
+
+    def count(conn):
+        counted.append(1)
+
+    event.listen(engine, "commit", count)
+    yield counted
+    event.remove(engine, "commit", count)
+
+
+def test_concurrent_writes_share_commits(db, commits):
+    ids = []
+    lock = threading.Lock()
+
+    def write(i):
+        tx_id = db_writer.write(_insert(f"tx {i}"))
+        with lock:
+            ids.append(tx_id)
+
+    threads = [threading.Thread(target=write, args=(i,)) for i in range(40)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(ids) == list(range(1, 41))
+    assert db.query(models.Transaction).count() == 40
+    assert len(commits) < 40
+
+
+def test_a_failing_job_fails_only_its_caller(db):
+    def boom(session):
+        session.add(models.Transaction(date=date(2025, 3, 14), amount=1.0, description="half written"))
+        raise RuntimeError("boom")
+
+    good = db_writer.writer.submit(_insert("kept"))
+    bad = db_writer.writer.submit(boom)
+    assert good.result(timeout=5)[0]
+    ok, error = bad.result(timeout=5)
+    assert not ok and isinstance(error, RuntimeError)
+
+    with pytest.raises(RuntimeError):
+        db_writer.write(boom)
+    assert [t.description for t in db.query(models.Transaction)] == ["kept"]
+
+
+def test_returned_rows_stay_readable(db):
+    def job(session):
+        row = models.Transaction(date=date(2025, 3, 14), amount=5.0, description="Bus ticket", type="expense")
+        session.add(row)
+        return row
+
+    row = db_writer.write(job)
+    assert (row.id, row.description) == (1, "Bus ticket")
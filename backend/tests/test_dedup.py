@@ -0,0 +1,160 @@
+import zlib
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+import dedup
+import models
+
+
+def fake_embed_many(texts):
+    """Equal descriptions (ignoring case) embed identically; others are unrelated."""
+    return np.asarray(
+        [np.random.default_rng(zlib.crc32(t.strip().lower().encode())).standard_normal(384) for t in texts],
+        dtype=np.float32,
+    )
+
+
+@pytest.fixture
+def signatures(tmp_path, monkeypatch):
+    index = dedup.SignatureIndex(str(tmp_path / "finance.simhash"), "test")
+    monkeypatch.setattr(dedup, "get_signatures", lambda: index)
+    monkeypatch.setattr(dedup, "embed_many", fake_embed_many)
+    monkeypatch.setattr(dedup, "_embedder_ready", lambda: True)
+    return index
+
+
+def _tx(db, day, amount=42.5, description="Corner grocery", type="expense"):
+    tx = models.Transaction(date=date(2025, 3, day), amount=amount, description=description, type=type)
+    db.add(tx)
+    db.commit()
+    return tx
+
+
+def test_simhash_similarity_tracks_cosine(signatures):
+    rng = np.random.default_rng(0)
+    a = rng.standard_normal(384)
+    near = a + 0.1 * rng.standard_normal(384)
+    signed = signatures.sign([a, near, -a])
+
+    sims = dedup.similarity(signed[0], signed)
+    assert sims[0] == pytest.approx(1.0)
+    assert sims[1] > 0.9
+    assert sims[2] < -0.9
+
+
+def test_signature_index_grows_and_resets_for_a_new_model(tmp_path):
+    path = str(tmp_path / "finance.simhash")
+    index = dedup.SignatureIndex(path, "v1")
+    far_id = dedup.INITIAL_ROWS + 5
+    signature = index.sign(fake_embed_many(["rent"]))
+    index.put([3, far_id], np.vstack([signature, signature]))
+
+    reopened = dedup.SignatureIndex(path, "v1")
+    assert (reopened.get([3, far_id]) == signature).all()
+    reopened.clear([3])
+    assert not reopened.get([3]).any()
+
+    assert not dedup.SignatureIndex(path, "v2").get([far_id]).any()
+
+
+def test_near_identical_transaction_in_the_window_is_matched(db, signatures):
+    original = _tx(db, 14)
+    _tx(db, 14, amount=43.0)                        # other amount
+    _tx(db, 14, type="income")                      # other type
+    _tx(db, 25)                                     # outside the window
+    _tx(db, 15, description="Monthly rent")         # unrelated description
+
+    new = [{"date": date(2025, 3, 16), "amount": 42.5, "description": "CORNER GROCERY", "type": "expense"}]
+    _, matches = dedup.find_duplicates(db, new)
+    assert [m[0] for m in matches[0]] == [original.id]
+
+
+def test_candidates_without_a_signature_get_one(db, signatures):
+    original = _tx(db, 14)
+    assert not signatures.get([original.id]).any()
+
+    dedup.find_duplicates(db, [{"date": date(2025, 3, 14), "amount": 42.5, "description": "x", "type": "expense"}])
+    assert signatures.get([original.id]).any()
+
+
+def test_income_is_matched_on_the_exact_description_without_embedding(db, signatures, monkeypatch):
+    salary = _tx(db, 1, amount=2500.0, description="ACME payroll", type="income")
+    _tx(db, 1, amount=2500.0, description="Bonus", type="income")
+    embedded = []
+    monkeypatch.setattr(dedup, "embed_many", lambda texts: embedded.extend(texts) or fake_embed_many(texts))
+
+    new = {"date": date(2025, 3, 2), "amount": 2500.0, "description": "acme  PAYROLL", "type": "income"}
+    found, matches = dedup.find_duplicates(db, [new])
+    assert matches == [[(salary.id, 1.0)]]
+    assert embedded == []
+    assert not found.any() and not signatures.get([salary.id]).any()
+
+
+def test_without_the_embedder_only_identical_descriptions_match(db, signatures, monkeypatch):
+    original = _tx(db, 14)
+    _tx(db, 14, description="Corner grocery store")
+    monkeypatch.setattr(dedup, "_embedder_ready", lambda: False)
+    monkeypatch.setattr(dedup, "embed_many", lambda texts: pytest.fail("embedded while loading"))
+
+    new = {"date": date(2025, 3, 15), "amount": 42.5, "description": "corner grocery", "type": "expense"}
+    found, matches = dedup.find_duplicates(db, [new])
+    assert matches == [[(original.id, 1.0)]]
+    # Left unsigned; computed later once the embedder is up
+    assert not found.any() and not signatures.get([original.id]).any()
+
+
+def test_a_batch_is_checked_against_its_own_earlier_rows(db, signatures):
+    batch = [
+        {"date": date(2025, 3, 14), "amount": 42.5, "description": "Corner grocery", "type": "expense"},
+        {"date": date(2025, 3, 14), "amount": 42.5, "description": "Monthly rent", "type": "expense"},
+        {"date": date(2025, 3, 15), "amount": 42.5, "description": "corner GROCERY", "type": "expense"},
+        {"date": date(2025, 3, 30), "amount": 42.5, "description": "Corner grocery", "type": "expense"},
+        {"date": date(2025, 3, 1), "amount": 2500.0, "description": "ACME payroll", "type": "income"},
+        {"date": date(2025, 3, 2), "amount": 2500.0, "description": "acme payroll", "type": "income"},
+    ]
+    found, _ = dedup.find_duplicates(db, batch)
+
+    assert dedup.find_within(batch, found) == [[], [], [(0, 1.0)], [], [], [(4, 1.0)]]
+
+
+def test_forget_keeps_merged_pairs(db, signatures):
+    a, b, c = _tx(db, 14), _tx(db, 14), _tx(db, 15)
+    db.add_all([
+        models.DuplicatePair(transaction_id=b.id, duplicate_of_id=a.id, reason="description", status="merged"),
+        models.DuplicatePair(transaction_id=c.id, duplicate_of_id=b.id, reason="description"),
+    ])
+    db.commit()
+
+    dedup.forget(db, [b.id])
+    db.commit()
+    assert [p.status for p in db.query(models.DuplicatePair)] == ["merged"]
+
+
+def test_date_blocks_split_long_spans():
+    window = timedelta(days=3)
+    start = date(2025, 1, 1)
+    txs = [{"date": start + timedelta(days=d), "amount": float(d)} for d in (0, 2, 4, 200, 201)]
+
+    blocks = dedup._date_blocks(txs, window)
+    assert [(b[0], b[1]) for b in blocks] == [
+        (start, start + timedelta(days=4)),
+        (start + timedelta(days=200), start + timedelta(days=201)),
+    ]
+    assert blocks[0][2] == {0.0, 2.0, 4.0}
+
+    daily = [{"date": start + timedelta(days=d), "amount": 1.0} for d in range(365)]
+    assert all(b[1] - b[0] <= timedelta(days=dedup.DEDUP_BLOCK_DAYS) for b in dedup._date_blocks(daily, window))
+
+
+def test_image_hash_index_finds_close_photos():
+    index = dedup.ImageHashIndex()
+    index.add(1, 0xF0F0_F0F0_F0F0_F0F0, transaction_id=10)
+    index.add(2, 0x0F0F_0F0F_0F0F_0F0F, transaction_id=20)
+
+    assert index.find(0xF0F0_F0F0_F0F0_F0F1) == [(1, 10, 1)]
+    assert index.find(0x1234_5678_9ABC_DEF0) == []
+
+    index.relink(10, 30)
+    assert index.find(0xF0F0_F0F0_F0F0_F0F0) == [(1, 30, 0)]
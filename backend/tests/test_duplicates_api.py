@@ -0,0 +1,56 @@
+import pytest
+
+import models
+import vector_index
+
+
+@pytest.fixture
+def pair(client):
+    """A grocery purchase and a near copy of it a day later, queued for review."""
+    tx = {
+        "date": "2025-03-14", "amount": 42.5, "description": "Corner grocery",
+        "payment_method": "card", "installments": 1, "monthly_payment": 42.5, "type": "expense",
+    }
+    original = client.post("/add-transaction", json=tx).json()
+    copy = client.post("/add-transaction", json={**tx, "date": "2025-03-15"}).json()
+    listed = client.get("/duplicates").json()
+    assert len(listed) == 1
+    return listed[0]["id"], original["id"], copy["id"]
+
+
+def test_listing_shows_both_sides(client, pair):
+    pair_id, original_id, copy_id = pair
+    listed = client.get("/duplicates").json()[0]
+    assert (listed["transaction"]["id"], listed["duplicate_of"]["id"]) == (copy_id, original_id)
+    assert listed["reason"] == "description"
+
+
+def test_merge_keeps_the_original_and_the_pair(client, db, pair):
+    pair_id, original_id, copy_id = pair
+
+    kept = client.post(f"/duplicates/{pair_id}/merge").json()
+    assert kept["id"] == original_id
+    assert [t.id for t in db.query(models.Transaction)] == [original_id]
+    assert vector_index.get_vectors().missing([copy_id]).tolist() == [copy_id]
+    merged = client.get("/duplicates?status=merged").json()
+    assert [(p["id"], p["transaction"]) for p in merged] == [(pair_id, None)]
+    assert client.post(f"/duplicates/{pair_id}/merge").status_code == 409
+
+
+def test_merge_can_keep_the_newer_copy(client, db, pair):
+    pair_id, original_id, copy_id = pair
+    assert client.post(f"/duplicates/{pair_id}/merge?keep=duplicate").json()["id"] == copy_id
+    assert [t.id for t in db.query(models.Transaction)] == [copy_id]
+
+
+def test_dismiss_keeps_both(client, db, pair):
+    pair_id, _, _ = pair
+
+    assert client.post(f"/duplicates/{pair_id}/dismiss").status_code == 200
+    assert db.query(models.Transaction).count() == 2
+    assert client.get("/duplicates").json() == []
+    assert client.get("/duplicates/stats").json()["pairs"] == {"dismissed": 1}
+
+
+def test_unknown_pair_is_404(client):
+    assert client.post("/duplicates/5/dismiss").status_code == 404
@@ -0,0 +1,98 @@
+from datetime import date
+
+import numpy as np
+import pytest
+
+import data_version
+import forecast
+import models
+
+
+TODAY = date(2025, 6, 10)
+
+
+def _history(db, totals: dict):
+    """Rollup rows for {category: [month totals, oldest first]} ending in May 2025."""
+    for category, values in totals.items():
+        for i, total in enumerate(values):
+            month = (TODAY.year * 12 + TODAY.month - 1) - len(values) + i
+            db.add(models.MonthlyRollup(
+                month=f"{month // 12}-{month % 12 + 1:02d}", type="expense", category=category,
+                total=total, count=1,
+            ))
+    db.commit()
+
+
+def test_ses_picks_a_high_alpha_for_a_level_shift():
+    matrix = np.array([[100.0] * 6 + [200.0] * 6, [50.0] * 12])
+    level, alphas = forecast.ses(matrix)
+
+    assert level[0] == pytest.approx(200.0, rel=0.01)
+    assert alphas[0] == pytest.approx(0.9)
+    assert level[1] == pytest.approx(50.0)
+
+
+def test_seasonal_naive_repeats_last_year():
+    matrix = np.arange(24, dtype=float)[None, :]
+    assert forecast.seasonal_naive(matrix, 14).tolist() == [[12, 13, 14, 15, 16, 17, 18, 19, 20, 21, 22, 23, 12, 13]]
+
+
+def test_history_keeps_months_without_spending(db):
+    _history(db, {"Food": [100.0, 0.0, 120.0]})
+    db.query(models.MonthlyRollup).filter(models.MonthlyRollup.month == "2025-04").delete()
+    db.commit()
+
+    categories, months, matrix = forecast.monthly_history(db, TODAY)
+    assert (categories, months) == (["Food"], ["2025-03", "2025-04", "2025-05"])
+    assert matrix.tolist() == [[100.0, 0.0, 120.0]]
+
+
+def test_month_end_adds_the_rest_of_the_month_to_what_was_spent(db):
+    _history(db, {"Food": [300.0] * 6, "Rent": [900.0] * 6})
+    db.add(models.Transaction(date=date(2025, 6, 2), amount=80.0, description="Corner grocery",
+                              category="Food", type="expense"))
+    db.add(models.Transaction(date=date(2025, 6, 11), amount=999.0, description="Tomorrow",
+                              category="Food", type="expense"))
+    db.commit()
+
+    result = forecast.compute(db, months=2, today=TODAY)
+    assert result["method"] == "ses"
+    food = next(c for c in result["categories"] if c["category"] == "Food")
+    assert food["month_to_date"] == 80.0
+    assert food["projected_month_end"] == pytest.approx(80.0 + 300.0 * 20 / 30, abs=0.01)
+    assert result["forecast"] == [{"month": "2025-07", "amount": 1200.0}, {"month": "2025-08", "amount": 1200.0}]
+    assert [c["category"] for c in result["categories"]] == ["Rent", "Food"]
+
+
+def test_auto_switches_to_seasonal_with_two_years_of_history(db):
+    # June 2023 to May 2025, with a trip every July
+    _history(db, {"Travel": ([0.0, 1000.0] + [0.0] * 10) * 2})
+
+    result = forecast.compute(db, months=1, today=TODAY)
+    assert result["method"] == "seasonal_naive"
+    assert result["forecast"] == [{"month": "2025-07", "amount": 1000.0}]
+
+
+def test_a_category_seen_only_this_month_is_still_listed(db):
+    db.add(models.Transaction(date=date(2025, 6, 1), amount=15.0, description="Cinema",
+                              category="Leisure", type="expense"))
+    db.commit()
+
+    result = forecast.compute(db, months=1, today=TODAY)
+    assert [(c["category"], c["projected_month_end"], c["alpha"]) for c in result["categories"]] == [
+        ("Leisure", 15.0, None)
+    ]
+
+
+def test_forecast_endpoint(client, monkeypatch):
+    monkeypatch.setattr(forecast, "cache", data_version.VersionedCache("forecast"))
+    tx = {
+        "date": date.today().isoformat(), "amount": 42.5, "description": "Corner grocery",
+        "payment_method": "card", "installments": 1, "monthly_payment": 42.5, "type": "expense",
+    }
+    client.post("/add-transaction", json=tx)
+
+    body = client.get("/analytics/forecast?months=2").json()
+    assert body["month_to_date"] == 42.5
+    assert len(body["forecast"]) == 2
+    assert client.get("/analytics/forecast?method=arima").status_code == 422
@@ -0,0 +1,108 @@
+from datetime import date
+
+import pytest
+
+import installments
+import models
+
+
+def _purchase(db, day=date(2025, 11, 20), count=3, monthly=100.0, **fields):
+    tx = models.Transaction(
+        date=day, amount=count * monthly, description="Laptop", type="expense",
+        payment_method="credit_card", installments=count, monthly_payment=monthly, **fields,
+    )
+    db.add(tx)
+    db.flush()
+    installments.schedule(db, [tx.id], [tx])
+    db.commit()
+    return tx
+
+
+def _due(db):
+    S = models.InstallmentSchedule
+    return [(r.number, r.due_month, r.amount) for r in db.query(S).order_by(S.transaction_id, S.number)]
+
+
+@pytest.mark.parametrize("start, months, expected", [
+    (date(2025, 11, 20), 0, date(2025, 11, 1)),
+    (date(2025, 11, 20), 2, date(2026, 1, 1)),
+    (date(2025, 1, 31), 13, date(2026, 2, 1)),
+    (date(2025, 3, 1), -3, date(2024, 12, 1)),
+])
+def test_add_months(start, months, expected):
+    assert installments.add_months(start, months) == expected
+
+
+def test_schedule_has_one_row_per_installment_from_the_purchase_month(db):
+    _purchase(db)
+    assert _due(db) == [
+        (1, date(2025, 11, 1), 100.0),
+        (2, date(2025, 12, 1), 100.0),
+        (3, date(2026, 1, 1), 100.0),
+    ]
+
+
+@pytest.mark.parametrize("fields", [
+    {"payment_method": "cash"},
+    {"type": "income"},
+    {"installments": 0},
+    {"date": None},
+])
+def test_only_dated_credit_card_expenses_are_scheduled(fields):
+    tx = {"date": date(2025, 1, 1), "type": "expense", "payment_method": "credit_card",
+          "installments": 2, "monthly_payment": 5.0, **fields}
+    assert installments._rows(1, tx) == []
+
+
+def test_projection_fills_empty_months_with_zeros(db):
+    _purchase(db, day=date(2025, 11, 20), count=2, monthly=100.0)
+    _purchase(db, day=date(2025, 12, 3), count=1, monthly=40.0)
+
+    assert installments.projection(db, date(2025, 12, 15), 3) == [
+        {"month": "2025-12", "amount": 140.0, "installments": 2},
+        {"month": "2026-01", "amount": 0.0, "installments": 0},
+        {"month": "2026-02", "amount": 0.0, "installments": 0},
+    ]
+
+
+def test_reschedule_follows_an_edit(db):
+    tx = _purchase(db)
+    tx.installments, tx.monthly_payment = 2, 150.0
+    installments.reschedule(db, tx)
+    db.commit()
+
+    assert _due(db) == [(1, date(2025, 11, 1), 150.0), (2, date(2025, 12, 1), 150.0)]
+
+
+def test_check_finds_drift_and_rebuild_repairs_it(db):
+    tx = _purchase(db)
+    installments.unschedule(db, [tx.id])
+    db.add(models.InstallmentSchedule(transaction_id=999, number=1, due_month=date(2025, 1, 1), amount=1.0))
+    db.commit()
+
+    assert installments.check(db) == [
+        {"transaction_id": tx.id, "problem": "schedule does not match transaction"},
+        {"transaction_id": 999, "problem": "orphaned schedule"},
+    ]
+    assert installments.rebuild(db) == 3
+    assert installments.check(db) == []
+
+
+def test_credit_overview_and_cashflow_follow_the_api_writes(client):
+    this_month = installments.month_start(date.today())
+    tx = {
+        "date": this_month.isoformat(), "amount": 300.0, "description": "Laptop", "payment_method": "credit_card",
+        "installments": 3, "monthly_payment": 100.0, "type": "expense",
+    }
+    tx_id = client.post("/add-transaction", json=tx).json()["id"]
+
+    overview = client.get("/analytics/credit-overview").json()
+    assert [(i["id"], i["remaining_installments"]) for i in overview["items"]] == [(tx_id, 3)]
+    assert (overview["total_monthly_payment"], overview["total_remaining_debt"]) == (100.0, 300.0)
+
+    client.put(f"/transactions/{tx_id}", json={"installments": 2})
+    projection = client.get("/analytics/cashflow-projection?months=3").json()
+    assert [m["amount"] for m in projection["months"]] == [100.0, 100.0, 0.0]
+
+    client.delete(f"/transactions/{tx_id}")
+    assert client.get("/analytics/cashflow-projection?months=3").json()["total"] == 0.0
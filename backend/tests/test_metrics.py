@@ -0,0 +1,121 @@
+import threading
+import time
+
+import pytest
+
+import metrics
+import profiler
+
+
+def test_histogram_renders_cumulative_buckets():
+    latency = metrics.Histogram("test_seconds", "Test.", ("route",), buckets=(0.1, 1.0))
+    for seconds in (0.05, 0.5, 0.5, 3.0):
+        latency.observe(seconds, route="/a")
+
+    assert latency.render() == [
+        'test_seconds_bucket{route="/a",le="0.1"} 1',
+        'test_seconds_bucket{route="/a",le="1.0"} 3',
+        'test_seconds_bucket{route="/a",le="+Inf"} 4',
+        'test_seconds_sum{route="/a"} 4.05',
+        'test_seconds_count{route="/a"} 4',
+    ]
+
+
+def test_counter_escapes_label_values():
+    lookups = metrics.Counter("test_total", "Test.", ("query",))
+    lookups.inc(2, query='say "hi"\n')
+    assert lookups.render() == ['test_total{query="say \\"hi\\"\\n"} 2']
+
+
+def test_timed_spans_keep_the_function_signature():
+    @metrics.timed("test.timed")
+    def work(x: int, y: int = 2) -> int:
+        """Docs."""
+        return x * y
+
+    assert work(3) == 6 and work(2, 5) == 10
+    assert work.__doc__ == "Docs." and work.__wrapped__.__name__ == "work"
+    assert 'span_duration_seconds_count{span="test.timed"} 2' in metrics.spans.render()
+
+
+def _count(text: str, prefix: str) -> int:
+    lines = [line for line in text.splitlines() if line.startswith(prefix)]
+    return int(lines[0].rsplit(" ", 1)[1]) if lines else 0
+
+
+def test_requests_are_recorded_under_their_route_template(client):
+    series = 'http_request_duration_seconds_count{method="PUT",route="/transactions/{transaction_id}",status="404"}'
+    before = _count(client.get("/metrics").text, series)
+
+    client.put("/transactions/12345", json={"amount": 1.0})
+    client.put("/transactions/67890", json={"amount": 1.0})
+    text = client.get("/metrics").text
+    assert _count(text, series) == before + 2
+    assert "# TYPE http_request_duration_seconds histogram" in text
+
+
+def test_streamed_responses_are_timed_to_the_last_chunk(client, monkeypatch):
+    from routers import transactions
+
+    def slow_body(stmt, fields):
+        yield "{}\n"
+        time.sleep(0.2)
+        yield "{}\n"
+
+    observed = []
+    monkeypatch.setattr(transactions, "_stream_ndjson", slow_body)
+    monkeypatch.setattr(metrics.http_requests, "observe", lambda seconds, **labels: observed.append((seconds, labels)))
+
+    assert client.get("/transactions", params={"format": "ndjson"}).text == "{}\n{}\n"
+    [(seconds, labels)] = observed
+    assert seconds >= 0.2
+    assert labels == {"method": "GET", "route": "/transactions", "status": 200}
+
+
+def test_sampler_records_the_busy_thread(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiler, "PROFILE_DIR", str(tmp_path))
+    done = threading.Event()
+
+    def busy_loop():
+        while not done.is_set():
+            sum(range(1000))
+
+    worker = threading.Thread(target=busy_loop, name="busy")
+    worker.start()
+    try:
+        with profiler.Sampler(interval_ms=1) as sampler:
+            time.sleep(0.1)
+    finally:
+        done.set()
+        worker.join()
+
+    assert any(stack.startswith("busy;") and "busy_loop" in stack for stack in sampler.stacks)
+    profile_id = sampler.dump("GET /slow", 123.4)
+    [path] = tmp_path.glob(f"{profile_id}-*")
+    assert path.name.endswith("-GET_slow-123ms.folded")
+    with open(path) as fh:
+        assert all(line.rsplit(" ", 1)[1].strip().isdigit() for line in fh)
+
+
+def test_a_profiled_stream_is_sampled_to_the_last_chunk(client, tmp_path, monkeypatch):
+    from routers import transactions
+
+    def slow_body(stmt, fields):
+        yield "{}\n"
+        deadline = time.perf_counter() + 0.2
+        while time.perf_counter() < deadline:
+            sum(range(1000))
+        yield "{}\n"
+
+    monkeypatch.setattr(profiler, "PROFILE_DIR", str(tmp_path))
+    monkeypatch.setattr(transactions, "_stream_ndjson", slow_body)
+
+    response = client.get("/transactions", params={"format": "ndjson"}, headers={"x-profile": "1"})
+    assert "X-Profile-Path" not in response.headers
+    [path] = tmp_path.glob(f"{response.headers['X-Profile-Id']}-*")
+    assert "slow_body" in path.read_text()
+
+
+@pytest.mark.parametrize("headers, expected", [({"x-profile": "1"}, True), ({}, False)])
+def test_profiling_is_opt_in(headers, expected):
+    assert profiler.requested(headers) is expected
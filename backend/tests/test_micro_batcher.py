@@ -0,0 +1,52 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from micro_batcher import MicroBatcher
+
+
+def test_items_arriving_together_share_one_call():
+    calls = []
+    batcher = MicroBatcher(lambda items: calls.append(list(items)) or [i * 2 for i in items], window_ms=50)
+
+    futures = [batcher.submit(i) for i in range(5)]
+    assert [f.result(timeout=5) for f in futures] == [0, 2, 4, 6, 8]
+    assert calls == [[0, 1, 2, 3, 4]]
+    assert batcher.stats()["largest_batch"] == 5
+
+
+def test_max_batch_splits_a_burst():
+    release = threading.Event()
+    calls = []
+
+    def process(items):
+        release.wait(5)
+        calls.append(len(items))
+        return items
+
+    batcher = MicroBatcher(process, window_ms=20, max_batch=3)
+    futures = [batcher.submit(i) for i in range(7)]
+    release.set()
+    assert [f.result(timeout=5) for f in futures] == list(range(7))
+    assert max(calls) == 3 and sum(calls) == 7
+
+
+def test_a_failed_call_fails_its_own_items_only():
+    def process(items):
+        if "bad" in items:
+            raise ValueError("bad item")
+        return items
+
+    batcher = MicroBatcher(process, window_ms=1)
+    with pytest.raises(ValueError):
+        batcher.call("bad", timeout=5)
+    assert batcher.call("good", timeout=5) == "good"
+    assert batcher.stats()["errors"] == 1
+
+
+def test_results_go_back_to_the_right_caller():
+    batcher = MicroBatcher(lambda items: [f"{i}!" for i in items], window_ms=5)
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(pool.map(lambda i: batcher.call(i, timeout=5), range(100)))
+    assert results == [f"{i}!" for i in range(100)]
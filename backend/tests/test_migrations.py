@@ -0,0 +1,58 @@
+from sqlalchemy import create_engine, inspect, text
+
+import migrations
+import models
+
+
+LEGACY_SCHEMA = """
+CREATE TABLE transactions (
+    id INTEGER PRIMARY KEY, date VARCHAR, amount FLOAT, description VARCHAR,
+    category VARCHAR, type VARCHAR, payment_method VARCHAR,
+    installments INTEGER, monthly_payment FLOAT
+)
+"""
+
+
+def _legacy_db(tmp_path, dates):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as conn:
+        conn.execute(text(LEGACY_SCHEMA))
+        if dates:
+            conn.execute(
+                text("INSERT INTO transactions (id, date, amount) VALUES (:id, :date, 1.0)"),
+                [{"id": i, "date": d} for i, d in enumerate(dates, start=1)],
+            )
+    return engine
+
+
+def test_legacy_dates_become_iso(tmp_path):
+    engine = _legacy_db(tmp_path, ["2025-03-14", "14/03/2025", "2025/03/14", "2025-03-14T09:30:00", "soon"])
+
+    with engine.begin() as conn:
+        report = migrations.normalize_dates(conn)
+        dates = conn.execute(text("SELECT date FROM transactions ORDER BY id")).scalars().all()
+        kept = conn.execute(text("SELECT transaction_id, value FROM unparsed_dates")).all()
+
+    assert report == {"converted": 3, "unparsed": [5]}
+    assert dates == ["2025-03-14"] * 4 + [None]
+    assert kept == [(5, "soon")]
+
+
+def test_normalize_is_idempotent(tmp_path):
+    engine = _legacy_db(tmp_path, ["14/03/2025", "soon"])
+    with engine.begin() as conn:
+        migrations.normalize_dates(conn)
+        assert migrations.normalize_dates(conn) == {"converted": 0, "unparsed": []}
+        assert conn.execute(text("SELECT count(*) FROM unparsed_dates")).scalar() == 1
+
+
+def test_legacy_table_gets_new_columns_and_indexes(tmp_path):
+    engine = _legacy_db(tmp_path, [])
+    with engine.begin() as conn:
+        assert "transactions.anomaly_score" in migrations.add_missing_columns(conn)
+        created = migrations.create_indexes(conn)
+        assert (migrations.add_missing_columns(conn), migrations.create_indexes(conn)) == ([], [])
+        existing = {i["name"] for i in inspect(conn).get_indexes("transactions")}
+
+    assert set(created) == {i.name for i in models.Transaction.__table__.indexes}
+    assert set(created) <= existing
@@ -0,0 +1,84 @@
+import threading
+import time
+
+import pytest
+
+import model_registry
+from model_registry import ModelNotReady, ModelRegistry
+
+
+def test_a_slow_model_reports_loading_instead_of_blocking():
+    registry = ModelRegistry()
+    release = threading.Event()
+    registry.register("embedder", lambda: release.wait(5) and "embedder")
+
+    with pytest.raises(ModelNotReady) as exc:
+        registry.get("embedder", timeout=0.05)
+    assert exc.value.state == "loading"
+
+    release.set()
+    assert registry.get("embedder", timeout=5) == "embedder"
+
+
+def test_concurrent_gets_load_once():
+    registry = ModelRegistry()
+    calls = []
+    registry.register("classifier", lambda: calls.append(1) or time.sleep(0.1) or "classifier")
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry.get("classifier", timeout=5))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ["classifier"] * 8
+    assert len(calls) == 1
+
+
+def test_nested_load_waits_for_its_dependency():
+    registry = ModelRegistry()
+    registry.register("embedder", lambda: time.sleep(0.3) or "embedder")
+    # The inner timeout would expire long before the embedder is ready
+    registry.register("cache", lambda: registry.get("embedder", timeout=0.01) + "+cache")
+
+    assert registry.get("cache", timeout=5) == "embedder+cache"
+
+
+def test_failed_load_is_retried_after_backoff(monkeypatch):
+    monkeypatch.setattr(model_registry, "RETRY_AFTER_SECONDS", 0.2)
+    registry = ModelRegistry()
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise OSError("disk not mounted yet")
+        return "model"
+
+    registry.register("flaky", flaky)
+    with pytest.raises(ModelNotReady) as exc:
+        registry.get("flaky", timeout=5)
+    assert exc.value.state == "failed"
+    assert registry.status()["flaky"]["error"] == "OSError: disk not mounted yet"
+
+    # Still backing off: no second attempt yet
+    with pytest.raises(ModelNotReady):
+        registry.get("flaky", timeout=0)
+    assert len(attempts) == 1
+
+    time.sleep(0.25)
+    assert registry.get("flaky", timeout=5) == "model"
+    assert registry.status()["flaky"]["failures"] == 0
+
+
+def test_ready_only_waits_for_warmed_models():
+    registry = ModelRegistry()
+    registry.register("embedder", lambda: "embedder")
+    registry.register("ocr", lambda: time.sleep(5) or "ocr")
+    registry.warm_up(["embedder"])
+
+    deadline = time.monotonic() + 5
+    while not registry.ready() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert registry.ready()
+    assert registry.status()["ocr"]["state"] == "pending"
@@ -0,0 +1,89 @@
+import pytest
+
+import ocr_engines
+from ocr_engines import OcrEngine, OcrResult
+
+
+def _word(text, confidence, x, y):
+    return {"text": text, "confidence": confidence, "box": [x, y, x + 40, y + 20]}
+
+
+class FakeTesseract(OcrEngine):
+    name = "tesseract"
+    confidence = 0.9
+
+    def _words(self, image):
+        return [_word("TOTAL", self.confidence, 10, 10), _word("12,30", self.confidence, 100, 12)]
+
+
+class FakeEasyOcr(OcrEngine):
+    name = "easyocr"
+
+    def _words(self, image):
+        return [_word("TOTAL", 0.8, 10, 10), _word("12,30", 0.8, 100, 12)]
+
+
+class MissingTesseract(OcrEngine):
+    name = "tesseract"
+
+    def __init__(self):
+        raise OSError("tesseract is not installed or it's not in your PATH")
+
+    def _words(self, image):
+        return []
+
+
+@pytest.fixture
+def engines(monkeypatch):
+    monkeypatch.setattr(ocr_engines, "ENGINES", {"tesseract": FakeTesseract, "easyocr": FakeEasyOcr})
+    monkeypatch.setattr(ocr_engines, "_instances", {})
+    monkeypatch.setattr(ocr_engines, "_unavailable", {})
+    return ocr_engines.ENGINES
+
+
+def test_words_are_grouped_into_lines():
+    result = OcrResult("fake", [
+        _word("12,30", 0.9, 200, 52),
+        _word("Coffee", 0.9, 10, 10),
+        _word("TOTAL", 0.9, 10, 50),
+        _word("2,10", 0.9, 200, 12),
+    ], ms=1.0)
+    assert result.text == "Coffee 2,10\nTOTAL 12,30"
+    assert result.confidence == pytest.approx(0.9)
+
+
+def test_an_engine_must_read_words():
+    class NoWords(OcrEngine):
+        name = "none"
+
+    with pytest.raises(TypeError):
+        NoWords()
+
+
+def test_confident_tesseract_ends_the_cascade(engines):
+    result, attempts = ocr_engines.recognize("cascade", image=None)
+    assert [a.engine for a in attempts] == ["tesseract"]
+    assert result.engine == "tesseract"
+
+
+def test_unsure_tesseract_escalates_to_easyocr(engines, monkeypatch):
+    monkeypatch.setattr(FakeTesseract, "confidence", 0.3)
+
+    result, attempts = ocr_engines.recognize("cascade", image=None)
+    assert [a.engine for a in attempts] == ["tesseract", "easyocr"]
+    assert result.engine == "easyocr"
+
+
+def test_cascade_without_tesseract_runs_easyocr_alone(engines, caplog):
+    engines["tesseract"] = MissingTesseract
+
+    for _ in range(2):
+        result, attempts = ocr_engines.recognize("cascade", image=None)
+        assert [a.engine for a in attempts] == ["easyocr"]
+    # Warned once, not per receipt
+    assert len([r for r in caplog.records if "tesseract unavailable" in r.message]) == 1
+
+
+def test_unknown_engine(engines):
+    with pytest.raises(ValueError):
+        ocr_engines.recognize("paddle", image=None)
@@ -0,0 +1,79 @@
+import numpy as np
+
+import prediction_cache
+from prediction_cache import LRUCache, PredictionCache, fingerprint, normalize
+
+
+EMBEDDING = np.arange(4, dtype=np.float32)
+
+
+def test_normalize_ignores_case_and_whitespace():
+    assert normalize("  Corner   GROCERY\t") == "corner grocery"
+
+
+def test_disk_tier_outlives_the_process(tmp_path):
+    path = str(tmp_path / "cache.db")
+    PredictionCache(path, "v1").put_many({"corner grocery": ("Food", EMBEDDING)})
+
+    cache = PredictionCache(path, "v1")
+    category, embedding = cache.get("Corner  Grocery")
+    assert category == "Food"
+    np.testing.assert_array_equal(embedding, EMBEDDING)
+    cache.get("corner grocery")
+    cache.get("bus ticket")
+
+    stats = cache.stats()
+    assert (stats["disk_hits"], stats["memory_hits"], stats["misses"]) == (1, 1, 1)
+
+
+def test_lru_evicts_the_least_recently_used():
+    lru = LRUCache(maxsize=2)
+    lru.put("a", 1)
+    lru.put("b", 2)
+    lru.get("a")
+    lru.put("c", 3)
+
+    assert (lru.get("a"), lru.get("b"), lru.get("c")) == (1, None, 3)
+
+
+def test_new_model_fingerprint_starts_empty(tmp_path):
+    path = str(tmp_path / "cache.db")
+    PredictionCache(path, "v1").put_many({"corner grocery": ("Food", EMBEDDING)})
+
+    cache = PredictionCache(path, "v2")
+    assert cache.get("corner grocery") is None
+    assert cache.stats()["disk_entries"] == 0
+
+
+def test_entries_of_a_model_still_in_use_are_kept(tmp_path, monkeypatch):
+    path = str(tmp_path / "cache.db")
+    PredictionCache(path, "v1").put_many({"corner grocery": ("Food", EMBEDDING)})
+
+    PredictionCache(path, "v2")
+    assert PredictionCache(path, "v1").get("corner grocery")[0] == "Food"
+
+    monkeypatch.setattr(prediction_cache, "FINGERPRINT_TTL_SECONDS", -1)
+    PredictionCache(path, "v2")
+    monkeypatch.undo()
+    assert PredictionCache(path, "v1").get("corner grocery") is None
+
+
+def test_a_closed_cache_reads_as_empty(tmp_path):
+    cache = PredictionCache(str(tmp_path / "cache.db"), "v1")
+    cache.disk.put_many({"corner grocery": ("Food", EMBEDDING)})
+    cache.close()
+
+    cache.put_many({"bus ticket": ("Transport", EMBEDDING)})
+    assert cache.get("corner grocery") is None
+    assert cache.stats()["disk_entries"] == 0
+
+
+def test_fingerprint_follows_model_file_contents(tmp_path):
+    model = tmp_path / "model"
+    model.mkdir()
+    (model / "weights.bin").write_bytes(b"\x00" * 16)
+    before = fingerprint(str(model))
+
+    assert fingerprint(str(model)) == before
+    (model / "weights.bin").write_bytes(b"\x01" * 16)
+    assert fingerprint(str(model)) != before
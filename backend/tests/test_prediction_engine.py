@@ -0,0 +1,63 @@
+import threading
+
+import pytest
+
+from prediction_engine import PredictionEngine
+
+
+def test_concurrent_predictions_share_one_forward_pass():
+    batches = []
+    release = threading.Event()
+
+    def predict_batch(texts):
+        release.wait(5)
+        batches.append(list(texts))
+        return [t.upper() for t in texts]
+
+    engine = PredictionEngine(predict_batch, window_ms=50, max_batch=64)
+    # The first text occupies the worker; the rest queue up behind it
+    first = engine.submit("coffee")
+    futures = [engine.submit(f"shop {i}") for i in range(10)]
+    release.set()
+
+    assert first.result(5) == "COFFEE"
+    assert [f.result(5) for f in futures] == [f"SHOP {i}" for i in range(10)]
+    assert sum(len(b) for b in batches) == 11
+    assert len(batches) <= 2
+
+
+def test_max_batch_caps_the_group_size():
+    sizes = []
+    gate = threading.Event()
+
+    def predict_batch(texts):
+        gate.wait(5)
+        sizes.append(len(texts))
+        return texts
+
+    engine = PredictionEngine(predict_batch, window_ms=50, max_batch=4)
+    futures = [engine.submit(str(i)) for i in range(10)]
+    gate.set()
+
+    assert [f.result(5) for f in futures] == [str(i) for i in range(10)]
+    assert max(sizes) <= 4
+
+
+def test_a_failed_batch_fails_each_caller_and_the_worker_survives():
+    failing = True
+
+    def predict_batch(texts):
+        if failing:
+            raise RuntimeError("CUDA out of memory")
+        return ["Food"] * len(texts)
+
+    engine = PredictionEngine(predict_batch, window_ms=20, max_batch=8)
+    futures = [engine.submit(t) for t in ("a", "b", "c")]
+    for future in futures:
+        with pytest.raises(RuntimeError, match="out of memory"):
+            future.result(5)
+
+    failing = False
+    assert engine.predict("d", timeout=5) == "Food"
+    # The worker finished its stats for the failed batch before taking "d"
+    assert engine.stats()["errors"] == 3
@@ -0,0 +1,98 @@
+import datetime as dt
+
+import pytest
+
+import receipt_parser
+
+
+TODAY = dt.date(2025, 6, 30)
+
+
+@pytest.mark.parametrize("text, value", [
+    ("1.234,56", 1234.56),
+    ("1,234.56", 1234.56),
+    ("1.234.567,89", 1234567.89),
+    ("1,234,567.89", 1234567.89),
+    ("1234,5", 1234.5),
+    ("12.50", 12.5),
+    ("1,234", 1234.0),
+    ("0,500", 0.5),
+])
+def test_parse_amount_both_locales(text, value):
+    assert receipt_parser.parse_amount(text) == pytest.approx(value)
+
+
+@pytest.mark.parametrize("line, date", [
+    ("2025-03-14 18:45", dt.date(2025, 3, 14)),
+    ("Fecha: 14/03/2025", dt.date(2025, 3, 14)),
+    ("14.03.25", dt.date(2025, 3, 14)),
+    ("03/14/2025", dt.date(2025, 3, 14)),       # day 14 can't be a month
+    ("14 de marzo de 2025", dt.date(2025, 3, 14)),
+    ("Mar 14, 2025", dt.date(2025, 3, 14)),
+])
+def test_find_dates_in_every_format(line, date):
+    assert receipt_parser.find_dates(line, TODAY) == [date]
+
+
+def test_future_and_impossible_dates_are_ignored():
+    assert receipt_parser.find_dates("31/02/2025 01/01/2030", TODAY) == []
+
+
+def test_find_amounts_skips_dates_and_times():
+    assert receipt_parser.find_amounts("14/03/2025 18:45 Café $ 3,50") == [3.5]
+
+
+def test_parse_receipt_with_comma_decimals():
+    text = "\n".join([
+        "SUPERMERCADO EL SOL",
+        "14/03/2025 18:45",
+        "2 x Leche entera 1.234,56",
+        "Pan lactal 99,90",
+        "SUBTOTAL 1.334,46",
+        "IVA 21% 280,24",
+        "TOTAL $ 1.614,70",
+        "EFECTIVO 2.000,00",
+    ])
+    receipt = receipt_parser.parse_text(text, TODAY)
+
+    assert receipt["merchant"] == "SUPERMERCADO EL SOL"
+    assert receipt["date"] == dt.date(2025, 3, 14)
+    assert receipt["total"] == pytest.approx(1614.70)
+    assert receipt["subtotal"] == pytest.approx(1334.46)
+    assert receipt["tax"] == pytest.approx(280.24)
+    assert [(i["description"], i["quantity"], i["amount"]) for i in receipt["items"]] == [
+        ("Leche entera", 2, pytest.approx(1234.56)),
+        ("Pan lactal", 1, pytest.approx(99.90)),
+    ]
+
+
+def test_parse_receipt_with_dot_decimals():
+    text = "\n".join([
+        "CORNER HARDWARE",
+        "Mar 14, 2025",
+        "Drill 1,234.56",
+        "Screws 10.00",
+        "Tax 98.77",
+        "Grand Total 1,343.33",
+    ])
+    receipt = receipt_parser.parse_text(text, TODAY)
+
+    assert receipt["date"] == dt.date(2025, 3, 14)
+    assert receipt["total"] == pytest.approx(1343.33)
+    assert [i["amount"] for i in receipt["items"]] == [pytest.approx(1234.56), pytest.approx(10.0)]
+
+
+def test_total_on_the_line_below_its_label():
+    receipt = receipt_parser.parse_text("Kiosco\nTOTAL\n1.500,00", TODAY)
+    assert receipt["total"] == pytest.approx(1500.0)
+
+
+def test_words_are_regrouped_into_lines():
+    words = [
+        {"text": "12,30", "confidence": 0.9, "box": [200, 10, 240, 30]},
+        {"text": "Coffee", "confidence": 0.9, "box": [10, 12, 60, 28]},
+        {"text": "TOTAL", "confidence": 0.9, "box": [10, 50, 60, 70]},
+        {"text": "12,30", "confidence": 0.9, "box": [200, 52, 240, 68]},
+    ]
+    assert receipt_parser.group_lines(words) == ["Coffee 12,30", "TOTAL 12,30"]
+    assert receipt_parser.parse_words(words, TODAY)["total"] == pytest.approx(12.3)
@@ -0,0 +1,55 @@
+import io
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+import receipt_preprocess
+
+
+def _receipt_photo(size=(1600, 2400), angle=0.0) -> Image.Image:
+    """White paper with rows of "text" bars, on a dark table."""
+    paper = Image.new("L", (800, 1600), 255)
+    draw = ImageDraw.Draw(paper)
+    for row in range(20):
+        y = 100 + row * 70
+        for x in range(60, 700, 90):
+            draw.rectangle((x, y, x + 60, y + 24), fill=0)
+    if angle:
+        paper = paper.rotate(angle, expand=True, fillcolor=255)
+    photo = Image.new("L", size, 40)
+    photo.paste(paper, ((size[0] - paper.width) // 2, (size[1] - paper.height) // 2))
+    return photo.convert("RGB")
+
+
+def _jpeg(image: Image.Image) -> io.BytesIO:
+    data = io.BytesIO()
+    image.save(data, format="JPEG", quality=90)
+    data.seek(0)
+    return data
+
+
+def test_otsu_splits_a_bimodal_histogram():
+    gray = np.array([30] * 500 + [220] * 500, dtype=np.uint8)
+    assert 30 <= receipt_preprocess.otsu_threshold(gray) < 220
+
+
+def test_load_decodes_small_but_reports_the_upload_size():
+    image = receipt_preprocess.load(_jpeg(_receipt_photo(size=(4000, 6000))), max_side=1000)
+
+    assert max(image.size) < 6000
+    _, info = receipt_preprocess.preprocess(image, max_side=1000)
+    assert info["original_size"] == (4000, 6000)
+
+
+def test_preprocess_crops_to_the_paper():
+    image, info = receipt_preprocess.preprocess(_receipt_photo())
+
+    assert info["paper_crop"]
+    assert set(np.unique(np.asarray(receipt_preprocess.binarize(image)))) <= {0, 255}
+    # The dark table around the paper is gone
+    assert image.width < 1000 and image.height < 1800
+
+
+def test_skewed_receipt_is_straightened():
+    _, info = receipt_preprocess.preprocess(_receipt_photo(angle=4.0))
+    assert abs(info["deskew_angle"] + 4.0) <= 1.0
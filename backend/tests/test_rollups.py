@@ -0,0 +1,98 @@
+from datetime import date
+
+import pytest
+
+import models
+import rollups
+
+
+def _add(db, **fields):
+    tx = models.Transaction(**fields)
+    db.add(tx)
+    rollups.apply(db, added=[tx])
+    db.commit()
+    return tx
+
+
+def _rollup(db):
+    return {
+        (r.month, r.type, r.category): (round(r.total, 2), r.count)
+        for r in db.query(models.MonthlyRollup)
+    }
+
+
+@pytest.mark.parametrize("value, month", [
+    ("2025-03-14", "2025-03"),
+    ("14/03/2025", "2025-03"),
+    (date(2025, 3, 14), "2025-03"),
+    ("yesterday", ""),
+    (None, ""),
+])
+def test_month_of(value, month):
+    assert rollups.month_of(value) == month
+
+
+def test_inserts_accumulate_per_month_type_and_category(db):
+    _add(db, date=date(2025, 3, 1), amount=10.0, type="expense", category="Food")
+    _add(db, date=date(2025, 3, 14), amount=2.5, type="expense", category="Food")
+    _add(db, date=date(2025, 4, 1), amount=800.0, type="expense", category="Rent")
+    _add(db, date=date(2025, 3, 31), amount=1500.0, type="income", category="Income")
+
+    assert _rollup(db) == {
+        ("2025-03", "expense", "Food"): (12.5, 2),
+        ("2025-04", "expense", "Rent"): (800.0, 1),
+        ("2025-03", "income", "Income"): (1500.0, 1),
+    }
+    assert rollups.check(db) == []
+
+
+def test_update_moves_the_amount_to_the_new_bucket(db):
+    tx = _add(db, date=date(2025, 3, 1), amount=10.0, type="expense", category="Food")
+
+    before = rollups.snapshot(tx)
+    tx.date, tx.category, tx.amount = date(2025, 4, 2), "Transport", 12.0
+    rollups.apply(db, added=[tx], removed=[before])
+    db.commit()
+
+    # The emptied bucket is dropped rather than left at zero
+    assert _rollup(db) == {("2025-04", "expense", "Transport"): (12.0, 1)}
+    assert rollups.check(db) == []
+
+
+def test_delete_and_bulk_dicts(db):
+    kept = _add(db, date=date(2025, 3, 1), amount=10.0, type="expense", category="Food")
+    removed = _add(db, date=date(2025, 3, 2), amount=4.0, type="expense", category="Food")
+    rollups.apply(db, removed=[removed])
+    db.delete(removed)
+
+    # Bulk import passes plain dicts
+    rows = [{"date": date(2025, 3, 5), "amount": 1.0, "type": "expense", "category": "Food"}] * 3
+    db.execute(models.Transaction.__table__.insert(), rows)
+    rollups.apply(db, added=rows)
+    db.commit()
+
+    assert _rollup(db) == {("2025-03", "expense", "Food"): (kept.amount + 3.0, 4)}
+    assert rollups.check(db) == []
+
+
+def test_check_reports_drift_and_rebuild_repairs_it(db):
+    _add(db, date=date(2025, 3, 1), amount=10.0, type="expense", category="Food")
+    # A write that bypassed apply()
+    db.add(models.Transaction(date=date(2025, 3, 2), amount=5.0, type="expense", category="Food"))
+    db.commit()
+
+    [problem] = rollups.check(db)
+    assert (problem["expected_total"], problem["actual_total"]) == (15.0, 10.0)
+
+    assert rollups.rebuild(db) == 1
+    assert rollups.check(db) == []
+
+
+def test_an_edit_outside_the_rollup_fields_changes_nothing(db):
+    tx = _add(db, date=date(2025, 3, 1), amount=10.0, type="expense", category="Food")
+    before = rollups.snapshot(tx)
+    tx.description = "Renamed"
+    rollups.apply(db, added=[tx], removed=[before])
+    db.commit()
+
+    assert _rollup(db) == {("2025-03", "expense", "Food"): (10.0, 1)}
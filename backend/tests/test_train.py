@@ -0,0 +1,74 @@
+import numpy as np
+
+import train
+
+
+DIM = 8
+
+
+class CountingEncoder:
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, texts):
+        self.encoded.extend(texts)
+        return np.array([[len(t)] * DIM for t in texts], dtype=np.float32)
+
+    def close(self):
+        pass
+
+
+def test_iter_csv_yields_labelled_rows_in_chunks(tmp_path):
+    path = tmp_path / "transactions.csv"
+    path.write_text("description,category\nrent,Rent\n,Food\ncafe,Food\nbus,\nbus,Transport\n", encoding="utf-8")
+
+    chunks = list(train.iter_csv(str(path), chunk_rows=2))
+    assert chunks == [(["rent", "cafe"], ["Rent", "Food"]), (["bus"], ["Transport"])]
+
+
+def test_embedding_store_encodes_each_description_once(tmp_path):
+    store = train.EmbeddingStore(str(tmp_path), "model-a", dim=DIM)
+    encoder = CountingEncoder()
+    chunks = [(["rent", "cafe", "rent"], ["Rent", "Food", "Rent"]), (["cafe", "bus"], ["Food", "Transport"])]
+
+    X, y, texts, counts = train.load_dataset(chunks, store, lambda: encoder)
+    assert encoder.encoded == ["rent", "cafe", "bus"]
+    assert counts["rows"] == 5 and counts["encoded"] == 3
+    assert X[:, 0].tolist() == [4, 4, 4, 4, 3]
+    assert y.tolist() == ["Rent", "Food", "Rent", "Food", "Transport"]
+
+    reopened = train.EmbeddingStore(str(tmp_path), "model-a", dim=DIM)
+    assert reopened.missing(["rent", "bus", "taxi"]) == ["taxi"]
+    assert len(train.EmbeddingStore(str(tmp_path), "model-b", dim=DIM)) == 0
+
+
+def test_embedding_store_drops_a_torn_append(tmp_path):
+    store = train.EmbeddingStore(str(tmp_path), "model-a", dim=DIM)
+    store.add(["rent", "cafe"], np.ones((2, DIM)))
+    with open(store.keys_path, "a", encoding="utf-8") as fh:
+        fh.write('"bus"\n')   # the matching vector never got written
+
+    reopened = train.EmbeddingStore(str(tmp_path), "model-a", dim=DIM)
+    assert len(reopened) == 2
+    assert reopened.missing(["bus"]) == ["bus"]
+
+
+def test_split_holds_out_whole_descriptions():
+    texts = [f"shop {i % 20}" for i in range(200)]
+    y = np.array(["Food" if i % 2 else "Rent" for i in range(20)] * 10)
+
+    test = train.split(texts, y, test_size=0.25)
+    held_out = {t for t, t_held in zip(texts, test) if t_held}
+    kept = {t for t, t_held in zip(texts, test) if not t_held}
+    assert len(held_out) == 5
+    assert not held_out & kept
+
+
+def test_pick_prefers_the_fastest_candidate_within_tolerance():
+    results = [
+        {"candidate": "svc", "accuracy": 0.95, "latency_ms": {"p50": 0.2}},
+        {"candidate": "logreg", "accuracy": 0.94, "latency_ms": {"p50": 0.01}},
+        {"candidate": "linear_svm", "accuracy": 0.80, "latency_ms": {"p50": 0.005}},
+    ]
+    assert train.pick(results, tolerance=0.02)["candidate"] == "logreg"
+    assert train.pick(results, tolerance=0.0)["candidate"] == "svc"
@@ -0,0 +1,60 @@
+from datetime import date
+
+import pytest
+from fastapi import HTTPException
+
+import models
+from transaction_queries import FIELDS, TransactionFilters, decode_cursor, encode_cursor, select_transactions
+
+
+@pytest.fixture
+def rows(db):
+    # Several rows share a date, so the cursor needs the id tie-breaker
+    days = [3, 1, 2, 2, 2, 5, 1, 4]
+    db.add_all(
+        models.Transaction(date=date(2025, 3, d), amount=float(i), type="expense" if i % 2 else "income")
+        for i, d in enumerate(days)
+    )
+    db.add(models.Transaction(date=None, amount=99.0, type="expense"))
+    db.commit()
+    return db
+
+
+def _pages(db, order_by, limit, filters=None):
+    seen, cursor = [], None
+    while True:
+        stmt = select_transactions(filters or TransactionFilters(), FIELDS, order_by, cursor, limit)
+        page = [row._asdict() for row in db.execute(stmt)]
+        seen.extend(page)
+        if len(page) < limit:
+            return seen
+        cursor = encode_cursor(page[-1], order_by)
+
+
+@pytest.mark.parametrize("order_by", ["date", "-date"])
+def test_date_pages_cover_every_dated_row_once(rows, order_by):
+    seen = _pages(rows, order_by, limit=3)
+
+    keys = [(r["date"], r["id"]) for r in seen]
+    assert keys == sorted(keys, reverse=order_by.startswith("-"))
+    assert len(set(keys)) == 8
+
+
+def test_id_pages_include_undated_rows(rows):
+    assert [r["id"] for r in _pages(rows, "-id", limit=4)] == list(range(9, 0, -1))
+
+
+def test_filters_apply_to_every_page(rows):
+    filters = TransactionFilters(date_from=date(2025, 3, 2), type="expense", min_amount=2)
+    seen = _pages(rows, "date", limit=2, filters=filters)
+
+    assert seen and all(r["type"] == "expense" and r["amount"] >= 2 and r["date"] >= date(2025, 3, 2) for r in seen)
+
+
+def test_cursor_round_trip_and_garbage():
+    cursor = encode_cursor({"id": 7, "date": date(2025, 3, 2)}, "-date")
+    assert decode_cursor(cursor, "-date") == {"id": 7, "date": date(2025, 3, 2)}
+
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor("not-a-cursor", "id")
+    assert exc.value.status_code == 422
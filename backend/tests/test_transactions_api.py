@@ -0,0 +1,155 @@
+from datetime import date
+
+import dedup
+import models
+import rollups
+import vector_index
+from model_registry import ModelNotReady
+from routers import ml
+
+
+def _expense(description="Corner grocery", amount=42.5, day="2025-03-14"):
+    return {
+        "date": day, "amount": amount, "description": description,
+        "payment_method": "card", "installments": 1, "monthly_payment": amount, "type": "expense",
+    }
+
+
+def test_add_predicts_the_category_and_indexes_the_description(client, db):
+    response = client.post("/add-transaction", json=_expense())
+
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["category"], body["possible_duplicates"]) == ("Food", [])
+    assert vector_index.get_vectors().missing([body["id"]]).tolist() == []
+    assert db.get(models.MonthlyRollup, ("2025-03", "expense", "Food")).total == 42.5
+
+
+def test_a_saved_row_is_left_to_the_backfill_while_the_embedder_loads(client, db, monkeypatch):
+    def not_ready(texts):
+        raise ModelNotReady("embedder", "loading")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(ml, "embed_many", not_ready)
+        tx = client.post("/add-transaction", json=_expense())
+        assert tx.status_code == 200
+        updated = client.put(f"/transactions/{tx.json()['id']}", json={"category": "Household"})
+        assert updated.status_code == 200
+    assert db.query(models.Transaction).one().category == "Household"
+    assert vector_index.get_vectors().missing([tx.json()["id"]]).tolist() == [tx.json()["id"]]
+
+    assert vector_index.backfill() == 1
+    assert len(vector_index.get_corrections()) == 1
+
+
+def test_income_is_always_categorized_as_income(client):
+    income = {**_expense("Salary", 2500.0), "type": "income"}
+    assert client.post("/add-transaction", json=income).json()["category"] == "Income"
+
+
+def test_a_near_copy_is_saved_and_queued_for_review(client, db):
+    original = client.post("/add-transaction", json=_expense()).json()
+
+    copy = client.post("/add-transaction", json=_expense("CORNER GROCERY", day="2025-03-15")).json()
+    assert copy["possible_duplicates"] == [original["id"]]
+    pair = db.query(models.DuplicatePair).one()
+    assert (pair.transaction_id, pair.duplicate_of_id, pair.status) == (copy["id"], original["id"], "pending")
+
+
+def test_update_moves_the_rollup_and_recategorizes_a_new_description(client, db):
+    tx = client.post("/add-transaction", json=_expense()).json()
+
+    response = client.put(f"/transactions/{tx['id']}", json={"description": "Monthly rent", "date": "2025-04-01"})
+    assert response.json()["category"] == "Rent"
+    assert db.get(models.MonthlyRollup, ("2025-03", "expense", "Food")) is None
+    assert db.get(models.MonthlyRollup, ("2025-04", "expense", "Rent")).count == 1
+    assert rollups.check(db) == []
+
+
+def test_a_category_set_by_hand_is_recorded_as_a_correction(client, db):
+    tx = client.post("/add-transaction", json=_expense()).json()
+
+    updated = client.put(f"/transactions/{tx['id']}", json={"category": "Household"}).json()
+    assert updated["category"] == "Household"
+    correction = db.query(models.CategoryCorrection).one()
+    assert (correction.previous_category, correction.category) == ("Food", "Household")
+    assert len(vector_index.get_corrections()) == 1
+
+    # The next prediction for the same description follows the correction
+    assert client.post("/add-transaction", json=_expense(day="2025-05-01")).json()["category"] == "Household"
+
+
+def test_an_amount_edit_of_a_corrected_row_is_not_re_embedded(client, db, monkeypatch):
+    tx = client.post("/add-transaction", json=_expense()).json()
+    client.put(f"/transactions/{tx['id']}", json={"category": "Household"})
+    calls = []
+    monkeypatch.setattr(vector_index, "index_transactions", lambda *args: calls.append("index"))
+    monkeypatch.setattr(vector_index, "record_correction", lambda *args: calls.append("record"))
+
+    updated = client.put(f"/transactions/{tx['id']}", json={"amount": 50.0}).json()
+    assert (updated["amount"], updated["category"]) == (50.0, "Household")
+    assert calls == []
+
+    client.put(f"/transactions/{tx['id']}", json={"category": "Gifts"})
+    assert calls == ["index", "record"]
+
+
+def test_delete_removes_the_row_and_its_vector(client, db):
+    tx = client.post("/add-transaction", json=_expense()).json()
+
+    assert client.delete(f"/transactions/{tx['id']}").status_code == 200
+    assert db.query(models.Transaction).count() == 0
+    assert vector_index.get_vectors().missing([tx["id"]]).tolist() == [tx["id"]]
+    assert client.delete(f"/transactions/{tx['id']}").status_code == 404
+
+
+def test_unknown_transaction_is_404(client):
+    assert client.put("/transactions/99", json={"amount": 1.0}).status_code == 404
+
+
+def test_bulk_import_reports_bad_rows_and_inserts_the_rest(client, db):
+    rows = [_expense("Bus ticket", 2.5), {"amount": "lots"}, _expense("Monthly rent", 900.0)]
+
+    summary = client.post("/transactions/bulk?chunk_size=2", json=rows).json()
+    assert (summary["total"], summary["inserted"], summary["failed"]) == (3, 2, 1)
+    assert [e["row"] for e in summary["errors"]] == [2]
+    assert sorted(t.category for t in db.query(models.Transaction)) == ["Rent", "Transport"]
+
+
+def test_bulk_import_flags_copies_within_the_same_chunk(client, db, monkeypatch):
+    rows = [_expense(), _expense("Monthly rent", 900.0), _expense("CORNER GROCERY", day="2025-03-15")]
+
+    summary = client.post("/transactions/bulk", json=rows).json()
+    assert (summary["inserted"], summary["duplicates"]) == (3, 1)
+    pair = db.query(models.DuplicatePair).one()
+    first, _, copy = sorted(t.id for t in db.query(models.Transaction))
+    assert (pair.transaction_id, pair.duplicate_of_id) == (copy, first)
+
+    monkeypatch.setattr(dedup, "DEDUP_IMPORT_MODE", "skip")
+    rows = [_expense("Bus ticket", 2.5, day="2025-06-01"), _expense("bus ticket", 2.5, day="2025-06-01")]
+    summary = client.post("/transactions/bulk", json=rows).json()
+    assert (summary["inserted"], summary["skipped"]) == (1, 1)
+
+
+def test_startup_builds_the_rollups_of_an_existing_database(db, models_ready):
+    from fastapi.testclient import TestClient
+
+    from main import app
+
+    db.add(models.Transaction(date=date(2025, 3, 14), amount=10.0, description="Cafe", category="Food", type="expense"))
+    db.commit()
+    with TestClient(app):
+        pass
+    assert db.get(models.MonthlyRollup, ("2025-03", "expense", "Food")).count == 1
+
+
+def test_db_health_reports_the_writer(client):
+    body = client.get("/health/db").json()
+    assert body["dialect"] == "sqlite"
+    assert "batches" in body["writer"]
+
+
+def test_transactions_list_reads_what_the_writer_committed(client, db):
+    client.post("/add-transaction", json=_expense())
+    listed = client.get("/transactions").json()
+    assert [(t["description"], t["date"]) for t in listed] == [("Corner grocery", date(2025, 3, 14).isoformat())]
@@ -0,0 +1,89 @@
+import threading
+
+import numpy as np
+import pytest
+
+import vector_index
+from vector_index import CorrectionIndex, VectorIndex
+
+
+DIM = 16
+
+
+@pytest.fixture
+def index(tmp_path):
+    return VectorIndex(str(tmp_path / "finance.vectors"), "test", dim=DIM)
+
+
+def _vectors(n, seed=0):
+    return np.random.default_rng(seed).standard_normal((n, DIM)).astype(np.float32)
+
+
+def test_search_matches_brute_force_across_blocks(index, monkeypatch):
+    monkeypatch.setattr(vector_index, "SEARCH_BLOCK_ROWS", 7)
+    vectors = _vectors(50)
+    index.put(range(1, 51), vectors)
+    query = vectors[9] + 0.01
+
+    unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    expected = (np.argsort(-(unit @ (query / np.linalg.norm(query))))[:5] + 1).tolist()
+    assert [tx_id for tx_id, _ in index.search(query, k=5)] == expected
+    assert index.search(query, k=1)[0][1] == pytest.approx(1.0, abs=1e-2)
+
+
+def test_cleared_and_unlisted_rows_are_not_returned(index):
+    vectors = _vectors(10)
+    index.put(range(1, 11), vectors)
+    index.clear([3])
+
+    assert 3 not in [tx_id for tx_id, _ in index.search(vectors[2], k=10)]
+    assert sorted(tx_id for tx_id, _ in index.search(vectors[2], k=3, ids=[3, 4, 5])) == [4, 5]
+    assert index.missing([2, 3, 99]).tolist() == [3, 99]
+    assert len(index) == 9
+
+
+def test_vectors_persist_until_the_model_changes(tmp_path):
+    path = str(tmp_path / "finance.vectors")
+    VectorIndex(path, "v1", dim=DIM).put([7], _vectors(1))
+
+    assert len(VectorIndex(path, "v1", dim=DIM)) == 1
+    assert len(VectorIndex(path, "v2", dim=DIM)) == 0
+
+
+def test_search_while_the_index_grows(index):
+    index.put(range(1, 101), _vectors(100))
+    errors = []
+
+    def grow():
+        for step in range(1, 6):
+            start = vector_index.INITIAL_ROWS * step
+            index.put(range(start, start + 10), _vectors(10, seed=step))
+
+    def search():
+        try:
+            for _ in range(50):
+                index.search(_vectors(1, seed=99)[0], k=5)
+        except Exception as exc:  # pragma: no cover - reported below
+            errors.append(exc)
+
+    threads = [threading.Thread(target=grow), threading.Thread(target=search)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert len(index) == 150
+
+
+def test_corrections_override_only_close_agreeing_neighbours():
+    rng = np.random.default_rng(1)
+    rent = rng.standard_normal(DIM)
+    corrections = CorrectionIndex(dim=DIM)
+    corrections.set([1, 2], [rent, rent + 0.01], ["Rent", "Rent"])
+
+    near, far = rent + 0.05, rng.standard_normal(DIM)
+    assert corrections.override([near, far], ["Food", "Food"]) == ["Rent", "Food"]
+    assert corrections.overrides == 1
+
+    corrections.remove([1, 2])
+    assert corrections.override([near], ["Food"]) == ["Food"]
@@ -0,0 +1,123 @@
+import base64
+import json
+from datetime import date
+
+from fastapi import HTTPException, Query
+from sqlalchemy import select, tuple_
+
+import models
+
+
+T = models.Transaction
+FIELDS = [c.name for c in T.__table__.columns]
+ORDERINGS = ("id", "-id", "date", "-date")
+
+
+class TransactionFilters:
+    """Server-side filters shared by the listing and export endpoints."""
+
+    def __init__(
+        self,
+        date_from: date | None = None,
+        date_to: date | None = None,
+        type: str | None = None,
+        category: str | None = None,
+        payment_method: str | None = None,
+        min_amount: float | None = None,
+        max_amount: float | None = None,
+    ):
+        self.date_from = date_from
+        self.date_to = date_to
+        self.type = type
+        self.category = category
+        self.payment_method = payment_method
+        self.min_amount = min_amount
+        self.max_amount = max_amount
+
+    def apply(self, stmt):
+        if self.date_from is not None:
+            stmt = stmt.where(T.date >= self.date_from)
+        if self.date_to is not None:
+            stmt = stmt.where(T.date <= self.date_to)
+        if self.type is not None:
+            stmt = stmt.where(T.type == self.type)
+        if self.category is not None:
+            stmt = stmt.where(T.category == self.category)
+        if self.payment_method is not None:
+            stmt = stmt.where(T.payment_method == self.payment_method)
+        if self.min_amount is not None:
+            stmt = stmt.where(T.amount >= self.min_amount)
+        if self.max_amount is not None:
+            stmt = stmt.where(T.amount <= self.max_amount)
+        return stmt
+
+
+def parse_fields(fields: str | None = Query(None, description="Comma-separated columns to return")) -> list[str]:
+    if not fields:
+        return FIELDS
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = sorted(set(requested) - set(FIELDS))
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown fields: {', '.join(unknown)}")
+    # id is always returned so rows stay addressable
+    return ["id"] + [f for f in requested if f != "id"]
+
+
+# ------------------------------
+# KEYSET CURSORS
+# ------------------------------
+def encode_cursor(row: dict, order_by: str) -> str:
+    key = {"id": row["id"]}
+    if order_by.lstrip("-") == "date":
+        key["date"] = row["date"].isoformat()
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+
+def decode_cursor(cursor: str, order_by: str) -> dict:
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        key["id"] = int(key["id"])
+        if order_by.lstrip("-") == "date":
+            key["date"] = date.fromisoformat(key["date"])
+        return key
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=422, detail="Invalid cursor")
+
+
+def select_transactions(filters: TransactionFilters, fields: list[str], order_by: str = "id",
+                        cursor: str | None = None, limit: int | None = None):
+    """Core SELECT (no ORM objects) with filters, keyset cursor and ordering.
+
+    Ordering by date uses (date, id) as the key, so rows without a date are
+    left out of date-ordered listings.
+    """
+    # Cursor keys must be selected even if the caller didn't ask for them
+    columns = list(dict.fromkeys(fields + ["id"] + (["date"] if "date" in order_by else [])))
+    stmt = filters.apply(select(*(getattr(T, f) for f in columns)))
+
+    descending = order_by.startswith("-")
+    if order_by.lstrip("-") == "date":
+        stmt = stmt.where(T.date.isnot(None))
+        key_columns = tuple_(T.date, T.id)
+        order = (T.date.desc(), T.id.desc()) if descending else (T.date, T.id)
+    else:
+        key_columns = T.id
+        order = (T.id.desc(),) if descending else (T.id,)
+
+    if cursor:
+        key = decode_cursor(cursor, order_by)
+        last = tuple_(key["date"], key["id"]) if order_by.lstrip("-") == "date" else key["id"]
+        stmt = stmt.where(key_columns < last if descending else key_columns > last)
+
+    stmt = stmt.order_by(*order)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return stmt
+
+
+def to_json_row(row, fields: list[str]) -> dict:
+    out = {}
+    for f in fields:
+        value = row[f]
+        out[f] = value.isoformat() if isinstance(value, date) else value
+    return out
@@ -0,0 +1,368 @@
+"""Persistent description embeddings for semantic search and kNN categories.
+
+`finance.vectors` holds one L2-normalized float16 MiniLM embedding per
+transaction (row `id` is transaction `id`). `finance.vectors.present` holds
+one flag byte per row. Both files are memory-mapped, so opening the index
+reads nothing into RAM and search streams the array in blocks. Rows are
+written on add/update and cleared on delete. Rows missing at startup (older
+data, a new model) are filled by a background backfill.
+
+The user's own category corrections (category_source == "user") are kept
+in RAM as a small float32 matrix. A prediction whose nearest corrected
+neighbours are close enough takes their category instead of the SVC's.
+
+    python vector_index.py backfill
+"""
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+from sqlalchemy import select
+
+import models
+from model_registry import ModelNotReady, registry
+from prediction_cache import fingerprint
+
+
+VECTOR_INDEX_PATH = os.getenv("VECTOR_INDEX_PATH", "finance.vectors")
+VECTOR_BACKFILL = os.getenv("VECTOR_BACKFILL", "1") != "0"
+EMBEDDING_DIM = 384
+INITIAL_ROWS = 1 << 14
+SEARCH_BLOCK_ROWS = 16_384
+BACKFILL_BATCH = 512
+
+KNN_K = int(os.getenv("KNN_K", "5"))
+KNN_MIN_SIMILARITY = float(os.getenv("KNN_MIN_SIMILARITY", "0.9"))
+
+
+def _normalize(embeddings) -> np.ndarray:
+    embeddings = np.atleast_2d(np.asarray(embeddings, dtype=np.float32))
+    return embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-9)
+
+
+# ------------------------------
+# VECTOR STORE
+# ------------------------------
+class VectorIndex:
+    """Memory-mapped float16 embeddings addressed by transaction id."""
+
+    def __init__(self, path: str, model_fingerprint: str, dim: int = EMBEDDING_DIM):
+        self.path = path
+        self.dim = dim
+        self._lock = threading.Lock()
+
+        meta_path = path + ".json"
+        meta = {}
+        if os.path.exists(meta_path):
+            with open(meta_path) as fh:
+                meta = json.load(fh)
+        expected = {"fingerprint": model_fingerprint, "dim": dim, "dtype": "float16"}
+        if meta != expected or not os.path.exists(path) or not os.path.exists(path + ".present"):
+            # Vectors from another model can't be compared with new ones
+            for name, width in ((path, 2 * dim), (path + ".present", 1)):
+                with open(name, "wb") as fh:
+                    fh.truncate(INITIAL_ROWS * width)
+            with open(meta_path, "w") as fh:
+                json.dump(expected, fh)
+        self._open()
+
+    def _open(self):
+        rows = os.path.getsize(self.path + ".present")
+        self._vectors = np.memmap(self.path, dtype=np.float16, mode="r+", shape=(rows, self.dim))
+        self._present = np.memmap(self.path + ".present", dtype=np.uint8, mode="r+", shape=(rows,))
+        filled = np.flatnonzero(self._present)
+        # Search never needs to look past the highest stored id
+        self._end = int(filled[-1]) + 1 if len(filled) else 0
+
+    def _grow(self, min_rows: int):
+        rows = max(min_rows, 2 * len(self._present))
+        for array in (self._vectors, self._present):
+            array.flush()
+        del self._vectors, self._present
+        for name, width in ((self.path, 2 * self.dim), (self.path + ".present", 1)):
+            with open(name, "r+b") as fh:
+                fh.truncate(rows * width)
+        self._open()
+
+    def __len__(self):
+        with self._lock:
+            return int(np.count_nonzero(self._present[: self._end]))
+
+    def put(self, ids, embeddings):
+        ids = np.asarray(ids, dtype=np.int64)
+        if not len(ids):
+            return
+        vectors = _normalize(embeddings).astype(np.float16)
+        with self._lock:
+            if ids.max() >= len(self._present):
+                self._grow(int(ids.max()) + 1)
+            self._vectors[ids] = vectors
+            self._present[ids] = 1
+            self._end = max(self._end, int(ids.max()) + 1)
+
+    def clear(self, ids):
+        with self._lock:
+            ids = np.asarray([i for i in ids if i < len(self._present)], dtype=np.int64)
+            self._present[ids] = 0
+
+    def get(self, ids) -> np.ndarray:
+        """float32 vectors for `ids`; zero rows where nothing is stored."""
+        ids = np.asarray(ids, dtype=np.int64)
+        out = np.zeros((len(ids), self.dim), dtype=np.float32)
+        with self._lock:
+            inside = ids < len(self._present)
+            rows = ids[inside]
+            out[inside] = self._vectors[rows] * self._present[rows, None]
+        return out
+
+    def missing(self, ids) -> np.ndarray:
+        ids = np.asarray(ids, dtype=np.int64)
+        with self._lock:
+            inside = ids < len(self._present)
+            stored = np.zeros(len(ids), dtype=bool)
+            stored[inside] = self._present[ids[inside]] == 1
+        return ids[~stored]
+
+    def search(self, query, k: int = 10, ids=None) -> list[tuple[int, float]]:
+        """Top-k (id, cosine similarity), over `ids` if given, else every row."""
+        query = _normalize(query)[0]
+        # _grow() swaps the maps under the lock; keep the current ones alive
+        # (a grow only extends the files, so the old maps stay valid)
+        with self._lock:
+            vectors, present, end = self._vectors, self._present, self._end
+        if ids is not None:
+            ids = np.asarray(ids, dtype=np.int64)
+            ids = ids[ids < len(present)]
+            scores = vectors[ids].astype(np.float32) @ query
+            scores[present[ids] == 0] = -np.inf
+            candidates = [(ids, scores)]
+        else:
+            candidates = []
+            for start in range(0, end, SEARCH_BLOCK_ROWS):
+                stop = min(start + SEARCH_BLOCK_ROWS, end)
+                scores = vectors[start:stop].astype(np.float32) @ query
+                scores[present[start:stop] == 0] = -np.inf
+                # Keep each block's top-k only
+                top = np.argpartition(-scores, k - 1)[:k] if len(scores) > k else np.arange(len(scores))
+                candidates.append((top + start, scores[top]))
+
+        if not candidates:
+            return []
+        all_ids = np.concatenate([c[0] for c in candidates])
+        all_scores = np.concatenate([c[1] for c in candidates])
+        order = np.argsort(-all_scores)[:k]
+        return [(int(all_ids[i]), float(all_scores[i])) for i in order if np.isfinite(all_scores[i])]
+
+    def stats(self) -> dict:
+        return {"path": self.path, "vectors": len(self), "capacity": len(self._present), "dtype": "float16"}
+
+
+# ------------------------------
+# kNN OVER USER CORRECTIONS
+# ------------------------------
+class CorrectionIndex:
+    """Embeddings of transactions whose category the user set by hand."""
+
+    def __init__(self, dim: int = EMBEDDING_DIM):
+        self._lock = threading.Lock()
+        self._ids = []
+        self._categories = []
+        self._vectors = np.zeros((0, dim), dtype=np.float32)
+        self.overrides = 0
+
+    def __len__(self):
+        return len(self._ids)
+
+    def set(self, ids, vectors, categories):
+        vectors = _normalize(vectors)
+        replaced = set(ids)
+        with self._lock:
+            keep = [i for i, tx_id in enumerate(self._ids) if tx_id not in replaced]
+            self._ids = [self._ids[i] for i in keep] + list(ids)
+            self._categories = [self._categories[i] for i in keep] + list(categories)
+            self._vectors = np.vstack([self._vectors[keep], vectors])
+
+    def remove(self, ids):
+        ids = set(ids)
+        with self._lock:
+            keep = [i for i, tx_id in enumerate(self._ids) if tx_id not in ids]
+            if len(keep) == len(self._ids):
+                return
+            self._ids = [self._ids[i] for i in keep]
+            self._categories = [self._categories[i] for i in keep]
+            self._vectors = self._vectors[keep]
+
+    def override(self, embeddings, categories: list) -> list:
+        """Replace predictions whose K nearest corrections agree closely enough.
+
+        Neighbours under KNN_MIN_SIMILARITY don't vote; the remaining ones
+        vote weighted by similarity.
+        """
+        with self._lock:
+            vectors, known = self._vectors, self._categories
+        if not len(known) or not len(categories):
+            return categories
+
+        sims = _normalize(embeddings) @ vectors.T
+        k = min(KNN_K, len(known))
+        top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        result = list(categories)
+        for row, neighbours in enumerate(top):
+            votes = {}
+            for j in neighbours:
+                if sims[row, j] >= KNN_MIN_SIMILARITY:
+                    votes[known[j]] = votes.get(known[j], 0.0) + float(sims[row, j])
+            if votes:
+                result[row] = max(votes, key=votes.get)
+                if result[row] != categories[row]:
+                    self.overrides += 1
+        return result
+
+    def stats(self) -> dict:
+        return {"corrections": len(self), "overrides": self.overrides, "k": KNN_K, "min_similarity": KNN_MIN_SIMILARITY}
+
+
+# ------------------------------
+# REGISTRY / INCREMENTAL UPDATES
+# ------------------------------
+def _load_vectors():
+    from routers.ml import EMBEDDING_MODEL_PATH
+
+    index = VectorIndex(VECTOR_INDEX_PATH, fingerprint(EMBEDDING_MODEL_PATH))
+    if VECTOR_BACKFILL:
+        threading.Thread(target=_backfill_when_ready, name="vector-backfill", daemon=True).start()
+    return index
+
+
+def _load_corrections():
+    from database import SessionLocal
+
+    vectors = get_vectors()
+    corrections = CorrectionIndex(vectors.dim)
+    db = SessionLocal()
+    try:
+        rows = db.execute(
+            select(models.Transaction.id, models.Transaction.category)
+            .where(models.Transaction.category_source == "user")
+        ).all()
+    finally:
+        db.close()
+    if rows:
+        ids = [r.id for r in rows]
+        stored = set(ids) - set(vectors.missing(ids).tolist())
+        rows = [r for r in rows if r.id in stored]
+        if rows:
+            corrections.set([r.id for r in rows], vectors.get([r.id for r in rows]), [r.category for r in rows])
+    return corrections
+
+
+registry.register("transaction_vectors", _load_vectors)
+registry.register("category_corrections", _load_corrections)
+
+
+def get_vectors() -> VectorIndex:
+    return registry.get("transaction_vectors")
+
+
+def get_corrections() -> CorrectionIndex:
+    return registry.get("category_corrections")
+
+
+def index_transactions(ids, descriptions):
+    """Store embeddings for new or edited transactions (usually cache hits)."""
+    from routers.ml import embed_many
+
+    if ids:
+        get_vectors().put(ids, embed_many([d or "" for d in descriptions]))
+
+
+def record_correction(tx_id: int, category: str):
+    get_corrections().set([tx_id], get_vectors().get([tx_id]), [category])
+
+
+def forget(ids):
+    get_vectors().clear(ids)
+    get_corrections().remove(ids)
+
+
+def apply_corrections(embeddings, categories: list) -> list:
+    """kNN override in front of the SVC; a no-op until corrections are loaded."""
+    try:
+        corrections = registry.get("category_corrections", timeout=0)
+    except ModelNotReady:
+        return categories
+    return corrections.override(embeddings, categories)
+
+
+# ------------------------------
+# BACKFILL
+# ------------------------------
+def backfill(batch_size: int = BACKFILL_BATCH) -> int:
+    """Embed every transaction that has no stored vector yet.
+
+    Also fills in rows saved while the embedder was still loading; their
+    user corrections join the kNN index once they have a vector.
+    """
+    from database import SessionLocal
+
+    T = models.Transaction
+    index = get_vectors()
+    db = SessionLocal()
+    try:
+        rows = db.execute(select(T.id, T.description, T.category, T.category_source)).all()
+    finally:
+        db.close()
+
+    descriptions = {r.id: r.description for r in rows}
+    todo = index.missing(list(descriptions)).tolist()
+    for start in range(0, len(todo), batch_size):
+        ids = todo[start:start + batch_size]
+        index_transactions(ids, [descriptions[i] for i in ids])
+
+    filled = set(todo)
+    corrected = [r for r in rows if r.id in filled and r.category_source == "user"]
+    if corrected:
+        try:
+            corrections = registry.get("category_corrections", timeout=0)
+        except ModelNotReady:
+            pass   # not loaded yet: it reads them with their new vectors
+        else:
+            ids = [r.id for r in corrected]
+            corrections.set(ids, index.get(ids), [r.category for r in corrected])
+    return len(todo)
+
+
+def _backfill_when_ready():
+    # Waits for the embedder instead of failing while it is still loading
+    while True:
+        try:
+            registry.get("embedder", timeout=None)
+            backfill()
+            return
+        except ModelNotReady as exc:
+            # A failed embedder is retried after its backoff
+            time.sleep(exc.retry_after)
+
+
+def main(argv=None):
+    global VECTOR_BACKFILL
+
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] != ["backfill"]:
+        print(__doc__)
+        return 2
+
+    VECTOR_BACKFILL = False   # run it here, not in a background thread
+    print(f"{backfill()} transactions embedded")
+    return 0
+
+
+if __name__ == "__main__":
+    # Run the imported module: routers.ml imports vector_index, and a second
+    # copy here would register its own index (and start a stray backfill)
+    import vector_index
+
+    sys.exit(vector_index.main())
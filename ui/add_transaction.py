@@ -1,8 +1,8 @@
 ﻿import streamlit as st
-import requests
 from datetime import date
 
-API_URL = "http://172.30.31.76:8000"   # Backend URL
+import api_client as api
+
 
 def add_transaction_page():
 
@@ -45,6 +45,25 @@ def add_transaction_page():
         installments = 0
         monthly_payment = 0.0
 
+    # -----------------------------
+    # Low-confidence prediction → ask the user
+    # -----------------------------
+    chosen_category = None
+    if transaction_type == "expense" and description.strip():
+        try:
+            prediction = api.post(
+                "/predict-category", params={"description": description}
+            ).json()
+        except Exception:
+            prediction = {}
+        if prediction.get("needs_review"):
+            confidence = {a["category"]: a["confidence"] for a in prediction["alternatives"]}
+            chosen_category = st.radio(
+                "Not sure about the category. Which one fits best?",
+                list(confidence),
+                format_func=lambda c: f"{c} ({confidence[c]:.0%})",
+            )
+
     # -----------------------------
     # Save transaction
     # -----------------------------
@@ -61,12 +80,19 @@ def add_transaction_page():
         }
 
         try:
-            response = requests.post(f"{API_URL}/add-transaction", json=payload)
+            response = api.post("/add-transaction", json=payload)
 
             if response.status_code == 200:
                 data = response.json()
+                if chosen_category and chosen_category != data["category"]:
+                    # Saved as a correction, so the classifier learns from it
+                    fixed = api.put(
+                        f"/transactions/{data['id']}", json={"category": chosen_category}
+                    )
+                    if fixed.status_code == 200:
+                        data = fixed.json()
                 st.success("Transaction saved successfully! 🎉")
-                st.write(f"**Predicted Category:** {data['category']}")
+                st.write(f"**Category:** {data['category']}")
             else:
                 st.error(f"Failed to save transaction: {response.text}")
 
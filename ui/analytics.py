@@ -1,47 +1,42 @@
 ﻿import streamlit as st
-import requests
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from datetime import datetime
 
-API_URL = "http://172.30.31.76:8000"
+import api_client as api
+
 
 def analytics_page():
 
     st.title("Financial Dashboard")
 
     # -----------------------------
-    # LOAD TRANSACTIONS
+    # LOAD DASHBOARD
     # -----------------------------
+    # Every series comes pre-aggregated from the backend in one response;
+    # the forecast is independent, so both are fetched at once
+    fetches = api.gather(
+        dashboard=lambda: api.get_cached("/analytics/dashboard"),
+        forecast=lambda: api.get_cached("/analytics/forecast", {"months": 3}),
+    )
     try:
-        tx_res = requests.get(f"{API_URL}/transactions")
-        data = tx_res.json()
+        dash = fetches["dashboard"].result()
     except:
         st.error("Error loading data.")
         return
 
-    if not data:
+    if not dash["daily"]["date"]:
         st.info("No data to analyze yet.")
         return
 
-    df = pd.DataFrame(data)
-    df["date"] = pd.to_datetime(df["date"])
-    df["month"] = df["date"].dt.to_period("M").astype(str)
-    df["weekday"] = df["date"].dt.day_name()
-
     # -----------------------------
     # BALANCE CARDS
     # -----------------------------
-    income = df[df["type"] == "income"]["amount"].sum()
-    expenses = df[df["type"] == "expense"]["amount"].sum()
-    balance = income - expenses
-
     col1, col2, col3 = st.columns(3)
 
-    col1.metric("Balance", f"${balance:,.0f}")
-    col2.metric("Income", f"${income:,.0f}")
-    col3.metric("Expenses", f"${expenses:,.0f}")
+    col1.metric("Balance", f"${dash['balance']['balance']:,.0f}")
+    col2.metric("Income", f"${dash['balance']['income']:,.0f}")
+    col3.metric("Expenses", f"${dash['balance']['expenses']:,.0f}")
 
     st.markdown("---")
 
@@ -50,7 +45,10 @@ def analytics_page():
     # -----------------------------
     st.subheader("Income vs Expense Over Time")
 
-    ts = df.groupby(["date", "type"])["amount"].sum().reset_index()
+    ts = pd.DataFrame(dash["daily"])
+    ts["date"] = pd.to_datetime(ts["date"])
+    ts = ts.melt(id_vars="date", var_name="type", value_name="amount")
+    ts = ts[ts["amount"] != 0]
     fig_ts = px.line(ts, x="date", y="amount", color="type",
                      template="simple_white",
                      markers=True)
@@ -64,7 +62,7 @@ def analytics_page():
     # -----------------------------
     st.subheader("Spending Distribution by Category")
 
-    cat_df = df[df["type"] == "expense"].groupby("category")["amount"].sum().reset_index()
+    cat_df = pd.DataFrame(dash["categories"], columns=["category", "amount"])
     fig_pie = px.pie(cat_df, values="amount", names="category",
                      color_discrete_sequence=px.colors.qualitative.Set2,
                      hole=0.4)
@@ -77,15 +75,13 @@ def analytics_page():
     # -----------------------------
     st.subheader("Spending Heatmap by Day of Week")
 
-    heat = df[df["type"] == "expense"].groupby(["weekday"])["amount"].sum().reindex(
-        ["Monday","Tuesday","Wednesday","Thursday","Friday","Saturday","Sunday"]
-    )
+    heat = pd.DataFrame(dash["weekday"])
 
     fig_heat = go.Figure(
         data=go.Heatmap(
-            z=heat.values.tolist(),
+            z=[[a] for a in heat["amount"]],
             x=["Spending"],
-            y=heat.index.tolist(),
+            y=heat["weekday"].tolist(),
             colorscale="Blues"
         )
     )
@@ -98,14 +94,7 @@ def analytics_page():
     # -----------------------------
     st.subheader("Top Spending Categories (This Month)")
 
-    current_month = datetime.now().strftime("%Y-%m")
-    top_df = (
-        df[(df["type"] == "expense") & (df["month"] == current_month)]
-        .groupby("category")["amount"].sum()
-        .sort_values(ascending=False)
-        .head(5)
-        .reset_index()
-    )
+    top_df = pd.DataFrame(dash["top_categories"], columns=["category", "amount"])
 
     fig_top = px.bar(top_df, x="amount", y="category",
                      orientation="h",
@@ -116,22 +105,28 @@ def analytics_page():
     st.markdown("---")
 
     # -----------------------------
-    # SIMPLE MONTHLY FORECAST
+    # SPENDING FORECAST
     # -----------------------------
+    # Computed server-side from the monthly rollups, per category
     st.subheader("Projected Month Expense")
 
-    month_df = (
-        df[df["type"] == "expense"]
-        .groupby("date")["amount"].sum()
-        .reset_index()
-    )
-
-    # Regression fit
     try:
-        month_df["day"] = month_df["date"].dt.day
-        coef = pd.np.polyfit(month_df["day"], month_df["amount"], 1)
-        predicted_end = coef[0] * 30 + coef[1]
-
-        st.info(f"Estimated total spending this month: **${predicted_end:,.0f}**")
+        fc = fetches["forecast"].result()
     except:
+        fc = None
+
+    if not fc or not fc["categories"]:
         st.info("Not enough data to compute forecast.")
+    else:
+        col1, col2 = st.columns(2)
+        col1.metric("Spent so far", f"${fc['month_to_date']:,.0f}")
+        col2.metric("Estimated month end", f"${fc['projected_month_end']:,.0f}")
+
+        next_df = pd.DataFrame([
+            {"month": f["month"], "category": c["category"], "amount": f["amount"]}
+            for c in fc["categories"] for f in c["forecast"]
+        ])
+        fig_fc = px.bar(next_df, x="month", y="amount", color="category",
+                        template="simple_white",
+                        title=f"Next {len(fc['forecast'])} months ({fc['method']})")
+        st.plotly_chart(fig_fc, use_container_width=True)
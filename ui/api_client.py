@@ -0,0 +1,176 @@
+import os
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+import streamlit as st
+from requests.adapters import HTTPAdapter
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from urllib3.util.retry import Retry
+
+# Backend location and client behaviour, all overridable from the environment
+API_URL = os.getenv("API_URL", "http://172.30.31.76:8000").rstrip("/")
+API_CONNECT_TIMEOUT = float(os.getenv("API_CONNECT_TIMEOUT", "3"))
+API_READ_TIMEOUT = float(os.getenv("API_READ_TIMEOUT", "30"))
+API_RETRIES = int(os.getenv("API_RETRIES", "3"))
+API_BACKOFF = float(os.getenv("API_BACKOFF", "0.3"))    # 0.3 s, 0.6 s, 1.2 s ...
+API_POOL_SIZE = int(os.getenv("API_POOL_SIZE", "16"))
+# Seconds a downloaded payload is kept for get_cached(); within that time an
+# unchanged data version costs one conditional request answered with 304
+CACHE_TTL = int(os.getenv("ANALYTICS_CACHE_TTL", "600"))
+
+LATENCY_SAMPLES = 256
+
+
+# -----------------------------
+# SESSION (one per process)
+# -----------------------------
+@st.cache_resource
+def session() -> requests.Session:
+    """Keep-alive session shared by every page and user of this process."""
+    retry = Retry(
+        total=API_RETRIES,
+        backoff_factor=API_BACKOFF,
+        # Only idempotent methods: retrying POST /add-transaction would double-insert
+        allowed_methods=frozenset({"GET", "HEAD", "PUT", "DELETE", "OPTIONS"}),
+        status_forcelist=(502, 503, 504),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=API_POOL_SIZE, max_retries=retry)
+    s = requests.Session()
+    s.mount("http://", adapter)
+    s.mount("https://", adapter)
+    return s
+
+
+# -----------------------------
+# LATENCY
+# -----------------------------
+class LatencyStats:
+    """Client-side latency per endpoint (method + path with ids folded)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def record(self, endpoint: str, seconds: float, failed: bool):
+        with self._lock:
+            e = self._endpoints.setdefault(
+                endpoint, {"calls": 0, "errors": 0, "total": 0.0, "max": 0.0, "recent": deque(maxlen=LATENCY_SAMPLES)}
+            )
+            e["calls"] += 1
+            e["errors"] += failed
+            e["total"] += seconds
+            e["max"] = max(e["max"], seconds)
+            e["recent"].append(seconds)
+
+    def snapshot(self) -> list[dict]:
+        with self._lock:
+            rows = []
+            for endpoint, e in sorted(self._endpoints.items()):
+                recent = sorted(e["recent"])
+                pct = lambda q: 1000 * recent[min(len(recent) - 1, int(q * len(recent)))]
+                rows.append({
+                    "endpoint": endpoint,
+                    "calls": e["calls"],
+                    "errors": e["errors"],
+                    "avg_ms": round(1000 * e["total"] / e["calls"], 1),
+                    "p50_ms": round(pct(0.5), 1),
+                    "p95_ms": round(pct(0.95), 1),
+                    "max_ms": round(1000 * e["max"], 1),
+                })
+            return rows
+
+
+@st.cache_resource
+def latency() -> LatencyStats:
+    return LatencyStats()
+
+
+def _endpoint(method: str, path: str) -> str:
+    return f"{method} " + re.sub(r"/\d+(?=/|$)", "/{id}", path.split("?")[0])
+
+
+# -----------------------------
+# REQUESTS
+# -----------------------------
+def request(method: str, path: str, timeout=None, **kwargs) -> requests.Response:
+    """`requests.request` against the backend, pooled, with timeouts and retries."""
+    started = time.perf_counter()
+    failed = True
+    try:
+        response = session().request(
+            method, f"{API_URL}{path}", timeout=timeout or (API_CONNECT_TIMEOUT, API_READ_TIMEOUT), **kwargs
+        )
+        failed = response.status_code >= 500
+        return response
+    finally:
+        latency().record(_endpoint(method, path), time.perf_counter() - started, failed)
+
+
+def get(path: str, **kwargs) -> requests.Response:
+    return request("GET", path, **kwargs)
+
+
+def post(path: str, **kwargs) -> requests.Response:
+    return request("POST", path, **kwargs)
+
+
+def put(path: str, **kwargs) -> requests.Response:
+    return request("PUT", path, **kwargs)
+
+
+def delete(path: str, **kwargs) -> requests.Response:
+    return request("DELETE", path, **kwargs)
+
+
+# -----------------------------
+# CONDITIONAL, CACHED FETCHES
+# -----------------------------
+@st.cache_data(ttl=CACHE_TTL, max_entries=64, show_spinner=False)
+def _cached_json(path: str, params: tuple, etag: str, _response=None):
+    """Payload of `path` at the data version named by `etag`.
+
+    Seeded from the 200 response that introduced the ETag (`_response` is
+    not part of the cache key); only refetched if the entry expired.
+    """
+    if _response is not None:
+        return _response.json()
+    res = get(path, params=dict(params))
+    res.raise_for_status()
+    return res.json()
+
+
+def get_cached(path: str, params: dict | None = None):
+    """GET JSON, revalidating with If-None-Match against the last ETag seen."""
+    params = tuple(sorted((params or {}).items()))
+    etags = st.session_state.setdefault("api_etags", {})
+    etag = etags.get((path, params))
+
+    res = get(path, params=dict(params), headers={"If-None-Match": etag} if etag else {})
+    if res.status_code == 304:
+        return _cached_json(path, params, etag)
+    res.raise_for_status()
+
+    etag = res.headers.get("ETag")
+    if etag is None:
+        return res.json()
+    etags[(path, params)] = etag
+    return _cached_json(path, params, etag, _response=res)
+
+
+def gather(**calls) -> dict:
+    """Run a page's independent fetches concurrently; returns a Future per name."""
+    ctx = get_script_run_ctx()
+
+    def run(fn):
+        # Lets the worker thread use st.session_state / st.cache_data
+        if ctx is not None:
+            add_script_run_ctx(threading.current_thread(), ctx)
+        return fn()
+
+    with ThreadPoolExecutor(max_workers=max(1, len(calls))) as pool:
+        return {name: pool.submit(run, fn) for name, fn in calls.items()}
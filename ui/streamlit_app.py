@@ -3,6 +3,7 @@ import home
 import add_transaction
 import view_transactions
 import analytics
+import api_client
 from upload_receipt import upload_receipt_page
 
 
@@ -15,6 +16,11 @@ choice = st.sidebar.radio(
     ["Home", "Add Transaction", "View Transactions", "Analytics Dashboard", "Upload Receipt"]
 )
 
+# Client-side latency of every backend call made by this process
+with st.sidebar.expander("API latency"):
+    st.caption(api_client.API_URL)
+    st.dataframe(api_client.latency().snapshot(), hide_index=True)
+
 
 # Page Rendering
 if choice == "Home":
@@ -1,7 +1,21 @@
 ﻿import streamlit as st
-import requests
+import time
 
-API_URL = "http://127.0.0.1:8000"  
+import api_client as api
+
+JOB_POLL_SECONDS = 0.5
+JOB_WAIT_SECONDS = 120
+
+
+def _wait_for_job(status_url):
+    """Poll an OCR job until it finishes; returns the final job state."""
+    deadline = time.time() + JOB_WAIT_SECONDS
+    while time.time() < deadline:
+        job = api.get(status_url).json()
+        if job["status"] in ("done", "failed"):
+            return job
+        time.sleep(JOB_POLL_SECONDS)
+    return {"status": "failed", "error": "Timed out waiting for OCR"}
 
 def upload_receipt_page():
     st.title("Upload Receipt & OCR Extraction")
@@ -14,21 +28,44 @@ def upload_receipt_page():
         if st.button("Extract & Save Automatically"):
             files = {"file": file.getvalue()}
 
-            # Call backend OCR endpoint
-            res = requests.post(f"{API_URL}/ocr-receipt", files=files)
+            # Call backend OCR endpoint (returns a job to poll)
+            res = api.post("/ocr-receipt", files=files)
 
-            if res.status_code == 200:
-                data = res.json()
+            if res.status_code == 429:
+                st.warning("The OCR queue is full, please try again in a few seconds.")
+                return
+
+            job = None
+            if res.status_code == 202:
+                with st.spinner("Reading receipt..."):
+                    job = _wait_for_job(res.json()["status_url"])
+
+            if job and job["status"] == "done":
+                data = job["result"]
 
                 st.success("Receipt processed and stored in database!")
 
                 st.subheader("🧾 Extracted Information")
                 st.write(f"**Amount:** {data.get('amount')}")
-                st.write(f"**Date:** {data.get('date')}")
+                st.write(f"**Merchant:** {data.get('merchant')}")
+                st.write(f"**Date:** {data.get('date')}" + ("" if data.get("date_found", True) else " (not found on receipt)"))
                 st.write(f"**Category:** {data.get('category')}")
                 st.write(f"**Database ID:** {data.get('id')}")
+                st.caption(
+                    f"OCR engine: {data.get('engine')} · confidence {data.get('confidence', 0):.0%} · "
+                    + ", ".join(f"{a['engine']} {a['ms']:.0f} ms" for a in data.get("attempts", []))
+                )
+
+                if data.get("items"):
+                    st.subheader("Line items")
+                    st.table([
+                        {k: item.get(k) for k in ("description", "quantity", "amount", "category")}
+                        for item in data["items"]
+                    ])
 
                 st.text_area("Raw OCR Text", data.get("raw_text"), height=200)
 
+            elif job:
+                st.error(f"Error processing receipt: {job.get('error')}")
             else:
                 st.error("Error processing receipt. Check backend logs.")
\ No newline at end of file
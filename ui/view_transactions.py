@@ -1,25 +1,78 @@
 ﻿import streamlit as st
-import requests
 import pandas as pd
 from datetime import date
 
-API_URL = "http://172.30.31.76:8000"   # Backend URL
+import api_client as api
+
+
+PAGE_SIZES = [50, 100, 250, 500]
+
+
+def _filter_params():
+    with st.expander("Filters"):
+        col1, col2 = st.columns(2)
+        date_from = col1.date_input("From", value=None)
+        date_to = col2.date_input("To", value=None)
+
+        col1, col2, col3 = st.columns(3)
+        tx_type = col1.selectbox("Type", ["all", "expense", "income"])
+        payment_method = col2.selectbox("Payment method", ["all", "debit_card", "credit_card", "ocr", "cash"])
+        category = col3.text_input("Category")
+
+        col1, col2 = st.columns(2)
+        min_amount = col1.number_input("Min amount", min_value=0.0, value=None)
+        max_amount = col2.number_input("Max amount", min_value=0.0, value=None)
+
+    params = {
+        "date_from": date_from,
+        "date_to": date_to,
+        "type": None if tx_type == "all" else tx_type,
+        "payment_method": None if payment_method == "all" else payment_method,
+        "category": category or None,
+        "min_amount": min_amount,
+        "max_amount": max_amount,
+    }
+    return {k: str(v) for k, v in params.items() if v is not None}
 
 
 def view_transactions_page():
 
     st.title("Stored Transactions")
 
+    params = _filter_params()
+    search = st.text_input("Search by meaning", placeholder="e.g. coffee, rent, flights")
+    page_size = st.selectbox("Rows per page", PAGE_SIZES, index=1)
+
+    # Cursor stack: one entry per page visited; reset when filters change
+    query_key = (tuple(sorted(params.items())), page_size)
+    if st.session_state.get("tx_query") != query_key:
+        st.session_state.tx_query = query_key
+        st.session_state.tx_cursors = [None]
+
+    cursors = st.session_state.tx_cursors
+
     # -----------------------
-    # Load Transactions
+    # Load one page of transactions
     # -----------------------
     try:
-        response = requests.get(f"{API_URL}/transactions")
+        if search:
+            # Semantic search: best matches first, no paging
+            response = api.get(
+                "/transactions/search",
+                params={**params, "q": search, "k": min(page_size, 100)},
+            )
+        else:
+            page_params = {**params, "limit": page_size, "order_by": "-date"}
+            if cursors[-1]:
+                page_params["cursor"] = cursors[-1]
+            response = api.get("/transactions", params=page_params)
+
         if response.status_code != 200:
             st.error("Failed to load transactions.")
             return
 
         transactions = response.json()
+        next_cursor = response.headers.get("X-Next-Cursor")
 
     except Exception as e:
         st.error(f"Backend connection error: {e}")
@@ -32,6 +85,15 @@ def view_transactions_page():
     df = pd.DataFrame(transactions)
     st.dataframe(df, use_container_width=True)
 
+    col_prev, col_page, col_next = st.columns([1, 2, 1])
+    col_page.write(f"Page {len(cursors)}")
+    if col_prev.button("← Previous", disabled=len(cursors) == 1):
+        cursors.pop()
+        st.rerun()
+    if col_next.button("Next →", disabled=not next_cursor):
+        cursors.append(next_cursor)
+        st.rerun()
+
     # =========================
     # EDIT / DELETE SECTION
     # =========================
@@ -68,6 +130,10 @@ def view_transactions_page():
     # -------- DESCRIPTION --------
     description = st.text_input("Description", tx["description"])
 
+    # -------- CATEGORY --------
+    # Changing it by hand teaches the categorizer about similar descriptions
+    category = st.text_input("Category", tx["category"])
+
     # -------- DATE --------
     tx_date = st.date_input("Date", pd.to_datetime(tx["date"]))
 
@@ -112,8 +178,10 @@ def view_transactions_page():
             "installments": installments,
             "monthly_payment": monthly_payment
         }
+        if category and category != tx["category"]:
+            payload["category"] = category
 
-        update_res = requests.put(f"{API_URL}/transactions/{tx_id}", json=payload)
+        update_res = api.put(f"/transactions/{tx_id}", json=payload)
 
         if update_res.status_code == 200:
             st.success("Transaction updated!")
@@ -123,7 +191,7 @@ def view_transactions_page():
 
     # -------- DELETE BUTTON --------
     if st.button("Delete this transaction"):
-        delete_res = requests.delete(f"{API_URL}/transactions/{tx_id}")
+        delete_res = api.delete(f"/transactions/{tx_id}")
         if delete_res.status_code == 200:
             st.success("Deleted successfully!")
             st.rerun()